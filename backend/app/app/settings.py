@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -82,13 +84,35 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Each process keeps a psycopg 3 connection pool (Django's built-in pooling),
+# which serves WSGI and ASGI requests alike: a request borrows a connection
+# and hands it back when it finishes. Connections are checked before reuse,
+# and GET /api/db/pool/stats reports the pool's size and wait times.
+# DB_POOL_MAX_SIZE=0 turns the pool off in favour of persistent per-thread
+# connections kept for DB_CONN_MAX_AGE seconds.
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+
 DATABASES = {
     'default': {
         'ENGINE':  'django.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_HEALTH_CHECKS': True,
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            'pool': {
+                'name': 'default',
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': DB_POOL_MAX_SIZE,
+                # Seconds a request waits for a free connection before failing.
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+                'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            } if DB_POOL_MAX_SIZE else False,
+        },
     }
 }
 
@@ -142,19 +166,53 @@ AUTH_USER_MODEL = 'core.User'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     # 'DEFAULT_THROTTLE_CLASSES': [
     #     'rest_framework.throttling.AnonRateThrottle',
     #     'rest_framework.throttling.UserRateThrottle',
     # ],
-    # 'DEFAULT_THROTTLE_RATES': {
-    #     'anon': '100/day',
-    #     'user': '2500/hour',
-    # },
+    # Per-user token buckets for the heavy endpoint classes; see core.admission.
+    'DEFAULT_THROTTLE_RATES': {
+        # 'anon': '100/day',
+        # 'user': '2500/hour',
+        'ocr': os.environ.get('OCR_THROTTLE_RATE', '30/min'),
+        'reports': os.environ.get('REPORT_THROTTLE_RATE', '20/hour'),
+        'exports': os.environ.get('EXPORT_THROTTLE_RATE', '60/hour'),
+    },
 }
 
+# Concurrent requests per heavy endpoint class and worker process. Past
+# `concurrency`, up to `queue` requests wait `timeout` seconds for a slot and
+# the rest get an immediate 503 with Retry-After (core.admission).
+ADMISSION_LIMITS = {
+    'ocr': {
+        'concurrency': int(os.environ.get('OCR_MAX_CONCURRENCY', 2)),
+        'queue': int(os.environ.get('OCR_MAX_QUEUE', 8)),
+        'timeout': float(os.environ.get('OCR_QUEUE_TIMEOUT', 10)),
+    },
+    'reports': {
+        'concurrency': int(os.environ.get('REPORT_MAX_CONCURRENCY', 2)),
+        'queue': int(os.environ.get('REPORT_MAX_QUEUE', 4)),
+        'timeout': float(os.environ.get('REPORT_QUEUE_TIMEOUT', 10)),
+    },
+    'exports': {
+        'concurrency': int(os.environ.get('EXPORT_MAX_CONCURRENCY', 4)),
+        'queue': int(os.environ.get('EXPORT_MAX_QUEUE', 8)),
+        'timeout': float(os.environ.get('EXPORT_QUEUE_TIMEOUT', 10)),
+    },
+}
+
+# /api/receipt/list paginates when `cursor` or `page_size` is passed.
+RECEIPT_PAGE_SIZE = int(os.environ.get('RECEIPT_PAGE_SIZE', 50))
+RECEIPT_MAX_PAGE_SIZE = int(os.environ.get('RECEIPT_MAX_PAGE_SIZE', 500))
+
+# CSV exports read receipts in chunks of RECEIPT_EXPORT_CHUNK_SIZE and build
+# the ZIP in memory up to RECEIPT_EXPORT_SPOOL_SIZE bytes, then on disk.
+RECEIPT_EXPORT_CHUNK_SIZE = int(os.environ.get('RECEIPT_EXPORT_CHUNK_SIZE', 2000))
+RECEIPT_EXPORT_SPOOL_SIZE = int(os.environ.get('RECEIPT_EXPORT_SPOOL_SIZE', 8 * 1024 * 1024))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'backend',
     'VERSION': '1.0.0',
@@ -178,10 +236,34 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'user.serializers.TokenRefreshSerializer',
 }
 
-
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Authenticated users are kept in a per-process cache for JWT_USER_CACHE_TTL
+# seconds instead of being read on every request (see core.authentication).
+# A deactivation or password change made in another process takes up to the
+# TTL to reach this one. JWT_USER_CACHE_SIZE=0 turns the cache off.
+JWT_USER_CACHE_SIZE = int(os.environ.get('JWT_USER_CACHE_SIZE', 10000))
+JWT_USER_CACHE_TTL = int(os.environ.get('JWT_USER_CACHE_TTL', 30))
+
+# Refresh tokens are looked up in token_blacklist only when a per-process
+# Bloom filter of blacklisted JTIs says they may be there (core.token_blacklist).
+# The filter picks up other processes' rotations every
+# TOKEN_BLACKLIST_FILTER_REFRESH seconds and is rebuilt every
+# TOKEN_BLACKLIST_FILTER_REBUILD seconds. Expired rows are deleted by
+# `manage.py prune_token_blacklist`, TOKEN_BLACKLIST_PRUNE_BATCH_SIZE at a time.
+TOKEN_BLACKLIST_FILTER = os.environ.get('TOKEN_BLACKLIST_FILTER', '1') == '1'
+TOKEN_BLACKLIST_FILTER_REFRESH = float(os.environ.get('TOKEN_BLACKLIST_FILTER_REFRESH', 5))
+TOKEN_BLACKLIST_FILTER_REBUILD = float(os.environ.get('TOKEN_BLACKLIST_FILTER_REBUILD', 3600))
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = float(os.environ.get('TOKEN_BLACKLIST_FILTER_ERROR_RATE', 0.001))
+TOKEN_BLACKLIST_PRUNE_BATCH_SIZE = int(os.environ.get('TOKEN_BLACKLIST_PRUNE_BATCH_SIZE', 1000))
+
+
+# Mail sent during a request is queued in the core.OutboxEmail table and
+# delivered by `manage.py outbox_worker` through OUTBOX_DELIVERY_BACKEND, over
+# one reused connection. Set EMAIL_BACKEND to the SMTP backend to send inline.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'core.outbox.OutboxBackend')
+OUTBOX_DELIVERY_BACKEND = os.environ.get('OUTBOX_DELIVERY_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -191,6 +273,105 @@ EMAIL_HOST_PASSWORD ='podj pvfu kbbx sdhz'
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 SERVER_EMAIL = EMAIL_HOST_USER
 
+# Messages per claimed batch, delivery attempts before a message is marked
+# failed, retry backoff (seconds, doubling up to OUTBOX_RETRY_MAX), queue poll
+# interval, and how long an idle worker keeps its SMTP connection open.
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_RETRY_BASE = float(os.environ.get('OUTBOX_RETRY_BASE', 30))
+OUTBOX_RETRY_MAX = float(os.environ.get('OUTBOX_RETRY_MAX', 3600))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 1))
+OUTBOX_IDLE_TIMEOUT = float(os.environ.get('OUTBOX_IDLE_TIMEOUT', 30))
+
 GOOGLE_CLIENT_ID = '363134745953-ue2tuhonlljdaoos71qtm4bsouut9dc2.apps.googleusercontent.com'
 
 
+# Serve GET /api/receipt/list, /api/receipt/tags/list and /api/user/me from
+# coroutine views on the async ORM (receipt.async_views, user.async_views)
+# instead of the DRF views. Worth it under an ASGI server such as
+# `uvicorn app.asgi:application`; under WSGI each async view needs its own
+# event loop, so leave it off there.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', '') == '1'
+
+
+# Caches. 'responses' holds the receipt and tag list responses keyed on the
+# user's data version (see receipt.caching); LocMemCache is per process, so
+# point it at a shared cache such as Redis when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.environ.get('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 3600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+    # Token buckets of core.admission.TokenBucketThrottle, in files so the
+    # workers of one host share them; point it at Redis to share across hosts.
+    'throttle': {
+        'BACKEND': os.environ.get('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get(
+            'THROTTLE_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'piggysnap-throttle')
+        ),
+    },
+}
+
+
+# OCR
+# Each PaddleOCR engine holds several hundred MB of weights, so the pool size
+# bounds both per-process memory and concurrent OCR calls.
+
+OCR_ENGINE_POOL_SIZE = int(os.environ.get('OCR_ENGINE_POOL_SIZE', 1))
+OCR_ENGINE_ACQUIRE_TIMEOUT = float(os.environ.get('OCR_ENGINE_ACQUIRE_TIMEOUT', 30))
+
+# spaCy NER model, loaded lazily by ocr.nlp.get_nlp(). OCR_NER_PIPELINE picks
+# which components are loaded: 'ner' (only those that can change doc.ents),
+# 'ner-minimal' (also ignores parser sentence boundaries; validate with
+# `manage.py benchmark_ner` first) or 'full'.
+# With OCR_PRELOAD_MODELS=1 the WSGI/ASGI module loads the model at import,
+# so a pre-forking server (e.g. gunicorn --preload) shares it across workers.
+OCR_NER_MODEL_PATH = os.environ.get('OCR_NER_MODEL_PATH', str(BASE_DIR / 'ocr' / 'marius_ner_model'))
+OCR_NER_PIPELINE = os.environ.get('OCR_NER_PIPELINE', 'ner')
+OCR_PRELOAD_MODELS = os.environ.get('OCR_PRELOAD_MODELS', '') == '1'
+
+# Uploads are checked against this many pixels using only the image header.
+# Photos whose long side is at least twice OCR_DECODE_MIN_SIDE are decoded at a
+# reduced scale (1/2, 1/4 or 1/8).
+OCR_MAX_IMAGE_PIXELS = int(os.environ.get('OCR_MAX_IMAGE_PIXELS', 50_000_000))
+OCR_DECODE_MIN_SIDE = int(os.environ.get('OCR_DECODE_MIN_SIDE', 3000))
+
+# Longest side (px) of the copy the receipt outline is searched on, and of the
+# deskewed crop handed to the recognizer.
+OCR_DETECT_MAX_SIDE = int(os.environ.get('OCR_DETECT_MAX_SIDE', 1000))
+OCR_WARP_MAX_SIDE = int(os.environ.get('OCR_WARP_MAX_SIDE', 2000))
+
+# OCR results keyed on the upload's SHA-256 (and optionally a perceptual hash of
+# the deskewed crop). Backends: ocr.cache.LocMemResultCache,
+# ocr.cache.FileResultCache and ocr.cache.DatabaseResultCache.
+OCR_RESULT_CACHE = {
+    'BACKEND': os.environ.get('OCR_RESULT_CACHE_BACKEND', 'ocr.cache.LocMemResultCache'),
+    'OPTIONS': {
+        'max_entries': int(os.environ.get('OCR_RESULT_CACHE_MAX_ENTRIES', 1000)),
+        'ttl': int(os.environ.get('OCR_RESULT_CACHE_TTL', 86400)),
+    },
+}
+OCR_RESULT_CACHE_PHASH = os.environ.get('OCR_RESULT_CACHE_PHASH', '') == '1'
+
+# Batch uploads: images per request, deskew threads, and images per OCR/NER batch.
+OCR_BATCH_MAX_IMAGES = int(os.environ.get('OCR_BATCH_MAX_IMAGES', 20))
+OCR_BATCH_WORKERS = int(os.environ.get('OCR_BATCH_WORKERS', 4))
+OCR_BATCH_SIZE = int(os.environ.get('OCR_BATCH_SIZE', 8))
+
+# Uploads sent with ?async=true are queued here and run by `manage.py ocr_worker`.
+OCR_JOB_BROKER = os.environ.get('OCR_JOB_BROKER', 'ocr.jobs.DatabaseBroker')
+OCR_JOB_POLL_INTERVAL = float(os.environ.get('OCR_JOB_POLL_INTERVAL', 1))
+# A running job not updated for OCR_JOB_STALE_AFTER seconds lost its worker; it
+# is queued again, or failed once it has been claimed OCR_JOB_MAX_ATTEMPTS times.
+OCR_JOB_STALE_AFTER = float(os.environ.get('OCR_JOB_STALE_AFTER', 600))
+OCR_JOB_MAX_ATTEMPTS = int(os.environ.get('OCR_JOB_MAX_ATTEMPTS', 3))
+
+
@@ -21,6 +21,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 
+from core.views import admission_stats, db_pool_stats
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema', SpectacularAPIView.as_view(), name='api-schema'),
@@ -28,6 +30,8 @@ urlpatterns = [
     path('api/user/', include('user.urls')),
     path('api/ocr/', include('ocr.urls')),
     path('api/receipt/', include('receipt.urls')),
+    path('api/db/pool/stats', db_pool_stats, name='db-pool-stats'),
+    path('api/admission/stats', admission_stats, name='admission-stats'),
 
     path('password_reset/', auth_views.PasswordResetView.as_view(), name='password_reset'),
     path('password_reset_done/', auth_views.PasswordResetDoneView.as_view(), name='password_reset_done'),
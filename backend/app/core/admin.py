@@ -68,4 +68,14 @@ class ReceiptAdmin(admin.ModelAdmin):
 
 
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Receipt, ReceiptAdmin)
\ No newline at end of file
+admin.site.register(models.Receipt, ReceiptAdmin)
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    ordering = ['-id']
+    list_display = ['id', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    exclude = ['message']
+    readonly_fields = ['from_email', 'recipients', 'subject', 'attempts', 'last_error', 'created_at', 'sent_at']
+
+
+admin.site.register(models.OutboxEmail, OutboxEmailAdmin)
@@ -0,0 +1,192 @@
+"""
+Admission control for the CPU- and memory-heavy endpoints.
+
+Two layers, both per endpoint class (see ADMISSION_LIMITS and
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']):
+
+- TokenBucketThrottle: a DRF throttle giving each user a bucket of
+  requests that refills continuously; an empty bucket is a 429 with
+  Retry-After. Buckets live in the 'throttle' cache.
+- admission_controlled: at most `concurrency` requests of a class run at
+  once in this process, up to `queue` more wait for `timeout` seconds, and
+  the rest are shed at once with a 503 and Retry-After. A burst of uploads
+  then queues or bounces instead of growing worker memory without bound,
+  and the other endpoint classes keep their own capacity.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Server is busy, try again shortly.')
+    default_code = 'overloaded'
+
+    def __init__(self, wait, detail=None, code=None):
+        # DRF's exception handler turns `wait` into the Retry-After header.
+        self.wait = wait
+        super().__init__(detail, code)
+
+
+class ConcurrencyLimiter:
+    """Per-process cap on concurrent requests with a bounded wait queue."""
+
+    def __init__(self, name, concurrency, queue=0, timeout=0.0):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.active = self.waiting = 0
+        self.admitted = self.queued = self.shed = self.timed_out = 0
+        # Moving average of how long a request holds its slot, for Retry-After.
+        self.avg_seconds = 1.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.queue:
+                self.shed += 1
+                raise Overloaded(self.retry_after())
+
+            self.waiting += 1
+            self.queued += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.concurrency, self.timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.timed_out += 1
+                raise Overloaded(self.retry_after())
+            self.active += 1
+            self.admitted += 1
+
+    def release(self, seconds):
+        with self._cond:
+            self.active -= 1
+            self.avg_seconds += 0.2 * (seconds - self.avg_seconds)
+            self._cond.notify()
+
+    def retry_after(self):
+        """Seconds until the queue ahead has likely drained."""
+        return max(1, math.ceil(self.avg_seconds * (self.waiting + 1) / max(self.concurrency, 1)))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'concurrency': self.concurrency, 'queue': self.queue, 'timeout': self.timeout,
+                'active': self.active, 'waiting': self.waiting,
+                'admitted': self.admitted, 'queued': self.queued, 'shed': self.shed, 'timed_out': self.timed_out,
+                'avg_ms': round(self.avg_seconds * 1000, 1),
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = ConcurrencyLimiter(name, **settings.ADMISSION_LIMITS[name])
+        return limiter
+
+
+def reset_limiters():
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def admission_stats_snapshot():
+    """Slots, queue and shed counters of this process's limiters."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in sorted(limiters.items())}
+
+
+def admission_controlled(name):
+    """Run the decorated view handler in one of the `name` class's slots.
+
+    Goes under @api_view or @action, so authentication, permissions and
+    throttles have passed before a slot is taken.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            limiter = get_limiter(name)
+            limiter.acquire()
+            started = time.monotonic()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                limiter.release(time.monotonic() - started)
+        return wrapper
+    return decorator
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Per-user token bucket for the `scope` endpoint class.
+
+    A rate of "N/period" is a bucket of N requests that refills at N per
+    period, so a user may burst N requests and then get one every period/N.
+    Anonymous requests are bucketed by client address.
+    """
+    cache = caches['throttle']
+    _lock = threading.Lock()
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        refill = self.num_requests / self.duration
+        # Exact within a process; processes sharing the cache can race the
+        # read-modify-write and let a request or two through, as DRF's own
+        # throttles do.
+        with self._lock:
+            now = self.timer()
+            tokens, updated = self.cache.get(self.key, (self.num_requests, now))
+            tokens = min(self.num_requests, tokens + (now - updated) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(self.key, (tokens, now), self.duration)
+        self._wait = 0 if allowed else (1 - tokens) / refill
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class OCRRateThrottle(TokenBucketThrottle):
+    scope = 'ocr'
+
+
+class ReportRateThrottle(TokenBucketThrottle):
+    scope = 'reports'
+
+
+class ExportRateThrottle(TokenBucketThrottle):
+    scope = 'exports'
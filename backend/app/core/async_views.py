@@ -0,0 +1,63 @@
+"""
+Plumbing for the async (ASGI-native) read views.
+
+DRF views are synchronous, so under ASGI every request to them runs in a
+worker thread. The hot read endpoints also have coroutine versions built
+on the async ORM; `async_read_view` gives them DRF's JWT authentication,
+error format and JSON rendering, and passes other methods to the DRF view.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+
+from core.authentication import AsyncJWTAuthentication
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    content = b'' if data is None else JSONRenderer().render(data)
+    return HttpResponse(content, status=status_code, content_type='application/json')
+
+
+def error_response(exc, authenticator):
+    data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    response = json_response(data, exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = authenticator.authenticate_header(None)
+    return response
+
+
+def async_read_view(sync_view=None):
+    """Serve GET with the decorated coroutine, called as `view(request, user, ...)`.
+
+    It returns response data, or an HttpResponse to send as is. Other
+    methods go to `sync_view` (in a thread), or get a 405.
+    """
+    def decorator(handler):
+        fallback = sync_to_async(sync_view) if sync_view else None
+
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET':
+                if fallback is not None:
+                    return await fallback(request, *args, **kwargs)
+                return json_response({'detail': f'Method "{request.method}" not allowed.'},
+                                     status.HTTP_405_METHOD_NOT_ALLOWED)
+
+            authenticator = AsyncJWTAuthentication()
+            try:
+                result = await authenticator.aauthenticate(request)
+                if result is None:
+                    raise NotAuthenticated()
+                data = await handler(request, result[0], *args, **kwargs)
+            except APIException as exc:
+                return error_response(exc, authenticator)
+            return data if isinstance(data, HttpResponse) else json_response(data)
+
+        # Like DRF views: JWT requests carry no session cookie to protect.
+        view.csrf_exempt = True
+        return view
+    return decorator
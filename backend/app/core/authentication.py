@@ -0,0 +1,182 @@
+"""
+JWT authentication with the user lookup served from a per-process cache.
+
+simplejwt's JWTAuthentication reads the user row on every request. Here
+the user is kept in an in-process LRU for JWT_USER_CACHE_TTL seconds,
+valid only for the token version it was loaded at. User.token_version is
+bumped when the password or is_active changes (see user.signals), so
+tokens issued before that are rejected, and every save of a user drops
+that user from this process's cache at once. Other processes notice within
+the TTL; tokens issued after the change never see an older cached user.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.token_blacklist import blacklist_filter
+
+TOKEN_VERSION_CLAIM = 'token_version'
+# Set on the short-lived pre_token of the 2FA login; see user.views.TokenObtainPair2FA.
+TWO_FACTOR_STEP_CLAIM = '2fa_step'
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Refresh token carrying the user's token version, as do its access tokens.
+
+    Blacklist checks go to the database only when core.token_blacklist's
+    Bloom filter has seen the JTI.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+    def check_blacklist(self):
+        if not settings.TOKEN_BLACKLIST_FILTER or blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
+
+
+class UserCache:
+    """Per-process LRU of users by id, each valid for one token version and `ttl` seconds."""
+
+    def __init__(self, max_entries=10000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        key = str(user_id)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic() or user.token_version != version:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        # A copy per request: views may change request.user without saving it.
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        if self.max_entries <= 0:
+            return
+        key = str(user_id)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, copy.copy(user))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._data.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = UserCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
+
+
+class VersionedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that also checks the token version, reading the user fresh.
+
+    It refuses 2FA pre tokens, which are access tokens too but only stand
+    for the password half of a 2FA login.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if validated_token.get(TWO_FACTOR_STEP_CLAIM):
+            raise InvalidToken(_("Token is only valid for the 2FA verification step"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        self.check_token_version(user, validated_token)
+        return user
+
+    def check_token_version(self, user, validated_token):
+        # Tokens issued before the claim existed count as version 0.
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != user.token_version:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+
+class CachedJWTAuthentication(VersionedJWTAuthentication):
+    """VersionedJWTAuthentication with the user lookup served from `user_cache`."""
+
+    def get_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(validated_token[api_settings.USER_ID_CLAIM], user)
+        return user
+
+    def get_cached_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return None
+        return user_cache.get(user_id, validated_token.get(TOKEN_VERSION_CLAIM, 0))
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """CachedJWTAuthentication with the user lookup on the async ORM.
+
+    Header parsing and token validation are plain CPU work and are reused
+    as they are; only a cache miss touches the database.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is not None:
+            return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        self.check_token_version(user, validated_token)
+        user_cache.set(user_id, user)
+        return user
@@ -0,0 +1,78 @@
+"""
+Django command to time small API requests end to end
+"""
+import json
+import statistics
+import threading
+import time
+import urllib.request
+import uuid
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import Tag
+from core.views import db_pool_stats_snapshot
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    """Serve the WSGI app on a local port and time authenticated GETs against it.
+
+    Each request runs on a fresh server thread and ends with Django's
+    request_finished cleanup, as under a threaded WSGI server. Compare the
+    pool with the old setup by running once as is and once with
+    DB_POOL_MAX_SIZE=0 DB_CONN_MAX_AGE=0.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--paths', nargs='+', default=['/api/user/me', '/api/receipt/tags/list'])
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = get_user_model().objects.create_user(email=f'bench-{uuid.uuid4().hex}@example.com')
+        Tag.objects.bulk_create(Tag(user=user, name=f'tag {i}') for i in range(10))
+        token = str(RefreshToken.for_user(user).access_token)
+        server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                             server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            base = f'http://127.0.0.1:{server.server_address[1]}'
+            for path in options['paths']:
+                self.report(path, self.time_requests(f'{base}{path}', token, options['requests']))
+            self.stdout.write(json.dumps(db_pool_stats_snapshot()))
+        finally:
+            server.shutdown()
+            server.server_close()
+            user.delete()
+
+    def time_requests(self, url, token, count):
+        request = urllib.request.Request(url, headers={'Authorization': f'Bearer {token}'})
+        timings = []
+        for i in range(count + 20):
+            started = time.perf_counter()
+            with urllib.request.urlopen(request) as res:
+                res.read()
+            if i >= 20:  # warm-up
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, path, timings):
+        timings.sort()
+        self.stdout.write(
+            f'{path:28} mean {statistics.mean(timings):6.2f} ms  '
+            f'p50 {timings[len(timings) // 2]:6.2f} ms  p95 {timings[int(len(timings) * 0.95)]:6.2f} ms'
+        )
@@ -0,0 +1,176 @@
+"""
+Django command to load test the read endpoints under uvicorn, sync vs async views
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import Receipt, Tag
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def thread_count(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = 0
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(head.split(b' ', 2)[1])
+
+
+class Command(BaseCommand):
+    """Start uvicorn once per mode and drive keep-alive clients against it.
+
+    `--slow-clients` connections trickle their request headers for the whole
+    run, holding server connections open the way slow mobile clients do.
+    The response cache is a DummyCache unless --with-cache is given, so the
+    numbers measure the views rather than cache hits.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=['sync', 'async'], default=['sync', 'async'])
+        parser.add_argument('--paths', nargs='+',
+                            default=['/api/receipt/list?page_size=20', '/api/receipt/tags/list', '/api/user/me'])
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--slow-clients', type=int, default=200)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--receipts', type=int, default=200)
+        parser.add_argument('--with-cache', action='store_true')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = get_user_model().objects.create_user(email=f'load-{uuid.uuid4().hex}@example.com')
+        try:
+            tags = [Tag.objects.create(user=user, name=f'tag {i}') for i in range(5)]
+            for i in range(options['receipts']):
+                receipt = Receipt.objects.create(user=user, shop_name=f'Shop {i % 20}', total=i, date=now(), items=[])
+                receipt.tags.add(tags[i % len(tags)])
+            token = str(RefreshToken.for_user(user).access_token)
+            for mode in options['modes']:
+                self.run_mode(mode, token, options)
+        finally:
+            user.delete()
+
+    def run_mode(self, mode, token, options):
+        port = free_port()
+        env = dict(os.environ, ASYNC_READ_VIEWS='1' if mode == 'async' else '0')
+        if not options['with_cache']:
+            env['RESPONSE_CACHE_BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'app.asgi:application', '--host', '127.0.0.1',
+             '--port', str(port), '--workers', '1', '--log-level', 'warning', '--no-access-log'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        try:
+            result = asyncio.run(self.drive(server.pid, port, token, options))
+        finally:
+            server.terminate()
+            server.wait()
+
+        latencies, errors, peak_threads = result
+        latencies.sort()
+        count = len(latencies)
+        self.stdout.write(
+            f'{mode:5}  {count / options["duration"]:8.1f} req/s  '
+            f'p50 {latencies[count // 2]:7.2f} ms  p95 {latencies[int(count * 0.95)]:7.2f} ms  '
+            f'p99 {latencies[int(count * 0.99)]:7.2f} ms  mean {statistics.mean(latencies):7.2f} ms  '
+            f'errors {errors}  peak threads {peak_threads}'
+        )
+
+    async def drive(self, pid, port, token, options):
+        await self.wait_for_server(port)
+        request_lines = [
+            (f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+             f'Authorization: Bearer {token}\r\n\r\n').encode()
+            for path in options['paths']
+        ]
+        await self.warm_up(port, request_lines)
+        latencies, errors, peak = [], [0], [thread_count(pid)]
+        deadline = time.monotonic() + options['duration']
+
+        async def client(n):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                i = n
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    writer.write(request_lines[i % len(request_lines)])
+                    if await read_response(reader) != 200:
+                        errors[0] += 1
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    i += 1
+            finally:
+                writer.close()
+
+        async def slow_client():
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                writer.write(b'GET /api/user/me HTTP/1.1\r\nHost: 127.0.0.1\r\n')
+                while time.monotonic() < deadline:
+                    writer.write(b'X-Slow: 1\r\n')
+                    await writer.drain()
+                    await asyncio.sleep(1)
+            finally:
+                writer.close()
+
+        async def sample_threads():
+            while time.monotonic() < deadline:
+                peak[0] = max(peak[0], thread_count(pid))
+                await asyncio.sleep(0.1)
+
+        await asyncio.gather(
+            *(client(n) for n in range(options['concurrency'])),
+            *(slow_client() for _ in range(options['slow_clients'])),
+            sample_threads(),
+        )
+        return latencies, errors[0], peak[0]
+
+    async def warm_up(self, port, request_lines):
+        """A few untimed requests, so imports and the DB pool aren't measured."""
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            for request_line in request_lines * 3:
+                writer.write(request_line)
+                await read_response(reader)
+        finally:
+            writer.close()
+
+    async def wait_for_server(self, port):
+        for _ in range(100):
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            except OSError:
+                await asyncio.sleep(0.1)
+                continue
+            writer.close()
+            return
+        raise RuntimeError('uvicorn did not start')
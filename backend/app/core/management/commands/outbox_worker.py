@@ -0,0 +1,41 @@
+"""
+Django command to deliver queued outbox email
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import OutboxWorker, outbox_stats
+
+
+class Command(BaseCommand):
+    """Django command to drain the email outbox."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Exit after this many non-empty batches.')
+        parser.add_argument('--once', action='store_true',
+                            help='Send everything that is due, then exit.')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print queue and delivery counts and exit.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['stats']:
+            self.stdout.write(json.dumps(outbox_stats()))
+            return
+
+        worker = OutboxWorker()
+        if options['once']:
+            try:
+                while worker.run_once():
+                    pass
+            finally:
+                worker.close()
+        else:
+            self.stdout.write('Starting outbox worker')
+            try:
+                worker.run_forever(max_batches=options['max_batches'])
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(json.dumps(worker.stats()))
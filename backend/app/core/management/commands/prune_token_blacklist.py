@@ -0,0 +1,40 @@
+"""
+Django command to delete expired rows from the token blacklist tables
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.token_blacklist import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    """Prune expired outstanding and blacklisted tokens in bounded batches.
+
+    Run once from a scheduler, or with --interval as a long-lived service.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.TOKEN_BLACKLIST_PRUNE_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop a run after this many batches.')
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches.')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Prune again every this many seconds instead of exiting.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        while True:
+            deleted = prune_expired_tokens(
+                batch_size=options['batch_size'], max_batches=options['max_batches'], pause=options['pause'],
+            )
+            self.stdout.write(json.dumps(deleted))
+            if options['interval'] is None:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
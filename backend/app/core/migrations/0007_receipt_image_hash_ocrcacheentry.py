@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_ocrjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OCRCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=80, primary_key=True, serialize=False)),
+                ('value', models.JSONField()),
+                ('accessed_at', models.DateTimeField(db_index=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='image_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the uploaded image, used to make OCR uploads idempotent', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='receipt',
+            constraint=models.UniqueConstraint(condition=models.Q(('image_hash', ''), _negated=True), fields=('user', 'image_hash'), name='unique_receipt_image_per_user'),
+        ),
+    ]
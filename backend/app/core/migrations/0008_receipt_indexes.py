@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:50
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction; it avoids
+    # locking the receipt table against writes while the indexes build.
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_receipt_image_hash_ocrcacheentry'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='receipt',
+            index=models.Index(fields=['user', '-date', '-id'], name='receipt_user_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='receipt',
+            index=models.Index(fields=['user', 'total'], name='receipt_user_total_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='receipt',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('shop_name'), name='gin_trgm_ops'), name='receipt_shop_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:54
+
+import django.db.models.functions.datetime
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Adding the stored columns rewrites the table once; the indexes are then
+    # built without blocking writes, as in 0008.
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_receipt_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='date_day',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractDay('date'), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='date_month',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractMonth('date'), output_field=models.PositiveSmallIntegerField()),
+        ),
+        AddIndexConcurrently(
+            model_name='receipt',
+            index=models.Index(fields=['user', 'date_month', 'date_day'], name='receipt_user_month_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='receipt',
+            index=models.Index(fields=['user', 'date_day'], name='receipt_user_day_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_receipt_calendar_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyShopSpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('shop_name', models.CharField(max_length=255)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('receipt_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'shop_name'), name='unique_shop_spending')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyTagSpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('receipt_count', models.IntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.tag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'tag'), name='unique_tag_spending')],
+            },
+        ),
+        migrations.RunSQL(
+            [(
+                """
+                INSERT INTO core_monthlyshopspending (user_id, month, shop_name, total, receipt_count)
+                SELECT user_id, date_trunc('month', date AT TIME ZONE %s)::date, shop_name, SUM(total), COUNT(*)
+                FROM core_receipt
+                GROUP BY 1, 2, 3
+                """,
+                [settings.TIME_ZONE],
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            [(
+                """
+                INSERT INTO core_monthlytagspending (user_id, month, tag_id, total, receipt_count)
+                SELECT r.user_id, date_trunc('month', r.date AT TIME ZONE %s)::date, rt.tag_id, SUM(r.total), COUNT(*)
+                FROM core_receipt_tags rt
+                JOIN core_receipt r ON r.id = rt.receipt_id
+                GROUP BY 1, 2, 3
+                """,
+                [settings.TIME_ZONE],
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
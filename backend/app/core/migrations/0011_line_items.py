@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:04
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_spending_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12, null=True)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('receipt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='core.receipt')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'name'], name='line_item_user_name_idx'), django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='line_item_name_trgm_idx')],
+                'constraints': [models.UniqueConstraint(fields=('receipt', 'position'), name='unique_line_item_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations
+
+# A frozen copy of receipt.line_items.parse_decimal, so later changes there
+# don't alter what this migration does.
+# An optional minus before or after the number, as in "-1,00" or "1,00-".
+NUMBER = re.compile(r'(-)?(\d+(?:[.,]\d+)*)(-(?!\d))?')
+# A separator followed by three digits and another separator groups
+# thousands, as in "1.234,56" or "1,234,567.89".
+THOUSANDS = re.compile(r'[.,](?=\d{3}[.,])')
+
+
+def parse_decimal(value, places):
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, str):
+        match = NUMBER.search(value.replace(' ', ''))
+        if not match:
+            return None
+        sign = '-' if match.group(1) or match.group(3) else ''
+        digits = THOUSANDS.sub('', match.group(2)).replace(',', '.')
+        value = sign + '.'.join(digits.split('.')[:2])
+    try:
+        number = Decimal(str(value)).quantize(Decimal(1).scaleb(-places))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+    return number if abs(number) < 10 ** 7 else None
+
+
+def backfill_line_items(apps, schema_editor):
+    Receipt = apps.get_model('core', 'Receipt')
+    LineItem = apps.get_model('core', 'LineItem')
+
+    batch = []
+    receipts = Receipt.objects.order_by('pk').values_list('pk', 'user_id', 'items')
+    for receipt_id, user_id, items in receipts.iterator(chunk_size=2000):
+        if not isinstance(items, list):
+            continue
+        batch.extend(
+            LineItem(
+                receipt_id=receipt_id,
+                user_id=user_id,
+                position=position,
+                name=str(item.get('name', ''))[:255],
+                quantity=parse_decimal(item.get('quantity'), 3),
+                unit_price=parse_decimal(item.get('unit_price'), 2),
+                price=parse_decimal(item.get('price'), 2),
+            )
+            for position, item in enumerate(items)
+            if isinstance(item, dict)
+        )
+        if len(batch) >= 5000:
+            LineItem.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    LineItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def remove_line_items(apps, schema_editor):
+    apps.get_model('core', 'LineItem').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_line_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_line_items, remove_line_items),
+    ]
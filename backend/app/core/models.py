@@ -2,7 +2,9 @@
 DataBase models
 """
 import pyotp
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import ExtractDay, ExtractMonth, Upper
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -53,6 +55,14 @@ class User(AbstractBaseUser, PermissionsMixin):
         default=False,
         help_text="Whether the user has completed TOTP setup"
     )
+    data_version = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Bumped on every receipt or tag write; keys the cached list responses"
+    )
+    token_version = models.PositiveIntegerField(
+        default=0,
+        help_text="Bumped when the password or is_active changes; tokens issued before are rejected"
+    )
 
     @property
     def totp(self):
@@ -73,9 +83,45 @@ class Receipt(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     date = models.DateTimeField(default=today_as_datetime)
     tags = models.ManyToManyField('Tag', blank=True, related_name='receipts')
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="SHA-256 of the uploaded image, used to make OCR uploads idempotent"
+    )
+    # Calendar parts of `date` (in TIME_ZONE) stored as indexed columns, so "any
+    # March" or "every 15th" filters don't have to EXTRACT from every row.
+    date_month = models.GeneratedField(
+        expression=ExtractMonth('date'),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+    date_day = models.GeneratedField(
+        expression=ExtractDay('date'),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
     # def __str__(self):
         # return f"{self.shop_name} - {self.total} RON - {self.date.strftime('%Y-%m-%d %H:%M:%S')}"
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'image_hash'],
+                condition=~models.Q(image_hash=''),
+                name='unique_receipt_image_per_user',
+            ),
+        ]
+        indexes = [
+            # Serves the list ordering, date-range filters and keyset pages.
+            models.Index(fields=['user', '-date', '-id'], name='receipt_user_date_idx'),
+            models.Index(fields=['user', 'total'], name='receipt_user_total_idx'),
+            models.Index(fields=['user', 'date_month', 'date_day'], name='receipt_user_month_idx'),
+            models.Index(fields=['user', 'date_day'], name='receipt_user_day_idx'),
+            # shop_name__icontains compiles to UPPER(shop_name) LIKE UPPER('%...%').
+            GinIndex(OpClass(Upper('shop_name'), name='gin_trgm_ops'), name='receipt_shop_trgm_idx'),
+        ]
+
 class Tag(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tags')
     name = models.CharField(max_length=50)
@@ -84,4 +130,121 @@ class Tag(models.Model):
         return self.name
 
     class Meta:
-        unique_together = ('user', 'name')
\ No newline at end of file
+        unique_together = ('user', 'name')
+
+class OCRJob(models.Model):
+    """Receipt image waiting for, or done with, background OCR."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ocr_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    stage = models.CharField(max_length=32, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    image = models.BinaryField(null=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    receipt = models.ForeignKey(
+        Receipt, null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class OCRCacheEntry(models.Model):
+    """OCR result stored by ocr.cache.DatabaseResultCache."""
+    key = models.CharField(max_length=80, primary_key=True)
+    value = models.JSONField()
+    accessed_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+
+class MonthlyShopSpending(models.Model):
+    """Per-user spending rollup by month and shop, kept by receipt.rollups."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    month = models.DateField()
+    shop_name = models.CharField(max_length=255)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    receipt_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'shop_name'], name='unique_shop_spending'),
+        ]
+
+
+class MonthlyTagSpending(models.Model):
+    """Per-user spending rollup by month and tag, kept by receipt.rollups."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    month = models.DateField()
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    receipt_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'tag'], name='unique_tag_spending'),
+        ]
+
+
+class LineItem(models.Model):
+    """Typed copy of one entry of Receipt.items, kept by receipt.line_items."""
+    receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='line_items')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    position = models.PositiveSmallIntegerField()
+    name = models.CharField(max_length=255, blank=True)
+    quantity = models.DecimalField(max_digits=12, decimal_places=3, null=True)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['receipt', 'position'], name='unique_line_item_position'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'name'], name='line_item_user_name_idx'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='line_item_name_trgm_idx'),
+        ]
+
+
+class OutboxEmail(models.Model):
+    """Email accepted by core.outbox.OutboxBackend, waiting for the outbox worker."""
+    STATUS_QUEUED = 'queued'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    from_email = models.CharField(max_length=320)
+    recipients = models.JSONField()
+    subject = models.CharField(max_length=998, blank=True)
+    message = models.BinaryField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
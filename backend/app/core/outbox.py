@@ -0,0 +1,218 @@
+"""
+Outgoing email outbox.
+
+With EMAIL_BACKEND = 'core.outbox.OutboxBackend', send_mail(),
+EmailMessage.send() and PasswordResetForm.save() only store the rendered
+message. `manage.py outbox_worker` delivers it through
+OUTBOX_DELIVERY_BACKEND, reusing one SMTP connection across messages and
+batches and retrying temporary failures with exponential backoff.
+"""
+import logging
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import EmailMessage
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min
+from django.utils.timezone import now
+
+from core.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Email backend that queues messages in the OutboxEmail table."""
+
+    def send_messages(self, email_messages):
+        rows = []
+        for message in email_messages:
+            recipients = message.recipients()
+            if not recipients:
+                continue
+            try:
+                rows.append(OutboxEmail(
+                    from_email=message.from_email,
+                    recipients=recipients,
+                    subject=str(message.subject)[:998],
+                    message=message.message().as_bytes(linesep='\n'),
+                ))
+            except Exception:
+                if not self.fail_silently:
+                    raise
+        OutboxEmail.objects.bulk_create(rows)
+        return len(rows)
+
+
+class RawMessage:
+    """The stored MIME bytes, in the shape the SMTP backend serializes."""
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    def as_bytes(self, linesep='\n'):
+        return self.data.replace(b'\n', linesep.encode())
+
+
+class StoredEmailMessage(EmailMessage):
+    """An EmailMessage whose body was rendered when it was queued."""
+
+    def __init__(self, row):
+        super().__init__(subject=row.subject, from_email=row.from_email, to=row.recipients)
+        self.row = row
+
+    def message(self):
+        return RawMessage(self.row.message)
+
+
+def is_permanent(exc):
+    """A failure that retrying the same message won't fix."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+
+def retry_delay(attempts):
+    return min(settings.OUTBOX_RETRY_BASE * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX)
+
+
+def outbox_stats():
+    """Queue depth and delivery totals, read from the table."""
+    counts = dict(
+        OutboxEmail.objects.values_list('status').annotate(n=Count('id')).order_by()
+    )
+    oldest = OutboxEmail.objects.filter(status=OutboxEmail.STATUS_QUEUED).aggregate(
+        oldest=Min('created_at')
+    )['oldest']
+    return {
+        'queued': counts.get(OutboxEmail.STATUS_QUEUED, 0),
+        'sent': counts.get(OutboxEmail.STATUS_SENT, 0),
+        'failed': counts.get(OutboxEmail.STATUS_FAILED, 0),
+        'oldest_queued_age_s': round((now() - oldest).total_seconds(), 1) if oldest else 0.0,
+    }
+
+
+class OutboxWorker:
+    """Claims due outbox rows in batches and sends them over one connection.
+
+    Rows stay locked (select_for_update with skip_locked) while their batch
+    is sent, so several workers can drain the table side by side. Delivery
+    is at-least-once: a worker killed mid-batch leaves its rows queued.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_connection(settings.OUTBOX_DELIVERY_BACKEND)
+        self.is_open = False
+        self.last_used = 0.0
+        self._sent = 0
+        self._failed = 0
+        self._retried = 0
+        self._batches = 0
+        self._connections = 0
+        self._send_total = 0.0
+        self._send_max = 0.0
+
+    def open(self):
+        if not self.is_open:
+            self.connection.open()
+            self.is_open = True
+            self._connections += 1
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            try:
+                self.connection.close()
+            except Exception:
+                logger.exception('Closing the outbox connection failed')
+
+    def run_once(self):
+        """Send one batch of due messages; return how many rows were handled."""
+        with transaction.atomic():
+            rows = list(
+                OutboxEmail.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=OutboxEmail.STATUS_QUEUED, next_attempt_at__lte=now())
+                .order_by('next_attempt_at', 'id')[:settings.OUTBOX_BATCH_SIZE]
+            )
+            for row in rows:
+                self.deliver(row)
+        if rows:
+            self._batches += 1
+            self.last_used = time.monotonic()
+        return len(rows)
+
+    def deliver(self, row):
+        row.attempts += 1
+        started = time.perf_counter()
+        try:
+            self.send(StoredEmailMessage(row))
+        except Exception as exc:
+            # smtplib resets the session after a refusal; anything else may
+            # have left the connection unusable, so reopen for the next row.
+            if not isinstance(exc, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                self.close()
+            self.failed(row, exc)
+        else:
+            elapsed = time.perf_counter() - started
+            self._send_total += elapsed
+            self._send_max = max(self._send_max, elapsed)
+            self._sent += 1
+            row.status = OutboxEmail.STATUS_SENT
+            row.sent_at = now()
+            row.last_error = ''
+            row.message = b''
+        row.save(update_fields=['attempts', 'status', 'sent_at', 'next_attempt_at', 'last_error', 'message'])
+
+    def send(self, message):
+        reused = self.is_open
+        self.open()
+        try:
+            self.connection.send_messages([message])
+        except smtplib.SMTPServerDisconnected:
+            if not reused:
+                raise
+            # The server dropped a connection we kept open; reconnect once.
+            self.close()
+            self.open()
+            self.connection.send_messages([message])
+
+    def failed(self, row, exc):
+        row.last_error = f'{type(exc).__name__}: {exc}'[:2000]
+        if is_permanent(exc) or row.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            logger.warning('Outbox email %s failed: %s', row.pk, row.last_error)
+            row.status = OutboxEmail.STATUS_FAILED
+            self._failed += 1
+        else:
+            row.next_attempt_at = now() + timedelta(seconds=retry_delay(row.attempts))
+            self._retried += 1
+
+    def run_forever(self, max_batches=None):
+        try:
+            while max_batches is None or self._batches < max_batches:
+                close_old_connections()
+                if self.run_once():
+                    continue
+                if self.is_open and time.monotonic() - self.last_used > settings.OUTBOX_IDLE_TIMEOUT:
+                    self.close()
+                time.sleep(settings.OUTBOX_POLL_INTERVAL)
+        finally:
+            self.close()
+
+    def stats(self):
+        sent = self._sent
+        return {
+            'sent': sent,
+            'failed': self._failed,
+            'retried': self._retried,
+            'batches': self._batches,
+            'connections': self._connections,
+            'send_avg_s': round(self._send_total / sent, 4) if sent else 0.0,
+            'send_max_s': round(self._send_max, 4),
+        }
@@ -0,0 +1,106 @@
+"""
+Tests for the admission control of the heavy endpoints.
+"""
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.admission import ConcurrencyLimiter, Overloaded, TokenBucketThrottle, reset_limiters
+
+EXPORT_URL = '/api/receipt/export-csv/'
+LIST_URL = '/api/receipt/list'
+
+
+class ConcurrencyLimiterTests(SimpleTestCase):
+
+    def test_sheds_when_slots_and_queue_are_full(self):
+        limiter = ConcurrencyLimiter('test', concurrency=1, queue=0)
+        limiter.acquire()
+
+        with self.assertRaises(Overloaded) as ctx:
+            limiter.acquire()
+
+        self.assertGreaterEqual(ctx.exception.wait, 1)
+        limiter.release(0.1)
+        limiter.acquire()
+        self.assertEqual(limiter.stats()['shed'], 1)
+
+    def test_queued_request_gets_the_freed_slot(self):
+        limiter = ConcurrencyLimiter('test', concurrency=1, queue=1, timeout=5)
+        limiter.acquire()
+        admitted = threading.Event()
+
+        def waiter():
+            limiter.acquire()
+            admitted.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        while limiter.stats()['waiting'] == 0:
+            time.sleep(0.01)
+        self.assertFalse(admitted.is_set())
+        limiter.release(0.1)
+        thread.join(5)
+
+        self.assertTrue(admitted.is_set())
+        self.assertEqual(limiter.stats()['active'], 1)
+
+    def test_queue_wait_times_out(self):
+        limiter = ConcurrencyLimiter('test', concurrency=1, queue=1, timeout=0.05)
+        limiter.acquire()
+
+        with self.assertRaises(Overloaded):
+            limiter.acquire()
+
+        self.assertEqual(limiter.stats()['timed_out'], 1)
+        self.assertEqual(limiter.stats()['waiting'], 0)
+
+
+class AdmissionApiTests(TestCase):
+
+    def setUp(self):
+        caches['throttle'].clear()
+        reset_limiters()
+        self.addCleanup(reset_limiters)
+        self.user = get_user_model().objects.create_user(email='admit@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @patch.dict(TokenBucketThrottle.THROTTLE_RATES, {'exports': '2/min'})
+    def test_empty_bucket_is_429_with_retry_after(self):
+        responses = [self.client.get(EXPORT_URL) for _ in range(3)]
+
+        self.assertEqual([r.status_code for r in responses[:2]], [status.HTTP_200_OK] * 2)
+        self.assertEqual(responses[2].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(responses[2]['Retry-After'], '30')
+        self.assertEqual(self.client.get(LIST_URL).status_code, status.HTTP_200_OK)
+
+    @patch.dict(TokenBucketThrottle.THROTTLE_RATES, {'exports': '2/min'})
+    def test_bucket_refills_over_time_and_per_user(self):
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1000.0):
+            self.client.get(EXPORT_URL)
+            self.client.get(EXPORT_URL)
+            self.assertEqual(self.client.get(EXPORT_URL).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            other = APIClient()
+            other.force_authenticate(get_user_model().objects.create_user(email='other@example.com'))
+            self.assertEqual(other.get(EXPORT_URL).status_code, status.HTTP_200_OK)
+
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1030.0):
+            self.assertEqual(self.client.get(EXPORT_URL).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(EXPORT_URL).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(ADMISSION_LIMITS={'exports': {'concurrency': 0, 'queue': 0, 'timeout': 0}})
+    def test_saturated_class_is_503_while_others_serve(self):
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.data['detail'].code, 'overloaded')
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(self.client.get(LIST_URL).status_code, status.HTTP_200_OK)
@@ -0,0 +1,41 @@
+"""
+Tests for the database connection pool.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+POOL_STATS_URL = '/api/db/pool/stats'
+
+
+class DBPoolTests(TestCase):
+    """Test pooled connections and their stats endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_connections_come_from_pool(self):
+        self.assertIsNotNone(connection.pool)
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 0)
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+
+    def test_stats_for_admin(self):
+        admin = get_user_model().objects.create_superuser('admin@example.com', 'testpass123')
+        self.client.force_authenticate(user=admin)
+
+        res = self.client.get(POOL_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['enabled'])
+        self.assertEqual(res.data['pool_max'], connection.pool.max_size)
+        self.assertIn('wait_avg_ms', res.data)
+
+    def test_stats_admin_only(self):
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(POOL_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,272 @@
+"""
+Tests for the email outbox and its worker, against a local SMTP stand-in.
+"""
+import email
+import socketserver
+import threading
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail import EmailMessage, get_connection
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import OutboxEmail
+from core.outbox import OutboxWorker, outbox_stats
+from receipt.tests.test_receipt_api import create_receipt
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; replies come from the server's settings."""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                address = line.split(':', 1)[1].strip('<> ')
+                refused = address in server.refused
+                if not refused:
+                    recipients.append(address)
+                self.reply('550 No such user' if refused else '250 OK')
+            elif command == 'DATA':
+                self.reply('354 Go ahead')
+                data = []
+                for raw in self.rfile:
+                    if raw == b'.\r\n':
+                        break
+                    data.append(raw)
+                code = server.data_replies.pop(0) if server.data_replies else '250 Queued'
+                if code.startswith('250'):
+                    server.messages.append((recipients, b''.join(data)))
+                self.reply(code)
+                if server.drop_after_data:
+                    server.drop_after_data -= 1
+                    return
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.refused = set()
+        self.data_replies = []
+        self.drop_after_data = 0
+
+
+class OutboxTestCase(TestCase):
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.smtp = SMTPStandIn()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        settings = override_settings(
+            EMAIL_BACKEND='core.outbox.OutboxBackend',
+            OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            OUTBOX_RETRY_BASE=30,
+            OUTBOX_MAX_ATTEMPTS=3,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def queue(self, count, to='user@example.com'):
+        connection = get_connection()
+        for i in range(count):
+            message = EmailMessage(f'Subject {i}', f'Body {i}', 'app@example.com', [to], connection=connection)
+            message.attach('receipts.csv', 'a,b\n1,2\n', 'text/csv')
+            message.send()
+
+    def worker(self):
+        worker = OutboxWorker()
+        self.addCleanup(worker.close)
+        return worker
+
+
+class OutboxBackendTests(OutboxTestCase):
+    """Test sending mail only queues it."""
+
+    def test_send_queues_without_connecting(self):
+        self.queue(2)
+
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.STATUS_QUEUED).count(), 2)
+        self.assertEqual(self.smtp.connections, 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_send_csv_enqueues(self):
+        user = get_user_model().objects.create_user(email='outbox@example.com', password='testpass123')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        create_receipt(user)
+
+        res = client.post('/api/receipt/send-csv/')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        row = OutboxEmail.objects.get()
+        self.assertEqual(row.recipients, ['outbox@example.com'])
+        self.assertIn(b'receipts.zip', bytes(row.message))
+        self.assertEqual(self.smtp.connections, 0)
+
+    def test_forgot_password_enqueues(self):
+        get_user_model().objects.create_user(email='forgot@example.com', password='testpass123')
+
+        res = APIClient().post('/api/user/forgot-password/', {'email': 'forgot@example.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(OutboxEmail.objects.get().recipients, ['forgot@example.com'])
+
+
+class OutboxWorkerTests(OutboxTestCase):
+    """Test delivery, retries and connection reuse."""
+
+    def test_batch_over_one_connection(self):
+        self.queue(5)
+        worker = self.worker()
+
+        self.assertEqual(worker.run_once(), 5)
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 5)
+        recipients, data = self.smtp.messages[0]
+        parsed = email.message_from_bytes(data)
+        self.assertEqual(recipients, ['user@example.com'])
+        self.assertEqual(parsed['Subject'], 'Subject 0')
+        self.assertEqual(parsed.get_payload()[1].get_filename(), 'receipts.csv')
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENT).count(), 5)
+        self.assertEqual(worker.stats()['sent'], 5)
+
+    def test_connection_kept_across_batches(self):
+        worker = self.worker()
+        self.queue(2)
+        worker.run_once()
+        self.queue(2)
+        worker.run_once()
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 4)
+
+    @override_settings(OUTBOX_BATCH_SIZE=2)
+    def test_batch_size(self):
+        self.queue(3)
+        worker = self.worker()
+
+        self.assertEqual(worker.run_once(), 2)
+        self.assertEqual(worker.run_once(), 1)
+        self.assertEqual(worker.run_once(), 0)
+
+    def test_temporary_failure_is_retried_later(self):
+        self.smtp.data_replies = ['451 Try again later']
+        self.queue(2)
+        worker = self.worker()
+
+        worker.run_once()
+
+        retry = OutboxEmail.objects.get(status=OutboxEmail.STATUS_QUEUED)
+        self.assertEqual(retry.attempts, 1)
+        self.assertIn('451', retry.last_error)
+        self.assertGreater(retry.next_attempt_at, now() + timedelta(seconds=25))
+        self.assertEqual(worker.run_once(), 0)
+
+        OutboxEmail.objects.update(next_attempt_at=now())
+        worker.run_once()
+
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENT).count(), 2)
+        self.assertEqual(self.smtp.connections, 1)
+
+    def test_backoff_grows_and_gives_up(self):
+        self.smtp.data_replies = ['451 Try again later'] * 3
+        self.queue(1)
+        worker = self.worker()
+        delays = []
+
+        for _ in range(3):
+            started = now()
+            worker.run_once()
+            row = OutboxEmail.objects.get()
+            delays.append((row.next_attempt_at - started).total_seconds())
+            OutboxEmail.objects.update(next_attempt_at=now())
+
+        self.assertEqual(row.status, OutboxEmail.STATUS_FAILED)
+        self.assertEqual(row.attempts, 3)
+        self.assertAlmostEqual(delays[1] / delays[0], 2, delta=0.1)
+
+    def test_permanent_failure(self):
+        self.smtp.refused = {'gone@example.com'}
+        self.queue(1, to='gone@example.com')
+        self.queue(1)
+        worker = self.worker()
+
+        worker.run_once()
+
+        failed = OutboxEmail.objects.get(status=OutboxEmail.STATUS_FAILED)
+        self.assertEqual(failed.recipients, ['gone@example.com'])
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(len(self.smtp.messages), 1)
+        self.assertEqual(self.smtp.connections, 1)
+
+    def test_reconnects_when_server_drops_connection(self):
+        self.smtp.drop_after_data = 1
+        self.queue(3)
+        worker = self.worker()
+
+        worker.run_once()
+
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENT).count(), 3)
+        self.assertEqual(self.smtp.connections, 2)
+        self.assertEqual(worker.stats()['retried'], 0)
+
+    def test_server_down_is_retried(self):
+        self.queue(1)
+        self.smtp.shutdown()
+        self.smtp.server_close()
+        worker = self.worker()
+
+        worker.run_once()
+
+        row = OutboxEmail.objects.get()
+        self.assertEqual((row.status, row.attempts), (OutboxEmail.STATUS_QUEUED, 1))
+        self.assertIn('ConnectionRefusedError', row.last_error)
+
+    def test_outbox_stats(self):
+        self.smtp.refused = {'gone@example.com'}
+        self.queue(1, to='gone@example.com')
+        self.queue(2)
+        self.worker().run_once()
+        self.queue(1)
+
+        stats = outbox_stats()
+
+        self.assertEqual((stats['queued'], stats['sent'], stats['failed']), (1, 2, 1))
@@ -0,0 +1,120 @@
+"""
+Tests for the token blacklist Bloom filter and pruning.
+"""
+import json
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.authentication import VersionedRefreshToken
+from core.token_blacklist import BloomFilter, blacklist_filter, prune_expired_tokens
+
+REFRESH_URL = reverse('user:token_refresh')
+
+
+class BloomFilterTests(SimpleTestCase):
+
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(2000, error_rate=0.01)
+        members = [uuid.uuid4().hex for _ in range(2000)]
+        for member in members:
+            bloom.add(member)
+
+        self.assertTrue(all(member in bloom for member in members))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class BlacklistFilterTests(TestCase):
+
+    def setUp(self):
+        blacklist_filter.clear()
+        self.user = get_user_model().objects.create_user(email='bloom@example.com', password='testpass123')
+        self.client = APIClient()
+
+    def test_unlisted_token_skips_blacklist_query(self):
+        token = str(VersionedRefreshToken.for_user(self.user))
+        blacklist_filter.might_contain('warm-up')
+
+        with self.assertNumQueries(0):
+            VersionedRefreshToken(token)
+
+        self.assertEqual(blacklist_filter.stats()['db_checks'], 0)
+
+    def test_rotated_token_cannot_be_reused(self):
+        refresh = str(VersionedRefreshToken.for_user(self.user))
+
+        first = self.client.post(REFRESH_URL, {'refresh': refresh})
+        second = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('refresh', first.data)
+        self.assertEqual(second.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_blacklisted_by_another_process_is_picked_up(self):
+        token = VersionedRefreshToken.for_user(self.user)
+        blacklist_filter.might_contain('warm-up')
+        # Blacklisted without going through this process's filter.
+        RefreshToken(str(token)).blacklist()
+        self.addCleanup(setattr, blacklist_filter, 'refresh_interval', blacklist_filter.refresh_interval)
+        blacklist_filter.refresh_interval = 0
+
+        with self.assertRaises(TokenError):
+            VersionedRefreshToken(str(token))
+
+    def test_rebuild_loads_unexpired_blacklisted_tokens(self):
+        token = VersionedRefreshToken.for_user(self.user)
+        RefreshToken(str(token)).blacklist()
+        blacklist_filter.clear()
+
+        with self.assertRaises(TokenError):
+            VersionedRefreshToken(str(token))
+
+        self.assertEqual(blacklist_filter.stats()['items'], 1)
+
+
+class PruneTokenBlacklistTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='prune@example.com', password='testpass123')
+
+    def outstanding(self, expires_in, blacklisted=False):
+        token = OutstandingToken.objects.create(
+            user=self.user, jti=uuid.uuid4().hex, token='token',
+            created_at=now(), expires_at=now() + expires_in,
+        )
+        if blacklisted:
+            BlacklistedToken.objects.create(token=token)
+        return token
+
+    def test_prunes_only_expired_tokens_in_batches(self):
+        for i in range(5):
+            self.outstanding(timedelta(days=-1), blacklisted=i < 3)
+        kept = [self.outstanding(timedelta(days=1), blacklisted=True), self.outstanding(timedelta(days=1))]
+        out = StringIO()
+
+        call_command('prune_token_blacklist', '--batch-size', '2', '--pause', '0', stdout=out)
+
+        self.assertEqual(json.loads(out.getvalue()), {'outstanding': 5, 'blacklisted': 3, 'batches': 3})
+        self.assertCountEqual(OutstandingToken.objects.all(), kept)
+        self.assertEqual(BlacklistedToken.objects.get().token, kept[0])
+
+    def test_max_batches_bounds_a_run(self):
+        for _ in range(5):
+            self.outstanding(timedelta(days=-1))
+
+        deleted = prune_expired_tokens(batch_size=2, max_batches=1)
+
+        self.assertEqual(deleted['outstanding'], 2)
+        self.assertEqual(OutstandingToken.objects.count(), 3)
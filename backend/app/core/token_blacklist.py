@@ -0,0 +1,169 @@
+"""
+Fast membership checks and pruning for simplejwt's token_blacklist tables.
+
+With ROTATE_REFRESH_TOKENS and BLACKLIST_AFTER_ROTATION every refresh
+writes an OutstandingToken for the new refresh token and a BlacklistedToken
+for the old one, and checks the blacklist before that. Almost every check
+comes back negative, so each process keeps a Bloom filter of the JTIs that
+are blacklisted and not yet expired, and only asks the database when the
+filter says "maybe". The filter is rebuilt every
+TOKEN_BLACKLIST_FILTER_REBUILD seconds and tops up with newer rows every
+TOKEN_BLACKLIST_FILTER_REFRESH seconds (a primary key range scan). Tokens
+blacklisted by this process go in right away; a token rotated by another
+process can be replayed here until the next top-up.
+
+`prune_expired_tokens` removes expired rows from both tables in batches;
+see the prune_token_blacklist command.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+MIN_CAPACITY = 1024
+
+
+class BloomFilter:
+    """Set of strings with no false negatives and about `error_rate` false
+    positives while it holds at most `capacity` items."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: the k positions are h1 + i*h2 over one 128-bit digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class BlacklistFilter:
+    """Per-process Bloom filter over the blacklisted, unexpired refresh token JTIs."""
+
+    def __init__(self, refresh_interval=5, rebuild_interval=3600, error_rate=0.001):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._bloom = None
+            self._built_at = self._refreshed_at = 0.0
+            self._marks = (0, 0)
+            self.db_checks = self.skipped_checks = 0
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def might_contain(self, jti):
+        """False when `jti` is certainly not blacklisted (as of the last load)."""
+        with self._lock:
+            now = time.monotonic()
+            bloom = self._bloom
+            if bloom is None or now - self._built_at >= self.rebuild_interval or bloom.count > bloom.capacity:
+                self._rebuild(now)
+            elif now - self._refreshed_at >= self.refresh_interval:
+                self._load_newer(now)
+            found = jti in self._bloom
+            if found:
+                self.db_checks += 1
+            else:
+                self.skipped_checks += 1
+            return found
+
+    def _rebuild(self, now):
+        high_water = BlacklistedToken.objects.aggregate(Max('id'))['id__max'] or 0
+        jtis = list(
+            BlacklistedToken.objects
+            .filter(id__lte=high_water, token__expires_at__gt=aware_utcnow())
+            .values_list('token__jti', flat=True)
+        )
+        bloom = BloomFilter(max(MIN_CAPACITY, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._marks = (high_water, high_water)
+        self._built_at = self._refreshed_at = now
+
+    def _load_newer(self, now):
+        # Rows past the high water mark of the load before the last one, so a
+        # row whose id was taken before, but committed after, the last load
+        # is still picked up.
+        previous, last = self._marks
+        rows = BlacklistedToken.objects.filter(id__gt=previous).values_list('id', 'token__jti')
+        high_water = last
+        for row_id, jti in rows:
+            self._bloom.add(jti)
+            high_water = max(high_water, row_id)
+        self._marks = (last, high_water)
+        self._refreshed_at = now
+
+    def stats(self):
+        with self._lock:
+            bloom = self._bloom
+            return {
+                'items': bloom.count if bloom else 0,
+                'capacity': bloom.capacity if bloom else 0,
+                'bytes': len(bloom.bits) if bloom else 0,
+                'db_checks': self.db_checks,
+                'skipped_checks': self.skipped_checks,
+            }
+
+
+blacklist_filter = BlacklistFilter(
+    settings.TOKEN_BLACKLIST_FILTER_REFRESH,
+    settings.TOKEN_BLACKLIST_FILTER_REBUILD,
+    settings.TOKEN_BLACKLIST_FILTER_ERROR_RATE,
+)
+
+
+def prune_expired_tokens(batch_size=1000, max_batches=None, pause=0):
+    """Delete expired outstanding tokens, and their blacklist rows, `batch_size` at a time.
+
+    An expired token is rejected whether or not it is blacklisted, so both
+    rows can go. Each batch deletes at most `batch_size` rows per table by
+    primary key, which keeps row locks and WAL bursts small on big tables.
+    """
+    leeway = api_settings.LEEWAY
+    if not isinstance(leeway, timedelta):
+        leeway = timedelta(seconds=leeway)
+    cutoff = aware_utcnow() - leeway
+    deleted = {'outstanding': 0, 'blacklisted': 0, 'batches': 0}
+    while max_batches is None or deleted['batches'] < max_batches:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=cutoff)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        _, per_model = OutstandingToken.objects.filter(id__in=ids).only('id').delete()
+        deleted['outstanding'] += per_model.get(OutstandingToken._meta.label, 0)
+        deleted['blacklisted'] += per_model.get(BlacklistedToken._meta.label, 0)
+        deleted['batches'] += 1
+        if pause:
+            time.sleep(pause)
+    return deleted
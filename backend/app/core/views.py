@@ -0,0 +1,47 @@
+"""
+Views for the core app.
+"""
+from django.db import connection
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+from rest_framework import permissions
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.response import Response
+
+from core.admission import admission_stats_snapshot
+from core.authentication import CachedJWTAuthentication
+
+
+def db_pool_stats_snapshot():
+    """Size and wait counters of this process's database connection pool."""
+    pool = connection.pool
+    if pool is None:
+        return {'enabled': False}
+    stats = pool.get_stats()
+    requests = stats.get('requests_num', 0)
+    return {
+        'enabled': True,
+        **stats,
+        'wait_avg_ms': round(stats.get('requests_wait_ms', 0) / requests, 3) if requests else 0.0,
+    }
+
+
+@extend_schema(
+    responses={200: OpenApiTypes.OBJECT},
+    description="Database connection pool statistics for this worker process.",
+)
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([permissions.IsAdminUser])
+def db_pool_stats(request):
+    return Response(db_pool_stats_snapshot())
+
+
+@extend_schema(
+    responses={200: OpenApiTypes.OBJECT},
+    description="Concurrency limiter counters of the heavy endpoint classes for this worker process.",
+)
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([permissions.IsAdminUser])
+def admission_stats(request):
+    return Response(admission_stats_snapshot())
@@ -0,0 +1,183 @@
+"""
+OCR result cache keyed on image content.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import cv2
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from core.models import OCRCacheEntry
+
+
+def image_digest(data):
+    """SHA-256 of the encoded upload; identical retries share it."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def digest_key(digest):
+    return "sha256:" + digest
+
+
+def perceptual_hash(image, hash_size=16):
+    """Difference hash of a (warped) image as a hex string.
+
+    Unlike the byte digest it survives re-encoding and small resizes.
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):0{hash_size * hash_size // 4}x}"
+
+
+class LocMemResultCache:
+    """Per-process LRU cache with a TTL."""
+
+    def __init__(self, max_entries=1000, ttl=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileResultCache:
+    """JSON file per entry; file mtime tracks last use for LRU/TTL."""
+
+    def __init__(self, location=None, max_entries=10000, ttl=86400):
+        self.location = location or os.path.join(tempfile.gettempdir(), 'piggysnap-ocr-cache')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(self.location, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.location, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path) as fh:
+                value = json.load(fh)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(value, fh)
+        os.replace(tmp, path)
+        self._cull()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.location):
+            os.remove(os.path.join(self.location, name))
+
+    def _cull(self):
+        entries = [e for e in os.scandir(self.location) if e.name.endswith('.json')]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class DatabaseResultCache:
+    """Shared across processes and hosts via the OCRCacheEntry table."""
+
+    def __init__(self, max_entries=100000, ttl=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def get(self, key):
+        entry = OCRCacheEntry.objects.filter(key=key, expires_at__gt=now()).first()
+        if entry is None:
+            return None
+        OCRCacheEntry.objects.filter(key=key).update(accessed_at=now())
+        return entry.value
+
+    def set(self, key, value):
+        current = now()
+        OCRCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={
+                'value': value,
+                'accessed_at': current,
+                'expires_at': current + timedelta(seconds=self.ttl),
+            },
+        )
+        self._cull()
+
+    def delete(self, key):
+        OCRCacheEntry.objects.filter(key=key).delete()
+
+    def clear(self):
+        OCRCacheEntry.objects.all().delete()
+
+    def _cull(self):
+        OCRCacheEntry.objects.filter(expires_at__lte=now()).delete()
+        stale = (
+            OCRCacheEntry.objects.order_by('-accessed_at')
+            .values_list('accessed_at', flat=True)[self.max_entries:self.max_entries + 1]
+        )
+        if stale:
+            OCRCacheEntry.objects.filter(accessed_at__lte=stale[0]).delete()
+
+
+_cache = None
+
+
+def get_result_cache():
+    global _cache
+    if _cache is None:
+        config = settings.OCR_RESULT_CACHE
+        _cache = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _cache
@@ -0,0 +1,143 @@
+"""
+Process-wide pool of PaddleOCR engines.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class EnginePoolTimeout(Exception):
+    """Raised when no OCR engine becomes available in time."""
+
+
+def create_engine():
+    """Build a PaddleOCR engine, loading detection/cls/rec weights."""
+    from paddleocr import PaddleOCR
+
+    return PaddleOCR(use_angle_cls=True, lang='en')
+
+
+class OCREnginePool:
+    """Hands out at most `size` engines, constructing each one only once."""
+
+    def __init__(self, factory=create_engine, size=1, acquire_timeout=None):
+        if size < 1:
+            raise ValueError('OCR engine pool size must be at least 1')
+        self.factory = factory
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._cond = threading.Condition()
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._acquisitions = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        started = time.monotonic()
+        build = False
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._created >= self.size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._timeouts += 1
+                        raise EnginePoolTimeout(
+                            f'No OCR engine available after {timeout:.1f}s'
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+            if self._idle:
+                engine = self._idle.pop()
+            else:
+                # Reserve the slot now, construct outside the lock.
+                self._created += 1
+                build = True
+            self._in_use += 1
+
+        if build:
+            try:
+                engine = self.factory()
+            except BaseException:
+                with self._cond:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._acquisitions += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return engine
+
+    def release(self, engine):
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(engine)
+            self._cond.notify()
+
+    @contextmanager
+    def engine(self, timeout=None):
+        engine = self.acquire(timeout)
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def warm(self, count=None):
+        """Construct engines ahead of the first request."""
+        count = self.size if count is None else min(count, self.size)
+        engines = []
+        try:
+            # Holding `count` engines at once forces that many to be built.
+            for _ in range(count):
+                engines.append(self.acquire())
+        finally:
+            for engine in engines:
+                self.release(engine)
+
+    def stats(self):
+        with self._cond:
+            acquisitions = self._acquisitions
+            return {
+                'size': self.size,
+                'warm': self._created,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'acquisitions': acquisitions,
+                'timeouts': self._timeouts,
+                'wait_total_s': round(self._wait_total, 4),
+                'wait_avg_s': round(self._wait_total / acquisitions, 4) if acquisitions else 0.0,
+                'wait_max_s': round(self._wait_max, 4),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_engine_pool():
+    """Return this process's engine pool, building it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = OCREnginePool(
+                    size=settings.OCR_ENGINE_POOL_SIZE,
+                    acquire_timeout=settings.OCR_ENGINE_ACQUIRE_TIMEOUT,
+                )
+    return _pool
@@ -0,0 +1,158 @@
+"""
+Background OCR jobs: brokers and the worker that drains them.
+"""
+import logging
+import queue
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from core.models import OCRJob
+from . import pipeline
+from .cache import image_digest
+
+logger = logging.getLogger(__name__)
+
+
+def recover_stale_jobs():
+    """Requeue running jobs whose worker went away, or fail them when out of attempts.
+
+    Workers touch updated_at at every pipeline stage, so a running job left
+    alone for OCR_JOB_STALE_AFTER seconds belongs to a worker that died.
+    """
+    stale = OCRJob.objects.filter(
+        status=OCRJob.STATUS_RUNNING,
+        updated_at__lt=now() - timedelta(seconds=settings.OCR_JOB_STALE_AFTER),
+    )
+    failed = stale.filter(attempts__gte=settings.OCR_JOB_MAX_ATTEMPTS).update(
+        status=OCRJob.STATUS_FAILED,
+        error=f'Worker stopped responding; gave up after {settings.OCR_JOB_MAX_ATTEMPTS} attempts',
+        image=None, finished_at=now(), updated_at=now(),
+    )
+    requeued = stale.update(status=OCRJob.STATUS_QUEUED, stage='', progress=0, updated_at=now())
+    if failed or requeued:
+        logger.warning('Recovered stale OCR jobs: %s requeued, %s failed', requeued, failed)
+    return requeued, failed
+
+
+class DatabaseBroker:
+    """Uses the OCRJob table itself as the queue."""
+
+    def enqueue(self, job):
+        # Queued rows are picked up by polling workers; nothing to push.
+        pass
+
+    def claim(self, timeout=None):
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            recover_stale_jobs()
+            with transaction.atomic():
+                job = (
+                    OCRJob.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(status=OCRJob.STATUS_QUEUED)
+                    .order_by('created_at')
+                    .first()
+                )
+                if job is not None:
+                    job.status = OCRJob.STATUS_RUNNING
+                    job.attempts += 1
+                    job.save(update_fields=['status', 'attempts', 'updated_at'])
+                    return job
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(settings.OCR_JOB_POLL_INTERVAL)
+
+
+class InProcessBroker:
+    """Keeps job ids in a local queue; a stand-in for tests and development."""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def enqueue(self, job):
+        self.queue.put(job.pk)
+
+    def claim(self, timeout=None):
+        try:
+            pk = self.queue.get(timeout=timeout) if timeout else self.queue.get_nowait()
+        except queue.Empty:
+            return None
+        job = OCRJob.objects.get(pk=pk)
+        job.status = OCRJob.STATUS_RUNNING
+        job.attempts += 1
+        job.save(update_fields=['status', 'attempts', 'updated_at'])
+        return job
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.OCR_JOB_BROKER)()
+    return _broker
+
+
+def submit_job(user, data):
+    """Persist an uploaded image as a queued job and hand it to the broker."""
+    # A copy: `data` may be an mmap that upload_buffer closes after this
+    # returns, and a live memoryview on it would keep it from closing.
+    job = OCRJob.objects.create(user=user, image=bytes(data))
+    get_broker().enqueue(job)
+    return job
+
+
+def run_job(job):
+    def progress(stage, percent):
+        job.stage = stage
+        job.progress = percent
+        job.save(update_fields=['stage', 'progress', 'updated_at'])
+
+    try:
+        data = job.image
+        digest = image_digest(data)
+        result = pipeline.process_image(data, progress, digest=digest, user=job.user)
+        receipt = pipeline.save_receipt(job.user, result["entitiesStructured"], digest)
+    except pipeline.ReceiptNotDetected as exc:
+        job.status = OCRJob.STATUS_FAILED
+        job.error = str(exc)
+    except Exception as exc:
+        logger.exception('OCR job %s failed', job.pk)
+        job.status = OCRJob.STATUS_FAILED
+        job.error = f'{type(exc).__name__}: {exc}'
+    else:
+        job.status = OCRJob.STATUS_DONE
+        job.result = result
+        job.receipt = receipt
+        job.progress = 100
+    job.image = None
+    job.finished_at = now()
+    job.save()
+    return job
+
+
+class OCRWorker:
+    """Claims jobs from a broker and runs them one at a time."""
+
+    def __init__(self, broker=None):
+        self.broker = broker or get_broker()
+        self.processed = 0
+
+    def run_once(self, timeout=None):
+        job = self.broker.claim(timeout)
+        if job is None:
+            return None
+        run_job(job)
+        self.processed += 1
+        return job
+
+    def run_forever(self, max_jobs=None):
+        while max_jobs is None or self.processed < max_jobs:
+            close_old_connections()
+            self.run_once(timeout=settings.OCR_JOB_POLL_INTERVAL)
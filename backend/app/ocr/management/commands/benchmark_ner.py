@@ -0,0 +1,87 @@
+"""
+Django command to compare trimmed NER pipelines against the full model
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ocr.nlp import PIPELINE_FULL, PIPELINE_MODES, excluded_components, load_model
+
+SAMPLE_RECEIPTS = [
+    "LIDL DISCOUNT SRL\nCIF RO22891860\nLAPTE 1.5% 1L\n2 BUC x 5,99\n11,98 B\nPAINE FELIATA\n1 BUC x 4,49\n4,49 B\nTOTAL 16,47",
+    "KAUFLAND ROMANIA SCS\nBANANE\n1,245 KG x 6,99\n8,70 A\nCAFEA MACINATA 250G\n1 BUC x 18,90\n18,90 A\nTOTAL LEI 27,60",
+    "MEGA IMAGE\nAPA MINERALA 2L\n3 BUC x 3,20\n9,60 B\nTOTAL 9,60\nCARD 9,60",
+    "PROFI ROM FOOD\nOUA M 10 BUC\n1 BUC x 12,50\n12,50 B\nUNT 82% 200G\n2 BUC x 9,99\n19,98 B\nSUBTOTAL 32,48\nTOTAL 32,48",
+]
+
+
+def read_corpus(path):
+    """Receipts in the file are separated by blank lines."""
+    with open(path, encoding='utf-8') as fh:
+        return [block.strip() for block in fh.read().split('\n\n') if block.strip()]
+
+
+def entities(doc):
+    return [(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents]
+
+
+def time_docs(nlp, texts, repeat):
+    docs, timings = [], []
+    for _ in range(repeat):
+        docs = []
+        for text in texts:
+            started = time.perf_counter()
+            docs.append(nlp(text))
+            timings.append((time.perf_counter() - started) * 1000)
+    return docs, timings
+
+
+class Command(BaseCommand):
+    """Check trimmed pipelines produce the full model's entities, and time them."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help='Text file of OCR output, receipts separated by blank lines.')
+        parser.add_argument('--mode', action='append', choices=PIPELINE_MODES[1:],
+                            help='Trimmed mode(s) to compare; defaults to all.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        texts = read_corpus(options['corpus']) if options['corpus'] else SAMPLE_RECEIPTS
+        modes = options['mode'] or list(PIPELINE_MODES[1:])
+        path = settings.OCR_NER_MODEL_PATH
+        repeat = options['repeat']
+
+        full_docs, full_timings = time_docs(load_model(path), texts, repeat)
+        expected = [entities(doc) for doc in full_docs]
+        self.report(PIPELINE_FULL, (), full_timings)
+
+        mismatched = []
+        for mode in modes:
+            excluded = excluded_components(path, mode)
+            docs, timings = time_docs(load_model(path, excluded), texts, repeat)
+            self.report(mode, excluded, timings, statistics.mean(full_timings))
+
+            diffs = [i for i, doc in enumerate(docs) if entities(doc) != expected[i]]
+            if diffs:
+                mismatched.append(mode)
+                self.stdout.write(self.style.ERROR(
+                    f'  {len(diffs)}/{len(texts)} docs differ from full pipeline, e.g. #{diffs[0]}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'  entities identical on {len(texts)} docs'))
+
+        if mismatched:
+            raise CommandError(f'Entity output differs for: {", ".join(mismatched)}')
+
+    def report(self, mode, excluded, timings, baseline=None):
+        mean = statistics.mean(timings)
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else mean
+        line = f'{mode:12} mean {mean:7.2f} ms/doc  p95 {p95:7.2f} ms'
+        if baseline:
+            line += f'  ({baseline / mean:.1f}x vs full)'
+        self.stdout.write(line)
+        if excluded:
+            self.stdout.write(f'  excluded: {", ".join(excluded)}')
@@ -0,0 +1,44 @@
+"""
+Django command to run background OCR workers
+"""
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ocr.jobs import OCRWorker
+
+
+def _work(max_jobs):
+    OCRWorker().run_forever(max_jobs=max_jobs)
+
+
+class Command(BaseCommand):
+    """Django command to drain the OCR job queue."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help='Exit each worker after this many jobs.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        processes = options['processes']
+        max_jobs = options['max_jobs']
+        self.stdout.write(f'Starting {processes} OCR worker(s)')
+        if processes == 1:
+            _work(max_jobs)
+            return
+
+        # Children must open their own database connections and pools.
+        connections.close_all()
+        for connection in connections.all():
+            connection.close_pool()
+        workers = [
+            multiprocessing.Process(target=_work, args=(max_jobs,), daemon=True)
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,148 @@
+"""
+Registry for the receipt NER model.
+
+The model is loaded on first use rather than at import, so management
+commands that never run NER don't pay for it. Call `preload()` in a
+pre-fork master to share the loaded weights with forked workers.
+
+Entity extraction only reads `doc.ents`, so by default only the components
+whose output can change the entities are loaded (see `ner_dependencies`).
+"""
+import gc
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+PIPELINE_FULL = 'full'
+PIPELINE_NER = 'ner'
+PIPELINE_NER_MINIMAL = 'ner-minimal'
+PIPELINE_MODES = (PIPELINE_FULL, PIPELINE_NER, PIPELINE_NER_MINIMAL)
+
+# What the entity recognizer reads besides its own embedding features:
+# sentence starts (entities never cross them) and preset entities.
+NER_READS = {'token.is_sent_start', 'doc.ents', 'token.ent_iob', 'token.ent_type'}
+
+_models = {}
+_lock = threading.Lock()
+
+
+def _walk_model(block, attrs, upstreams):
+    """Collect embedding attributes and listened-to components of a model config."""
+    if not isinstance(block, dict):
+        return
+    architecture = block.get('@architectures', '')
+    if architecture.startswith('spacy.Tok2VecListener'):
+        upstreams.add(block.get('upstream', '*'))
+    if 'attrs' in block and isinstance(block['attrs'], list):
+        attrs.update(f'token.{attr.lower()}' for attr in block['attrs'])
+    for value in block.values():
+        _walk_model(value, attrs, upstreams)
+
+
+def _assigns(nlp_blank, model_path, name, component):
+    """Attributes a component may write; None when that can't be determined."""
+    factory = component.get('factory')
+    if factory == 'attribute_ruler':
+        import srsly
+
+        patterns_path = Path(model_path) / name / 'patterns'
+        if not patterns_path.exists():
+            return None
+        return {
+            f'token.{attr.lower()}'
+            for pattern in srsly.read_msgpack(patterns_path)
+            for attr in pattern['attrs']
+        }
+    try:
+        return set(nlp_blank.get_factory_meta(factory).assigns)
+    except ValueError:
+        return None
+
+
+def ner_dependencies(model_path, mode=PIPELINE_NER, target='ner'):
+    """Names of the components `target` needs to produce identical entities.
+
+    Walks the model's config.cfg without loading any weights: a component is
+    needed if `target` listens to it, or if it runs earlier and assigns an
+    attribute `target` (or another needed component) reads. In
+    PIPELINE_NER_MINIMAL mode sentence boundaries are ignored, which drops
+    the parser but can change entities that span a parser-detected boundary;
+    check with `manage.py benchmark_ner` before enabling it.
+    """
+    import spacy
+    from spacy.util import load_config
+
+    config = load_config(Path(model_path) / 'config.cfg')
+    nlp_blank = spacy.blank(config['nlp']['lang'])
+    disabled = set(config['nlp'].get('disabled', []))
+    active = [name for name in config['nlp']['pipeline'] if name not in disabled]
+    components = config['components']
+
+    needed = {target}
+    pending = [target]
+    while pending:
+        name = pending.pop()
+        reads, upstreams = set(), set()
+        _walk_model(components[name].get('model', {}), reads, upstreams)
+        if name == target:
+            reads |= NER_READS
+            if mode == PIPELINE_NER_MINIMAL:
+                reads.discard('token.is_sent_start')
+
+        for other in active[:active.index(name)]:
+            if other in needed:
+                continue
+            assigns = _assigns(nlp_blank, model_path, other, components[other])
+            if '*' in upstreams or other in upstreams or assigns is None or assigns & reads:
+                needed.add(other)
+                pending.append(other)
+    return needed
+
+
+def excluded_components(model_path, mode):
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f'Unknown NER pipeline mode {mode!r}; expected one of {PIPELINE_MODES}')
+    if mode == PIPELINE_FULL:
+        return ()
+    from spacy.util import load_config
+
+    pipeline = load_config(Path(model_path) / 'config.cfg')['nlp']['pipeline']
+    needed = ner_dependencies(model_path, mode)
+    return tuple(name for name in pipeline if name not in needed)
+
+
+def load_model(path, exclude=()):
+    import spacy
+
+    return spacy.load(path, exclude=list(exclude))
+
+
+def get_nlp(mode=None):
+    """Return this process's NER pipeline, loading it on first call."""
+    mode = mode or settings.OCR_NER_PIPELINE
+    key = (settings.OCR_NER_MODEL_PATH, mode)
+    nlp = _models.get(key)
+    if nlp is None:
+        with _lock:
+            nlp = _models.get(key)
+            if nlp is None:
+                path = settings.OCR_NER_MODEL_PATH
+                nlp = _models[key] = load_model(path, excluded_components(path, mode))
+    return nlp
+
+
+def preload():
+    """Load the model now and move it out of the GC's tracked generations.
+
+    gc.freeze() keeps the collector from touching (and thereby copying)
+    the model's pages in forked children.
+    """
+    nlp = get_nlp()
+    gc.collect()
+    gc.freeze()
+    return nlp
+
+
+def is_loaded():
+    return bool(_models)
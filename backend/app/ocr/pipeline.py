@@ -0,0 +1,267 @@
+"""
+Receipt OCR pipeline: deskew, recognize, extract entities.
+"""
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from core.models import Receipt
+from .cache import digest_key, get_result_cache, image_digest, perceptual_hash
+from .engine import get_engine_pool
+from .nlp import get_nlp
+from .preprocessing import ReceiptNotDetected, deskew_receipt
+
+logger = logging.getLogger(__name__)
+
+
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def decode_image(data, size=None):
+    """Decode straight from a bytes-like buffer (bytes, memoryview, mmap).
+
+    When the header size is known, very large photos are decoded at a
+    reduced scale that still keeps OCR_DECODE_MIN_SIDE pixels on the long side.
+    """
+    flag = cv2.IMREAD_COLOR
+    if size is not None:
+        for factor, reduced in REDUCED_DECODE_FLAGS:
+            if max(size) // factor >= settings.OCR_DECODE_MIN_SIDE:
+                flag = reduced
+                break
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if image is None:
+        raise ReceiptNotDetected("Image could not be decoded")
+    return image
+
+
+def deskew(data, size=None):
+    deskewed = deskew_receipt(decode_image(data, size))
+    logger.debug("deskew timings (ms): %s", deskewed.timings)
+    return deskewed.image
+
+
+def deskew_many(datas, sizes=None):
+    """Decode and deskew images in parallel threads (OpenCV releases the GIL).
+
+    Returns a warped image or a ReceiptNotDetected instance per input.
+    """
+    def work(data, size):
+        try:
+            return deskew(data, size)
+        except ReceiptNotDetected as exc:
+            return exc
+
+    sizes = sizes or [None] * len(datas)
+    with ThreadPoolExecutor(max_workers=settings.OCR_BATCH_WORKERS) as executor:
+        return list(executor.map(work, datas, sizes))
+
+
+def recognize_text(warped):
+    with get_engine_pool().engine() as ocr_model:
+        result = ocr_model.ocr(warped, cls=True)
+    return lines_to_text(result)
+
+
+def recognize_many(warped_images):
+    """OCR several crops, holding one engine per batch instead of per image."""
+    texts = []
+    batch_size = settings.OCR_BATCH_SIZE
+    for start in range(0, len(warped_images), batch_size):
+        with get_engine_pool().engine() as ocr_model:
+            for warped in warped_images[start:start + batch_size]:
+                texts.append(lines_to_text(ocr_model.ocr(warped, cls=True)))
+    return texts
+
+
+def lines_to_text(result):
+    lines = []
+    for line in result:
+        line_text = " ".join([word_info[1][0] for word_info in line])
+        lines.append(line_text)
+    return "\n".join(lines)
+
+
+def process_image(data, progress=None, digest=None, user=None, size=None):
+    """Run the full pipeline on encoded image bytes, consulting the result cache.
+
+    `progress(stage, percent)` is called as each stage starts. Perceptual-hash
+    lookups are scoped to `user` since different receipts can look alike.
+    """
+    progress = progress or (lambda stage, percent: None)
+    cache = get_result_cache()
+    sha_key = digest_key(digest or image_digest(data))
+    result = cache.get(sha_key)
+    if result is not None:
+        return result
+
+    progress("deskew", 10)
+    warped = deskew(data, size)
+
+    phash_key = None
+    if settings.OCR_RESULT_CACHE_PHASH and user is not None:
+        phash_key = f"phash:{user.pk}:{perceptual_hash(warped)}"
+        result = cache.get(phash_key)
+        if result is not None:
+            cache.set(sha_key, result)
+            return result
+
+    progress("ocr", 30)
+    ocr_text = recognize_text(warped)
+
+    progress("ner", 80)
+    entities = extract_data_from_receipt(ocr_text)
+    result = {
+        "ocr_text": ocr_text,
+        "entities": entities,
+        "entitiesStructured": format_ner_entities(entities),
+    }
+    cache.set(sha_key, result)
+    if phash_key:
+        cache.set(phash_key, result)
+    return result
+
+
+def build_receipt(user, entitiesStructured, image_hash=''):
+    return Receipt(
+        user=user,
+        shop_name=entitiesStructured["store"].get("name", ""),
+        items=entitiesStructured["items"],
+        total=entitiesStructured["total"] if entitiesStructured["total"] else 0,
+        image_hash=image_hash,
+    )
+
+
+def save_receipt(user, entitiesStructured, image_hash):
+    """Create the receipt for an upload once; retries of the same image reuse it."""
+    existing = Receipt.objects.filter(user=user, image_hash=image_hash).first()
+    if existing is not None:
+        return existing
+    receipt = build_receipt(user, entitiesStructured, image_hash)
+    try:
+        with transaction.atomic():
+            receipt.save()
+    except IntegrityError:
+        return Receipt.objects.get(user=user, image_hash=image_hash)
+    return receipt
+
+
+def insert_receipts(receipts):
+    """Insert `receipts` in one statement, skipping images the user already has.
+
+    Returns the receipts that were inserted, with their pks set. Unlike
+    bulk_create(ignore_conflicts=True), this tells apart the receipts another
+    upload of the same image inserted first.
+    """
+    if not receipts:
+        return []
+    opts = Receipt._meta
+    fields = [field for field in opts.concrete_fields if not field.primary_key and not field.generated]
+    row = '(%s)' % ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {opts.db_table} ({', '.join(field.column for field in fields)})
+            VALUES {', '.join([row] * len(receipts))}
+            ON CONFLICT DO NOTHING
+            RETURNING {opts.pk.column}, image_hash
+            """,
+            [
+                field.get_db_prep_save(field.pre_save(receipt, True), connection)
+                for receipt in receipts
+                for field in fields
+            ],
+        )
+        inserted = {image_hash: pk for pk, image_hash in cursor.fetchall()}
+
+    created = []
+    for receipt in receipts:
+        if receipt.image_hash in inserted:
+            receipt.pk = inserted[receipt.image_hash]
+            receipt._state.adding = False
+            receipt._state.db = connection.alias
+            created.append(receipt)
+    return created
+
+
+def extract_data_from_receipt(text):
+    doc = get_nlp()(text)
+    return [(ent.text, ent.label_) for ent in doc.ents]
+
+
+def extract_data_from_receipts(texts):
+    return [
+        [(ent.text, ent.label_) for ent in doc.ents]
+        for doc in get_nlp().pipe(texts, batch_size=settings.OCR_BATCH_SIZE)
+    ]
+
+
+def split_quantity_string(quantity_string):
+    cleaned = quantity_string.replace(',', '.').replace(' ', '')
+    pattern = r"^([\d.]+)[A-Za-z\-]*[^\d]*([\d.]+)$"
+    match = re.match(pattern, cleaned)
+    if match:
+        quantity = match.group(1)
+        unit_price = match.group(2)
+        return quantity, unit_price
+    return quantity_string, None
+
+
+def clean_price_string(price_string):
+    cleaned = price_string.replace(',', '.').replace(' ', '')
+    match = re.search(r"[\d.]+", cleaned)
+    if match:
+        return match.group(0)
+    return price_string
+
+
+def format_ner_entities(entities):
+    store_name = None
+    items = []
+    totals = []
+    current_item = {}
+
+    for text, label in entities:
+        if label == "SHOPNAME" and store_name is None:
+            store_name = text
+
+        elif label == "QUANTITY":
+            quantity, unit_price = split_quantity_string(text)
+            current_item["quantity"] = quantity
+            if unit_price:
+                current_item["unit_price"] = unit_price
+            else:
+                current_item["unit_price"] = "Could not parse unit price"
+
+        elif label == "PRICE":
+            current_item["price"] = clean_price_string(text)
+
+        elif label == "PRODUCT":
+            current_item["name"] = text
+
+        if all(key in current_item for key in ("name", "quantity", "price")):
+            items.append(current_item)
+            current_item = {}
+
+        elif label == "TOTAL":
+            totals.append(clean_price_string(text))
+
+    # Add any leftover partial item
+    if any(k in current_item for k in ("name", "quantity", "price")):
+        items.append(current_item)
+
+    return {
+        "store": {"name": store_name} if store_name else {},
+        "items": items,
+        "total": totals[-1] if totals else None
+    }
@@ -0,0 +1,120 @@
+"""
+Receipt detection and deskewing.
+
+The outline is searched on a downscaled copy of the photo; only the final
+perspective warp touches the full-resolution pixels.
+"""
+import time
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+
+class ReceiptNotDetected(Exception):
+    """Raised when no receipt outline can be found in the image."""
+
+
+@dataclass
+class Deskewed:
+    image: np.ndarray
+    quad: np.ndarray
+    timings: dict = field(default_factory=dict)
+
+
+class StageTimer:
+    """Collects wall-clock milliseconds per named stage."""
+
+    def __init__(self):
+        self.timings = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        current = time.perf_counter()
+        self.timings[stage] = round((current - self._last) * 1000, 2)
+        self._last = current
+
+
+def order_points(pts):
+    rect = np.zeros((4, 2), dtype="float32")
+    s = pts.sum(axis=1)
+    rect[0] = pts[np.argmin(s)]
+    rect[2] = pts[np.argmax(s)]
+    diff = np.diff(pts, axis=1)
+    rect[1] = pts[np.argmin(diff)]
+    rect[3] = pts[np.argmax(diff)]
+    return rect
+
+
+def find_receipt_quad(image, max_side=None, timer=None):
+    """Return the receipt corners (tl, tr, br, bl) in full-resolution coordinates."""
+    max_side = max_side or settings.OCR_DETECT_MAX_SIDE
+    timer = timer or StageTimer()
+
+    height, width = image.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    if scale < 1.0:
+        small = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    else:
+        small = image
+    timer.mark("downscale")
+
+    img_gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    blurred = cv2.GaussianBlur(img_gray, (5, 5), 0)
+    _, binary_image = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    timer.mark("threshold")
+
+    # Only the outer outline matters, and its straight edges compress well.
+    contours, _ = cv2.findContours(image=binary_image, mode=cv2.RETR_EXTERNAL, method=cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        raise ReceiptNotDetected("No contours found")
+
+    largest_contour = max(contours, key=cv2.contourArea)
+    epsilon = 0.02 * cv2.arcLength(largest_contour, True)
+    approx = cv2.approxPolyDP(largest_contour, epsilon, True)
+    timer.mark("contours")
+
+    if len(approx) != 4:
+        raise ReceiptNotDetected("Receipt contour not detected")
+
+    return order_points(approx.reshape(4, 2).astype("float32") / scale)
+
+
+def warp_receipt(image, quad, max_side=None):
+    """Perspective-correct the receipt, capping the output's longer side."""
+    max_side = max_side or settings.OCR_WARP_MAX_SIDE
+
+    (tl, tr, br, bl) = quad
+    width_top = np.linalg.norm(tr - tl)
+    width_bottom = np.linalg.norm(br - bl)
+    max_width = max(width_top, width_bottom)
+
+    height_left = np.linalg.norm(tl - bl)
+    height_right = np.linalg.norm(tr - br)
+    max_height = max(height_left, height_right)
+
+    # The recognizer resizes text lines to a fixed height, so pixels beyond
+    # this cap only cost warp and detection time.
+    scale = min(1.0, max_side / max(max_width, max_height, 1))
+    max_width = max(int(max_width * scale), 1)
+    max_height = max(int(max_height * scale), 1)
+
+    dst = np.array([
+        [0, 0],
+        [max_width - 1, 0],
+        [max_width - 1, max_height - 1],
+        [0, max_height - 1]
+    ], dtype="float32")
+
+    M = cv2.getPerspectiveTransform(quad, dst)
+    return cv2.warpPerspective(image, M, (max_width, max_height))
+
+
+def deskew_receipt(image):
+    """Find and straighten the receipt, recording per-stage timings."""
+    timer = StageTimer()
+    quad = find_receipt_quad(image, timer=timer)
+    warped = warp_receipt(image, quad)
+    timer.mark("warp")
+    return Deskewed(image=warped, quad=quad, timings=timer.timings)
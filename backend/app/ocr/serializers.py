@@ -1,4 +1,40 @@
+from django.conf import settings
+from PIL import Image
 from rest_framework import serializers
+from core.models import OCRJob
+from receipt.serializers import ReceiptSerializer
+from .uploads import read_image_size
+
+def validate_receipt_image(image_file):
+    """Check format and dimensions from the header before any decoding."""
+    try:
+        size = read_image_size(image_file)
+    except Image.DecompressionBombError:
+        size = (settings.OCR_MAX_IMAGE_PIXELS + 1, 1)
+    if size is None:
+        raise serializers.ValidationError('Upload a valid image.')
+    width, height = size
+    if width * height > settings.OCR_MAX_IMAGE_PIXELS:
+        raise serializers.ValidationError(
+            f'Image is too large; at most {settings.OCR_MAX_IMAGE_PIXELS} pixels are accepted.'
+        )
+    image_file.image_size = size
+    return image_file
 
 class OCRUploadSerializer(serializers.Serializer):
-    image = serializers.ImageField()
+    image = serializers.FileField(validators=[validate_receipt_image])
+
+class OCRBatchUploadSerializer(serializers.Serializer):
+    images = serializers.ListField(
+        child=serializers.FileField(validators=[validate_receipt_image]),
+        allow_empty=False,
+        max_length=settings.OCR_BATCH_MAX_IMAGES,
+    )
+
+class OCRJobSerializer(serializers.ModelSerializer):
+    receipt = ReceiptSerializer(read_only=True)
+
+    class Meta:
+        model = OCRJob
+        fields = ['id', 'status', 'stage', 'progress', 'error', 'result', 'receipt', 'created_at', 'finished_at']
+        read_only_fields = fields
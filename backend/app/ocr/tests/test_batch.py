@@ -0,0 +1,141 @@
+"""
+Tests for the batch OCR upload endpoint.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import LineItem, MonthlyShopSpending, Receipt
+from ocr import pipeline
+from ocr.cache import LocMemResultCache
+from ocr.engine import OCREnginePool
+
+BATCH_URL = reverse('ocr_receipt_batch')
+ENTITIES = [("LIDL", "SHOPNAME"), ("9.99", "TOTAL")]
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = 0
+
+    def ocr(self, image, cls=True):
+        self.calls += 1
+        return [[[None, ("LIDL", 0.99)], [None, ("TOTAL 9.99", 0.98)]]]
+
+
+def make_png(name, with_receipt=True, offset=0):
+    image = np.zeros((400, 300, 3), dtype=np.uint8)
+    if with_receipt:
+        corners = np.array([[60, 40], [240, 55], [230, 370], [50, 360]], dtype=np.int32) + offset
+        cv2.fillPoly(image, [corners], (255, 255, 255))
+    _, encoded = cv2.imencode('.png', image)
+    return SimpleUploadedFile(name, encoded.tobytes(), content_type='image/png')
+
+
+class OCRBatchTests(TestCase):
+    """Test batch upload of several receipts."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='batch@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.engine = FakeEngine()
+        self.pool = OCREnginePool(factory=lambda: self.engine, size=1)
+        for target, kwargs in [
+            ('ocr.views.get_result_cache', {'return_value': LocMemResultCache()}),
+            # The spaCy model isn't needed to test the batching.
+            ('ocr.views.extract_data_from_receipts', {'side_effect': lambda texts: [ENTITIES for _ in texts]}),
+        ]:
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, images):
+        with patch('ocr.pipeline.get_engine_pool', return_value=self.pool):
+            return self.client.post(BATCH_URL, {'images': images}, format='multipart')
+
+    def test_batch_creates_receipts_for_detected_images(self):
+        images = [
+            make_png('a.png'),
+            make_png('blank.png', with_receipt=False),
+            make_png('b.png', offset=5),
+        ]
+
+        res = self.post(images)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['ocr_text'], 'LIDL TOTAL 9.99')
+        self.assertIn('error', results[1])
+        self.assertIn('ocr_text', results[2])
+        self.assertEqual(self.engine.calls, 2)
+        self.assertEqual(Receipt.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self.pool.stats()['acquisitions'], 1)
+
+    def test_batch_retry_reuses_cache_and_receipts(self):
+        self.post([make_png('a.png'), make_png('b.png', offset=5)])
+
+        res = self.post([make_png('a.png'), make_png('b.png', offset=5)])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['ocr_text'], 'LIDL TOTAL 9.99')
+        self.assertEqual(self.engine.calls, 2)
+        self.assertEqual(Receipt.objects.filter(user=self.user).count(), 2)
+
+    def test_batch_fills_line_items_and_rollups(self):
+        structured = {
+            "store": {"name": "LIDL"},
+            "items": [{"name": "LAPTE", "quantity": "2", "unit_price": "5,99", "price": "11,98"}],
+            "total": "11.98",
+        }
+        with patch('ocr.views.format_ner_entities', return_value=structured):
+            self.post([make_png('a.png'), make_png('b.png', offset=5)])
+
+        self.assertEqual(LineItem.objects.filter(user=self.user, name='LAPTE').count(), 2)
+        self.assertEqual(MonthlyShopSpending.objects.get(user=self.user).receipt_count, 2)
+
+    def test_batch_upload_twice_counts_receipts_once(self):
+        self.post([make_png('a.png'), make_png('b.png', offset=5)])
+
+        self.post([make_png('a.png'), make_png('b.png', offset=5)])
+
+        rollup = MonthlyShopSpending.objects.get(user=self.user)
+        self.assertEqual(rollup.receipt_count, 2)
+        self.assertEqual(rollup.total, Decimal('19.98'))
+
+    def test_batch_skips_receipt_uploaded_concurrently(self):
+        """A receipt another upload saves while the batch runs OCR isn't counted twice."""
+        concurrent = Receipt.objects.create(user=self.user, shop_name='LIDL', items=[], total='9.99')
+
+        def build_receipt(user, structured, image_hash):
+            if not Receipt.objects.filter(image_hash=image_hash).exists():
+                Receipt.objects.filter(pk=concurrent.pk).update(image_hash=image_hash)
+            return pipeline.build_receipt(user, structured, image_hash)
+
+        with patch('ocr.views.build_receipt', side_effect=build_receipt):
+            res = self.post([make_png('a.png'), make_png('b.png', offset=5)])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rollup = MonthlyShopSpending.objects.get(user=self.user)
+        self.assertEqual(Receipt.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(rollup.receipt_count, 2)
+        self.assertEqual(rollup.total, Decimal('19.98'))
+
+    def test_batch_requires_images(self):
+        res = self.client.post(BATCH_URL, {}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
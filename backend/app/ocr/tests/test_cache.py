@@ -0,0 +1,100 @@
+"""
+Tests for the OCR result cache.
+"""
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipt
+from ocr.cache import DatabaseResultCache, FileResultCache, LocMemResultCache
+from ocr.engine import OCREnginePool
+from ocr.tests.test_batch import FakeEngine, make_png
+
+OCR_URL = reverse('ocr_receipt')
+
+
+class LocMemResultCacheTests(SimpleTestCase):
+    """Test LRU and TTL eviction."""
+
+    def test_least_recently_used_entry_evicted(self):
+        cache = LocMemResultCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expired_entry_missing(self):
+        cache = LocMemResultCache(ttl=-1)
+        cache.set('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+
+
+class FileResultCacheTests(SimpleTestCase):
+    """Test the file backend."""
+
+    def test_round_trip_and_cull(self):
+        with tempfile.TemporaryDirectory() as location:
+            cache = FileResultCache(location, max_entries=1)
+            cache.set('a', {'ocr_text': 'x'})
+            self.assertEqual(cache.get('a'), {'ocr_text': 'x'})
+
+            cache.set('b', {'ocr_text': 'y'})
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.get('b'), {'ocr_text': 'y'})
+
+
+class DatabaseResultCacheTests(TestCase):
+    """Test the database backend."""
+
+    def test_round_trip_and_cull(self):
+        cache = DatabaseResultCache(max_entries=1)
+        cache.set('a', {'ocr_text': 'x'})
+        self.assertEqual(cache.get('a'), {'ocr_text': 'x'})
+
+        cache.set('b', {'ocr_text': 'y'})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), {'ocr_text': 'y'})
+
+
+class CachedUploadTests(TestCase):
+    """Test retried uploads are served from cache without duplicates."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='cache@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.engine = FakeEngine()
+        pool = OCREnginePool(factory=lambda: self.engine, size=1)
+        for target, value in [
+            ('ocr.pipeline.get_engine_pool', pool),
+            ('ocr.pipeline.get_result_cache', LocMemResultCache()),
+            ('ocr.pipeline.extract_data_from_receipt', [("LIDL", "SHOPNAME"), ("9.99", "TOTAL")]),
+        ]:
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_retry_hits_cache_and_keeps_one_receipt(self):
+        first = self.client.post(OCR_URL, {'image': make_png('r.png')}, format='multipart')
+        retry = self.client.post(OCR_URL, {'image': make_png('r.png')}, format='multipart')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data['ocr_text'], first.data['ocr_text'])
+        self.assertEqual(self.engine.calls, 1)
+        self.assertEqual(Receipt.objects.filter(user=self.user).count(), 1)
@@ -0,0 +1,76 @@
+"""
+Tests for the OCR engine pool.
+"""
+import threading
+
+from django.test import SimpleTestCase
+
+from ocr.engine import EnginePoolTimeout, OCREnginePool
+
+
+class OCREnginePoolTests(SimpleTestCase):
+    """Test engine reuse and concurrency limits."""
+
+    def setUp(self):
+        self.built = 0
+
+    def factory(self):
+        self.built += 1
+        return object()
+
+    def test_engine_built_once_and_reused(self):
+        pool = OCREnginePool(factory=self.factory, size=2)
+
+        with pool.engine() as first:
+            pass
+        with pool.engine() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(self.built, 1)
+        self.assertEqual(pool.stats()['acquisitions'], 2)
+
+    def test_acquire_times_out_when_pool_exhausted(self):
+        pool = OCREnginePool(factory=self.factory, size=1)
+        engine = pool.acquire()
+
+        with self.assertRaises(EnginePoolTimeout):
+            pool.acquire(timeout=0.01)
+
+        pool.release(engine)
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_waiter_gets_released_engine(self):
+        pool = OCREnginePool(factory=self.factory, size=1)
+        engine = pool.acquire()
+        received = []
+
+        waiter = threading.Thread(target=lambda: received.append(pool.acquire(timeout=5)))
+        waiter.start()
+        pool.release(engine)
+        waiter.join(5)
+
+        self.assertEqual(received, [engine])
+        self.assertEqual(self.built, 1)
+
+    def test_warm_builds_engines_up_front(self):
+        pool = OCREnginePool(factory=self.factory, size=3)
+
+        pool.warm()
+
+        stats = pool.stats()
+        self.assertEqual(stats['warm'], 3)
+        self.assertEqual(stats['idle'], 3)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_failed_construction_frees_slot(self):
+        def broken():
+            raise RuntimeError('weights missing')
+
+        pool = OCREnginePool(factory=broken, size=1)
+
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+        self.assertEqual(pool.stats()['warm'], 0)
@@ -0,0 +1,143 @@
+"""
+Tests for background OCR jobs.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import OCRJob, Receipt
+from ocr.jobs import DatabaseBroker, InProcessBroker, OCRWorker, submit_job
+from ocr.pipeline import ReceiptNotDetected
+
+PIPELINE_RESULT = {
+    "ocr_text": "LIDL\nTOTAL 12.50",
+    "entities": [["LIDL", "SHOPNAME"], ["12.50", "TOTAL"]],
+    "entitiesStructured": {"store": {"name": "LIDL"}, "items": [], "total": "12.50"},
+}
+
+
+def fake_pipeline(data, progress, **kwargs):
+    progress("ocr", 30)
+    return PIPELINE_RESULT
+
+
+class OCRJobTests(TestCase):
+    """Test job processing against the in-process broker."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='jobs@example.com',
+            password='testpass123',
+        )
+        self.broker = InProcessBroker()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def submit(self):
+        with patch('ocr.jobs.get_broker', return_value=self.broker):
+            return submit_job(self.user, b'image-bytes')
+
+    @patch('ocr.jobs.pipeline.process_image', side_effect=fake_pipeline)
+    def test_worker_completes_job(self, patched_pipeline):
+        job = self.submit()
+
+        processed = OCRWorker(self.broker).run_once()
+
+        self.assertEqual(processed.pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, OCRJob.STATUS_DONE)
+        self.assertEqual(job.progress, 100)
+        self.assertIsNone(job.image)
+        self.assertEqual(job.receipt.shop_name, 'LIDL')
+        patched_pipeline.assert_called_once()
+
+    @patch('ocr.jobs.pipeline.process_image', side_effect=ReceiptNotDetected('No contours found'))
+    def test_worker_records_failure(self, patched_pipeline):
+        job = self.submit()
+
+        OCRWorker(self.broker).run_once()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OCRJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'No contours found')
+        self.assertFalse(Receipt.objects.exists())
+
+    def test_worker_idle_when_queue_empty(self):
+        self.assertIsNone(OCRWorker(self.broker).run_once())
+
+    @patch('ocr.jobs.pipeline.process_image', side_effect=fake_pipeline)
+    def test_job_status_endpoint(self, patched_pipeline):
+        job = self.submit()
+        url = reverse('ocr_job_status', args=[job.pk])
+
+        res = self.client.get(url)
+        self.assertEqual(res.data['status'], OCRJob.STATUS_QUEUED)
+
+        OCRWorker(self.broker).run_once()
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], OCRJob.STATUS_DONE)
+        self.assertEqual(res.data['receipt']['shop_name'], 'LIDL')
+
+    def test_job_status_hidden_from_other_users(self):
+        job = self.submit()
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=other)
+
+        res = self.client.get(reverse('ocr_job_status', args=[job.pk]))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(OCR_JOB_STALE_AFTER=60, OCR_JOB_MAX_ATTEMPTS=3)
+class StaleJobTests(TestCase):
+    """Test jobs abandoned by a crashed worker are recovered by the database broker."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='stale@example.com', password='testpass123')
+
+    def abandoned_job(self, attempts, idle=timedelta(minutes=5)):
+        job = OCRJob.objects.create(user=self.user, image=b'image-bytes')
+        # update() skips auto_now, so the job looks untouched since `idle` ago.
+        OCRJob.objects.filter(pk=job.pk).update(
+            status=OCRJob.STATUS_RUNNING, attempts=attempts, updated_at=now() - idle,
+        )
+        return job
+
+    def test_stale_running_job_is_claimed_again(self):
+        job = self.abandoned_job(attempts=1)
+
+        claimed = DatabaseBroker().claim()
+
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, OCRJob.STATUS_RUNNING)
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_stale_job_out_of_attempts_fails(self):
+        job = self.abandoned_job(attempts=3)
+
+        self.assertIsNone(DatabaseBroker().claim())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OCRJob.STATUS_FAILED)
+        self.assertIn('3 attempts', job.error)
+        self.assertIsNone(job.image)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_recently_updated_running_job_is_left_alone(self):
+        job = self.abandoned_job(attempts=1, idle=timedelta(seconds=5))
+
+        self.assertIsNone(DatabaseBroker().claim())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OCRJob.STATUS_RUNNING)
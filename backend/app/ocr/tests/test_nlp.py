@@ -0,0 +1,62 @@
+"""
+Tests for the NER model registry.
+"""
+import gc
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from ocr import nlp
+
+
+@override_settings(OCR_NER_MODEL_PATH='model-path', OCR_NER_PIPELINE='ner')
+@patch('ocr.nlp.excluded_components', return_value=('parser',))
+class NERRegistryTests(SimpleTestCase):
+    """Test lazy, once-per-process model loading."""
+
+    def setUp(self):
+        saved = dict(nlp._models)
+        nlp._models.clear()
+        self.addCleanup(nlp._models.update, saved)
+        self.addCleanup(nlp._models.clear)
+
+    @patch('ocr.nlp.load_model')
+    def test_model_loaded_once_on_first_use(self, patched_load, patched_excluded):
+        self.assertFalse(nlp.is_loaded())
+
+        first = nlp.get_nlp()
+        second = nlp.get_nlp()
+
+        self.assertIs(first, second)
+        patched_load.assert_called_once_with('model-path', ('parser',))
+        patched_excluded.assert_called_once_with('model-path', 'ner')
+
+    @patch('ocr.nlp.load_model')
+    def test_preload_loads_and_freezes(self, patched_load, patched_excluded):
+        self.addCleanup(gc.unfreeze)
+
+        nlp.preload()
+
+        self.assertTrue(nlp.is_loaded())
+        self.assertGreater(gc.get_freeze_count(), 0)
+
+
+class NERDependencyTests(SimpleTestCase):
+    """Test component trimming against the shipped model's config."""
+
+    path = settings.BASE_DIR / 'ocr' / 'marius_ner_model'
+
+    def test_ner_mode_keeps_sentence_boundaries(self):
+        # The parser sets sentence starts, which entities may not cross.
+        self.assertEqual(nlp.ner_dependencies(self.path), {'ner', 'parser', 'tok2vec'})
+
+    def test_minimal_mode_keeps_only_ner(self):
+        self.assertEqual(nlp.ner_dependencies(self.path, nlp.PIPELINE_NER_MINIMAL), {'ner'})
+
+    def test_full_mode_excludes_nothing(self):
+        self.assertEqual(nlp.excluded_components(self.path, nlp.PIPELINE_FULL), ())
+
+    def test_unknown_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            nlp.excluded_components(self.path, 'fast')
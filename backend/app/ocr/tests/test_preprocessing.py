@@ -0,0 +1,38 @@
+"""
+Tests for receipt detection and deskewing.
+"""
+import cv2
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from ocr.preprocessing import ReceiptNotDetected, deskew_receipt, find_receipt_quad
+
+CORNERS = np.array([[600, 400], [2400, 550], [2300, 3700], [500, 3600]], dtype=np.int32)
+
+
+def make_photo():
+    image = np.zeros((4000, 3000, 3), dtype=np.uint8)
+    cv2.fillPoly(image, [CORNERS], (255, 255, 255))
+    return image
+
+
+@override_settings(OCR_DETECT_MAX_SIDE=800, OCR_WARP_MAX_SIDE=1500)
+class PreprocessingTests(SimpleTestCase):
+    """Test downscaled detection against the full-resolution photo."""
+
+    def test_quad_found_in_full_resolution_coordinates(self):
+        quad = find_receipt_quad(make_photo())
+
+        np.testing.assert_allclose(quad, CORNERS.astype('float32'), atol=10)
+
+    def test_warped_output_capped(self):
+        deskewed = deskew_receipt(make_photo())
+
+        height, width = deskewed.image.shape[:2]
+        self.assertEqual(max(height, width), 1500)
+        self.assertAlmostEqual(width / height, 1800 / 3200, delta=0.02)
+        self.assertEqual(set(deskewed.timings), {'downscale', 'threshold', 'contours', 'warp'})
+
+    def test_blank_image_rejected(self):
+        with self.assertRaises(ReceiptNotDetected):
+            deskew_receipt(np.zeros((400, 300, 3), dtype=np.uint8))
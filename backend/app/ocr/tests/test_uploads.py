@@ -0,0 +1,79 @@
+"""
+Tests for zero-copy upload access and header validation.
+"""
+import io
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import OCRJob, Receipt
+from ocr.jobs import InProcessBroker
+from ocr.pipeline import decode_image
+from ocr.tests.test_batch import make_png
+from ocr.uploads import read_image_size, upload_buffer
+
+
+class UploadBufferTests(SimpleTestCase):
+    """Test buffers cover both kinds of Django upload."""
+
+    def setUp(self):
+        self.png = make_png('r.png').read()
+
+    def test_in_memory_upload_shares_buffer(self):
+        upload = InMemoryUploadedFile(io.BytesIO(self.png), 'image', 'r.png', 'image/png', len(self.png), None)
+
+        with upload_buffer(upload) as buffer:
+            self.assertIsInstance(buffer, memoryview)
+            self.assertEqual(decode_image(buffer).shape, (400, 300, 3))
+
+    def test_temporary_upload_is_memory_mapped(self):
+        upload = TemporaryUploadedFile('r.png', 'image/png', len(self.png), None)
+        upload.write(self.png)
+        upload.flush()
+
+        with upload_buffer(upload) as buffer:
+            self.assertEqual(bytes(buffer[:8]), self.png[:8])
+            self.assertEqual(decode_image(buffer).shape, (400, 300, 3))
+        upload.close()
+
+    def test_header_size_read_without_decoding(self):
+        self.assertEqual(read_image_size(make_png('r.png')), (300, 400))
+        self.assertIsNone(read_image_size(io.BytesIO(b'not an image')))
+
+
+class UploadValidationTests(TestCase):
+    """Test oversized uploads are rejected before OCR."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='uploads@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(OCR_MAX_IMAGE_PIXELS=1000)
+    def test_oversized_image_rejected(self):
+        res = self.client.post(reverse('ocr_receipt'), {'image': make_png('r.png')}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.assertFalse(Receipt.objects.exists())
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_async_upload_spooled_to_disk_is_queued(self):
+        """A TemporaryUploadedFile is mmapped; the job must not keep the map open."""
+        png = make_png('r.png')
+        with patch('ocr.jobs.get_broker', return_value=InProcessBroker()):
+            res = self.client.post(reverse('ocr_receipt') + '?async=true', {'image': png}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        png.seek(0)
+        self.assertEqual(bytes(OCRJob.objects.get(pk=res.data['id']).image), png.read())
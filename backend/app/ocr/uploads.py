@@ -0,0 +1,49 @@
+"""
+Access to uploaded images without copying their bytes.
+"""
+import mmap
+from contextlib import contextmanager
+
+from PIL import Image
+
+
+@contextmanager
+def upload_buffer(uploaded_file):
+    """Yield a read-only buffer over the upload's bytes.
+
+    Uploads Django spooled to disk are memory-mapped; in-memory uploads
+    expose their BytesIO buffer directly.
+    """
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        with open(uploaded_file.temporary_file_path(), 'rb') as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield buffer
+        return
+
+    stream = getattr(uploaded_file, 'file', uploaded_file)
+    if hasattr(stream, 'getbuffer'):
+        buffer = stream.getbuffer()
+        try:
+            yield buffer
+        finally:
+            buffer.release()
+        return
+
+    uploaded_file.seek(0)
+    yield uploaded_file.read()
+
+
+def read_image_size(uploaded_file):
+    """Return (width, height) from the image header, or None if unreadable.
+
+    PIL only parses the header here; no pixel data is decoded. Images past
+    PIL's own pixel limit raise Image.DecompressionBombError.
+    """
+    uploaded_file.seek(0)
+    try:
+        with Image.open(uploaded_file) as image:
+            return image.size
+    except OSError:
+        return None
+    finally:
+        uploaded_file.seek(0)
@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import ocr_receipt
+from .views import ocr_receipt, ocr_receipt_batch, ocr_job_status, ocr_engine_stats
 
 urlpatterns = [
     path('extraction', ocr_receipt, name='ocr_receipt'),
+    path('batch', ocr_receipt_batch, name='ocr_receipt_batch'),
+    path('jobs/<int:job_id>', ocr_job_status, name='ocr_job_status'),
+    path('engine/stats', ocr_engine_stats, name='ocr_engine_stats'),
 ]
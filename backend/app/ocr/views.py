@@ -1,171 +1,165 @@
-import cv2
-import numpy as np
+from contextlib import ExitStack
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import OCRUploadSerializer
-from paddleocr import PaddleOCR
+from .serializers import OCRUploadSerializer, OCRBatchUploadSerializer, OCRJobSerializer
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, OpenApiTypes
-from rest_framework import status
-import spacy
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import permissions
-import re
-from rest_framework.decorators import authentication_classes, permission_classes
-from core.models import Receipt
-
-nlp = spacy.load("ocr/marius_ner_model")
-
-def order_points(pts):
-    rect = np.zeros((4, 2), dtype="float32")
-    s = pts.sum(axis=1)
-    rect[0] = pts[np.argmin(s)]
-    rect[2] = pts[np.argmax(s)]
-    diff = np.diff(pts, axis=1)
-    rect[1] = pts[np.argmin(diff)]
-    rect[3] = pts[np.argmax(diff)]
-    return rect
+from rest_framework.decorators import authentication_classes, permission_classes, throttle_classes
+from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.urls import reverse
+from core.admission import OCRRateThrottle, admission_controlled
+from core.authentication import CachedJWTAuthentication
+from core.models import OCRJob, Receipt
+from .engine import EnginePoolTimeout, get_engine_pool
+from .jobs import submit_job
+from receipt.caching import bump_data_version
+from receipt.line_items import create_line_items
+from receipt.rollups import receipts_created
+from .uploads import upload_buffer
+from .cache import digest_key, get_result_cache, image_digest
+from .pipeline import (
+    ReceiptNotDetected,
+    build_receipt,
+    deskew_many,
+    extract_data_from_receipts,
+    format_ner_entities,
+    insert_receipts,
+    process_image,
+    recognize_many,
+    save_receipt,
+)
 
 @extend_schema(
     request=OCRUploadSerializer,
-    responses={200: OpenApiTypes.OBJECT},
-    description="Upload a receipt image to extract OCR text.",
+    responses={200: OpenApiTypes.OBJECT, 202: OCRJobSerializer},
+    description="Upload a receipt image to extract OCR text. "
+                "With `async=true` the image is queued and a job id is returned immediately.",
+    parameters=[
+        OpenApiParameter("async", OpenApiTypes.BOOL, OpenApiParameter.QUERY),
+    ],
 )
 @api_view(['POST'])
 @parser_classes([MultiPartParser])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([OCRRateThrottle])
+@admission_controlled('ocr')
 def ocr_receipt(request):
-    ocr_model = PaddleOCR(use_angle_cls=True, lang='en')
     serializer = OCRUploadSerializer(data=request.data)
     if serializer.is_valid():
         image_file = serializer.validated_data['image']
+        with upload_buffer(image_file) as data:
+            if request.query_params.get('async', '').lower() in ('1', 'true', 'yes'):
+                job = submit_job(request.user, data)
+                job_data = OCRJobSerializer(job).data
+                job_data['status_url'] = reverse('ocr_job_status', args=[job.pk])
+                return Response(job_data, status=status.HTTP_202_ACCEPTED)
+
+            digest = image_digest(data)
+            try:
+                result = process_image(data, digest=digest, user=request.user, size=image_file.image_size)
+            except ReceiptNotDetected as exc:
+                return Response({"error": str(exc)}, status=400)
+            except EnginePoolTimeout:
+                return Response({"error": "OCR is busy, try again shortly"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        save_receipt(request.user, result["entitiesStructured"], digest)
+
+        return Response(result)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        file_bytes = np.asarray(bytearray(image_file.read()), dtype=np.uint8)
-        image1 = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-
-        img_gray = cv2.cvtColor(image1, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(img_gray, (5, 5), 0)
-        _, binary_image = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-        contours, _ = cv2.findContours(image=binary_image, mode=cv2.RETR_TREE, method=cv2.CHAIN_APPROX_NONE)
-        if not contours:
-            return Response({"error": "No contours found"}, status=400)
-
-        largest_contour = max(contours, key=cv2.contourArea)
-        epsilon = 0.02 * cv2.arcLength(largest_contour, True)
-        approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-
-        if len(approx) != 4:
-            return Response({"error": "Receipt contour not detected"}, status=400)
-
-        points = approx.reshape(4, 2)
-        ordered_points = order_points(points)
-
-        (tl, tr, br, bl) = ordered_points
-        width_top = np.linalg.norm(tr - tl)
-        width_bottom = np.linalg.norm(br - bl)
-        max_width = max(int(width_top), int(width_bottom))
-
-        height_left = np.linalg.norm(tl - bl)
-        height_right = np.linalg.norm(tr - br)
-        max_height = max(int(height_left), int(height_right))
-
-        dst = np.array([
-            [0, 0],
-            [max_width - 1, 0],
-            [max_width - 1, max_height - 1],
-            [0, max_height - 1]
-        ], dtype="float32")
-
-        M = cv2.getPerspectiveTransform(ordered_points, dst)
-        warped = cv2.warpPerspective(image1, M, (max_width, max_height))
-
-        result = ocr_model.ocr(warped, cls=True)
-        lines = []
-        for line in result:
-            line_text = " ".join([word_info[1][0] for word_info in line])
-            lines.append(line_text)
-
-        ocr_text = "\n".join(lines)
-
-        entities = extract_data_from_receipt(ocr_text)
-        entitiesStructured = format_ner_entities(entities)
-
-        Receipt.objects.create(
-            user=request.user,
-            shop_name=entitiesStructured["store"].get("name", ""),
-            items=entitiesStructured["items"],
-            total=entitiesStructured["total"] if entitiesStructured["total"] else 0,
+@extend_schema(
+    request=OCRBatchUploadSerializer,
+    responses={200: OpenApiTypes.OBJECT},
+    description="Upload several receipt images at once. Results are returned in upload order; "
+                "images without a detectable receipt get an `error` entry instead.",
+)
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+@throttle_classes([OCRRateThrottle])
+@admission_controlled('ocr')
+def ocr_receipt_batch(request):
+    serializer = OCRBatchUploadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    image_files = serializer.validated_data['images']
+    with ExitStack() as stack:
+        datas = [stack.enter_context(upload_buffer(image_file)) for image_file in image_files]
+        digests = [image_digest(data) for data in datas]
+        cache = get_result_cache()
+        results = [cache.get(digest_key(digest)) for digest in digests]
+
+        misses = [i for i, result in enumerate(results) if result is None]
+        warped_or_errors = deskew_many(
+            [datas[i] for i in misses],
+            [image_files[i].image_size for i in misses],
         )
-
-        return Response({
+    detected = []
+    for i, warped in zip(misses, warped_or_errors):
+        if isinstance(warped, ReceiptNotDetected):
+            results[i] = {"error": str(warped)}
+        else:
+            detected.append((i, warped))
+
+    try:
+        texts = recognize_many([warped for _, warped in detected])
+    except EnginePoolTimeout:
+        return Response({"error": "OCR is busy, try again shortly"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    for (i, _), ocr_text, entities in zip(detected, texts, extract_data_from_receipts(texts)):
+        results[i] = {
             "ocr_text": ocr_text,
             "entities": entities,
-            "entitiesStructured": entitiesStructured,
-            })
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-def extract_data_from_receipt(text):
-    doc = nlp(text)
-    return [(ent.text, ent.label_) for ent in doc.ents]
-
-def split_quantity_string(quantity_string):
-    cleaned = quantity_string.replace(',', '.').replace(' ', '')
-    pattern = r"^([\d.]+)[A-Za-z\-]*[^\d]*([\d.]+)$"
-    match = re.match(pattern, cleaned)
-    if match:
-        quantity = match.group(1)
-        unit_price = match.group(2)
-        return quantity, unit_price
-    return quantity_string, None
-
-def clean_price_string(price_string):
-    cleaned = price_string.replace(',', '.').replace(' ', '')
-    match = re.search(r"[\d.]+", cleaned)
-    if match:
-        return match.group(0)
-    return price_string
-
-
-def format_ner_entities(entities):
-    store_name = None
-    items = []
-    totals = []
-    current_item = {}
-
-    for text, label in entities:
-        if label == "SHOPNAME" and store_name is None:
-            store_name = text
+            "entitiesStructured": format_ner_entities(entities),
+        }
+        cache.set(digest_key(digests[i]), results[i])
+
+    existing = set(
+        Receipt.objects.filter(user=request.user, image_hash__in=digests)
+        .values_list('image_hash', flat=True)
+    )
+    receipts = []
+    for digest, result in zip(digests, results):
+        if "error" in result or digest in existing:
+            continue
+        existing.add(digest)
+        receipts.append(build_receipt(request.user, result["entitiesStructured"], digest))
+
+    with transaction.atomic():
+        created = insert_receipts(receipts)
+        # The insert sends no save signals, so update rollups and line items here.
+        receipts_created(created)
+        create_line_items(created)
+        bump_data_version(request.user.pk)
+    return Response({"results": results})
 
-        elif label == "QUANTITY":
-            quantity, unit_price = split_quantity_string(text)
-            current_item["quantity"] = quantity
-            if unit_price:
-                current_item["unit_price"] = unit_price
-            else:
-                current_item["unit_price"] = "Could not parse unit price"
-
-        elif label == "PRICE":
-            current_item["price"] = clean_price_string(text)
-
-        elif label == "PRODUCT":
-            current_item["name"] = text
-
-        if all(key in current_item for key in ("name", "quantity", "price")):
-            items.append(current_item)
-            current_item = {}
-
-        elif label == "TOTAL":
-            totals.append(clean_price_string(text))
-
-    # Add any leftover partial item
-    if any(k in current_item for k in ("name", "quantity", "price")):
-        items.append(current_item)
+@extend_schema(
+    responses=OCRJobSerializer,
+    description="Progress and result of a queued OCR job.",
+)
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def ocr_job_status(request, job_id):
+    job = get_object_or_404(
+        OCRJob.objects.select_related('receipt').defer('image'),
+        pk=job_id,
+        user=request.user,
+    )
+    return Response(OCRJobSerializer(job).data)
 
-    return {
-        "store": {"name": store_name} if store_name else {},
-        "items": items,
-        "total": totals[-1] if totals else None
-    }
+@extend_schema(
+    responses={200: OpenApiTypes.OBJECT},
+    description="OCR engine pool statistics for this worker process.",
+)
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([permissions.IsAdminUser])
+def ocr_engine_stats(request):
+    return Response(get_engine_pool().stats())
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ReceiptConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'receipt'
+
+    def ready(self):
+        from receipt import signals  # noqa: F401
@@ -0,0 +1,55 @@
+"""
+Async versions of the receipt and tag list endpoints.
+
+They return what ReceiptViewSet.list and TagViewSet.list do (filters,
+cursor pagination, versioned cache and ETags included) and share their
+cache entries. Enabled with ASYNC_READ_VIEWS; see receipt.urls.
+"""
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from core.async_views import async_read_view, json_response
+from core.models import Receipt, Tag
+from .caching import ListCacheEntry, adata_version
+from .filters import ReceiptFilter
+from .pagination import ReceiptCursorPagination
+from .serializers import ReceiptSerializer, TagSerializer
+
+
+async def cached_list(request, user, prefix, build):
+    """Answer from the versioned list cache, or cache what `build()` returns."""
+    entry = ListCacheEntry(prefix, request, user.pk, await adata_version(user.pk), 'application/json')
+    if entry.not_modified:
+        return entry.mark(HttpResponse(status=status.HTTP_304_NOT_MODIFIED))
+
+    data = await entry.cache.aget(entry.key)
+    if data is None:
+        data = await build()
+        await entry.cache.aset(entry.key, data)
+    return entry.mark(json_response(data))
+
+
+@async_read_view()
+async def receipt_list(request, user):
+    async def build():
+        queryset = Receipt.objects.filter(user=user).prefetch_related('tags').order_by('-date', '-id')
+        filterset = ReceiptFilter(request.GET, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        paginator = ReceiptCursorPagination()
+        page = await paginator.apaginate_queryset(filterset.qs, request)
+        if page is None:
+            return ReceiptSerializer([receipt async for receipt in filterset.qs], many=True).data
+        return paginator.get_paginated_data(ReceiptSerializer(page, many=True).data)
+
+    return await cached_list(request, user, 'ReceiptViewSet', build)
+
+
+@async_read_view()
+async def tag_list(request, user):
+    async def build():
+        return TagSerializer([tag async for tag in Tag.objects.filter(user=user)], many=True).data
+
+    return await cached_list(request, user, 'TagViewSet', build)
@@ -0,0 +1,95 @@
+"""
+Per-user versioned cache for the receipt and tag list responses.
+
+User.data_version is bumped whenever one of the user's receipts or tags is
+written (see receipt.signals). A list response is cached under the user,
+that version and the normalized request, so a write makes every older
+entry unreachable instead of having to find and delete it. The same
+triple is the response's ETag: a conditional GET whose If-None-Match
+still matches gets a 304 after reading only the version.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import F
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.utils.timezone import localdate
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _version_query(user_id):
+    return get_user_model().objects.filter(pk=user_id).values_list('data_version', flat=True)
+
+
+def data_version(user_id):
+    """The user's current data version, read fresh from the users table."""
+    return _version_query(user_id).first() or 0
+
+
+async def adata_version(user_id):
+    return await _version_query(user_id).afirst() or 0
+
+
+def bump_data_version(*user_ids):
+    """Invalidate the cached lists of these users."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        get_user_model().objects.filter(pk__in=user_ids).update(data_version=F('data_version') + 1)
+
+
+def request_digest(request, user_id, media_type):
+    """Digest of everything besides the user's data that shapes a list response.
+
+    Query parameters are sorted by name (repeated values keep their order).
+    The scheme and host go in for the absolute pagination links, and today's
+    date for relative filters such as last_7_days.
+    """
+    params = sorted(request.GET.lists())
+    parts = [
+        str(user_id), request.scheme, request.get_host(), request.path, media_type,
+        localdate().isoformat(), repr(params),
+    ]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
+
+
+class ListCacheEntry:
+    """The ETag and cache key of one list request at the user's current version."""
+    alias = 'responses'
+
+    def __init__(self, prefix, request, user_id, version, media_type):
+        digest = request_digest(request, user_id, media_type)
+        self.etag = f'"{version}-{digest}"'
+        self.key = f'{prefix}:{user_id}:{version}:{digest}'
+        self.cache = caches[self.alias]
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        self.not_modified = self.etag in if_none_match or '*' in if_none_match
+
+    def mark(self, response):
+        response['ETag'] = self.etag
+        # Clients may keep the body but must revalidate; shared caches must not store it.
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class VersionedListCacheMixin:
+    """Serve list() from the response cache, and 304 when the client is current."""
+
+    def list(self, request, *args, **kwargs):
+        user_id = request.user.pk
+        entry = ListCacheEntry(
+            type(self).__name__, request, user_id, data_version(user_id), request.accepted_renderer.media_type,
+        )
+        if entry.not_modified:
+            return entry.mark(Response(status=status.HTTP_304_NOT_MODIFIED))
+
+        data = entry.cache.get(entry.key)
+        if data is not None:
+            return entry.mark(Response(data))
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            entry.cache.set(entry.key, response.data)
+        return entry.mark(response)
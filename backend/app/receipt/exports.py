@@ -0,0 +1,159 @@
+"""
+Receipt exports: CSV written straight into a (optionally AES-encrypted) ZIP,
+and columnar Parquet / Arrow IPC files.
+
+Receipts are read with a server-side cursor, RECEIPT_EXPORT_CHUNK_SIZE at
+a time with their line items, and written out chunk by chunk. The file
+lives in a spooled temp file, so memory use stays flat however many
+receipts are exported.
+"""
+import csv
+import io
+import tempfile
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyzipper
+from django.conf import settings
+from django.db.models import Prefetch
+
+from core.models import LineItem
+
+CSV_HEADER = ["Receipt ID", "Shop", "Date", "Total", "Product", "Qty", "Unit Price", "Price"]
+
+
+def _money(value):
+    return '' if value is None else f"{value:.2f}"
+
+
+def _quantity(value):
+    return '' if value is None else f"{value.normalize():f}"
+
+
+def iter_csv_rows(receipts):
+    """CSV rows for a receipt queryset: one per line item, a blank row after each receipt."""
+    receipts = receipts.prefetch_related(
+        Prefetch('line_items', queryset=LineItem.objects.order_by('position'))
+    ).iterator(chunk_size=settings.RECEIPT_EXPORT_CHUNK_SIZE)
+
+    yield CSV_HEADER
+    for r in receipts:
+        head = [r.id, r.shop_name, r.date.strftime("%Y-%m-%d"), f"{r.total:.2f}"]
+        lines = r.line_items.all()
+        if lines:
+            for line in lines:
+                yield head + [line.name, _quantity(line.quantity), _money(line.unit_price), _money(line.price)]
+        else:
+            yield head + ["", "", "", ""]
+        yield []
+
+
+def write_csv_zip(fileobj, receipts, password=None, name='receipts.csv'):
+    """Write the receipts' CSV as the single entry of a ZIP into `fileobj`."""
+    encryption = pyzipper.WZ_AES if password else None
+    with pyzipper.AESZipFile(fileobj, 'w', compression=pyzipper.ZIP_DEFLATED, encryption=encryption) as zf:
+        if password:
+            zf.setpassword(password.encode())
+        # force_zip64: the entry size isn't known up front and may pass 4 GB.
+        with zf.open(name, 'w', force_zip64=True) as entry:
+            text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+            csv.writer(text).writerows(iter_csv_rows(receipts))
+            text.flush()
+            text.detach()
+
+
+def export_csv_zip(receipts, password=None):
+    """Return a spooled temp file holding the ZIP, rewound to the start."""
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.RECEIPT_EXPORT_SPOOL_SIZE)
+    write_csv_zip(spool, receipts, password)
+    spool.seek(0)
+    return spool
+
+
+# One row per receipt, its line items nested in position order. Decimal
+# columns keep the model's precision and scale.
+LINE_ITEM_TYPE = pa.struct([
+    ('position', pa.int16()),
+    ('name', pa.string()),
+    ('quantity', pa.decimal128(12, 3)),
+    ('unit_price', pa.decimal128(10, 2)),
+    ('price', pa.decimal128(10, 2)),
+])
+RECEIPT_SCHEMA = pa.schema([
+    pa.field('id', pa.int64(), nullable=False),
+    pa.field('shop_name', pa.string(), nullable=False),
+    pa.field('date', pa.timestamp('us', tz='UTC'), nullable=False),
+    pa.field('total', pa.decimal128(10, 2), nullable=False),
+    pa.field('line_items', pa.list_(LINE_ITEM_TYPE), nullable=False),
+])
+LINE_ITEM_FIELDS = ('position', 'name', 'quantity', 'unit_price', 'price')
+
+
+def iter_record_batches(receipts):
+    """Arrow record batches for a receipt queryset, one per chunk of receipts.
+
+    Rows are read as tuples rather than model instances, and each chunk's
+    line items come from a single query ordered to match.
+    """
+    chunk_size = settings.RECEIPT_EXPORT_CHUNK_SIZE
+    rows = receipts.values_list('id', 'shop_name', 'date', 'total').iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        ids, shops, dates, totals = zip(*chunk)
+        by_receipt = {receipt_id: [] for receipt_id in ids}
+        lines = (
+            LineItem.objects.filter(receipt_id__in=ids)
+            .order_by('receipt_id', 'position')
+            .values_list('receipt_id', *LINE_ITEM_FIELDS)
+        )
+        for receipt_id, *line in lines:
+            by_receipt[receipt_id].append(line)
+
+        offsets = [0]
+        columns = [[] for _ in LINE_ITEM_FIELDS]
+        for receipt_id in ids:
+            for line in by_receipt[receipt_id]:
+                for column, value in zip(columns, line):
+                    column.append(value)
+            offsets.append(len(columns[0]))
+        items = pa.StructArray.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, LINE_ITEM_TYPE)],
+            fields=list(LINE_ITEM_TYPE),
+        )
+        yield pa.RecordBatch.from_arrays([
+            pa.array(ids, type=pa.int64()),
+            pa.array(shops, type=pa.string()),
+            pa.array(dates, type=RECEIPT_SCHEMA.field('date').type),
+            pa.array(totals, type=RECEIPT_SCHEMA.field('total').type),
+            pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), items),
+        ], schema=RECEIPT_SCHEMA)
+
+
+def write_parquet(fileobj, receipts):
+    """Write the receipts as a zstd-compressed Parquet file, a row group per chunk."""
+    with pq.ParquetWriter(fileobj, RECEIPT_SCHEMA, compression='zstd') as writer:
+        for batch in iter_record_batches(receipts):
+            writer.write_batch(batch)
+
+
+def write_arrow(fileobj, receipts):
+    """Write the receipts as a zstd-compressed Arrow IPC (Feather v2) file."""
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.ipc.new_file(fileobj, RECEIPT_SCHEMA, options=options) as writer:
+        for batch in iter_record_batches(receipts):
+            writer.write_batch(batch)
+
+
+COLUMNAR_FORMATS = {
+    'parquet': (write_parquet, 'receipts.parquet', 'application/vnd.apache.parquet'),
+    'arrow': (write_arrow, 'receipts.arrow', 'application/vnd.apache.arrow.file'),
+}
+
+
+def export_columnar(receipts, fmt='parquet'):
+    """Return a spooled temp file holding the Parquet or Arrow export, rewound."""
+    write = COLUMNAR_FORMATS[fmt][0]
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.RECEIPT_EXPORT_SPOOL_SIZE)
+    write(spool, receipts)
+    spool.seek(0)
+    return spool
@@ -1,8 +1,8 @@
 import django_filters
-from core.models import Receipt
-from django.db.models import Count, Q
-from django.utils.timezone import now
-from datetime import timedelta
+from core.models import LineItem, Receipt
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils.timezone import make_aware, now
+from datetime import datetime, timedelta
 
 class ReceiptFilter(django_filters.FilterSet):
     min_total = django_filters.NumberFilter(field_name="total", lookup_expr='gte')
@@ -16,7 +16,8 @@ class ReceiptFilter(django_filters.FilterSet):
     end_date = django_filters.DateFilter(field_name='date', lookup_expr='lte')
     month = django_filters.NumberFilter(method='filter_by_month')
     day_of_month = django_filters.NumberFilter(method='filter_by_day')
-    year = django_filters.NumberFilter(field_name="date", lookup_expr="year")
+    year = django_filters.NumberFilter(method='filter_by_year')
+    product = django_filters.CharFilter(method='filter_by_product')
 
 
 
@@ -35,6 +36,7 @@ class ReceiptFilter(django_filters.FilterSet):
             'month',
             'day_of_month',
             'year',
+            'product',
         ]
 
     def filter_by_tags(self, queryset, name, value):
@@ -60,8 +62,22 @@ class ReceiptFilter(django_filters.FilterSet):
         return queryset
 
     def filter_by_month(self, queryset, name, value):
-        return queryset.filter(date__month=int(value))
+        return queryset.filter(date_month=int(value))
 
     def filter_by_day(self, queryset, name, value):
-        return queryset.filter(date__day=int(value))
+        return queryset.filter(date_day=int(value))
 
+    def filter_by_year(self, queryset, name, value):
+        # A half-open range on `date` stays within receipt_user_date_idx.
+        try:
+            start = make_aware(datetime(int(value), 1, 1))
+            end = make_aware(datetime(int(value) + 1, 1, 1))
+        except (ValueError, OverflowError):
+            return queryset.none()
+        return queryset.filter(date__gte=start, date__lt=end)
+
+    def filter_by_product(self, queryset, name, value):
+        # A semi-join on the line item table, so receipts aren't duplicated.
+        return queryset.filter(Exists(
+            LineItem.objects.filter(receipt=OuterRef('pk'), name__icontains=value)
+        ))
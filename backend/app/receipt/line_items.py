@@ -0,0 +1,71 @@
+"""
+Typed line items mirrored from Receipt.items.
+
+Receipt.items keeps whatever OCR or the client sent (prices are often
+strings like "5,99"); LineItem holds the same entries as Decimals so
+product queries can run in SQL.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+from core.models import LineItem
+
+# An optional minus before or after the number, as in "-1,00" or "1,00-".
+NUMBER = re.compile(r'(-)?(\d+(?:[.,]\d+)*)(-(?!\d))?')
+# A separator followed by three digits and another separator groups
+# thousands, as in "1.234,56" or "1,234,567.89".
+THOUSANDS = re.compile(r'[.,](?=\d{3}[.,])')
+
+
+def parse_decimal(value, places):
+    """Decimal from a number or a string like "5,99 B"; None if there is none."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, str):
+        match = NUMBER.search(value.replace(' ', ''))
+        if not match:
+            return None
+        sign = '-' if match.group(1) or match.group(3) else ''
+        digits = THOUSANDS.sub('', match.group(2)).replace(',', '.')
+        value = sign + '.'.join(digits.split('.')[:2])
+    try:
+        number = Decimal(str(value)).quantize(Decimal(1).scaleb(-places))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+    # Anything this large is an OCR misread, and would overflow the column.
+    return number if abs(number) < 10 ** 7 else None
+
+
+def build_line_items(receipt):
+    items = receipt.items if isinstance(receipt.items, list) else []
+    return [
+        LineItem(
+            receipt_id=receipt.pk,
+            user_id=receipt.user_id,
+            position=position,
+            name=str(item.get('name', ''))[:255],
+            quantity=parse_decimal(item.get('quantity'), 3),
+            unit_price=parse_decimal(item.get('unit_price'), 2),
+            price=parse_decimal(item.get('price'), 2),
+        )
+        for position, item in enumerate(items)
+        if isinstance(item, dict)
+    ]
+
+
+def sync_line_items(receipt, created=False):
+    """Replace the receipt's line items with ones parsed from its JSON."""
+    if not created:
+        LineItem.objects.filter(receipt_id=receipt.pk).delete()
+    LineItem.objects.bulk_create(build_line_items(receipt))
+
+
+def create_line_items(receipts):
+    """Add line items for receipts inserted without save(), e.g. by bulk_create.
+
+    Receipts that already have their line items are left alone.
+    """
+    LineItem.objects.bulk_create(
+        [line for receipt in receipts for line in build_line_items(receipt)],
+        ignore_conflicts=True,
+    )
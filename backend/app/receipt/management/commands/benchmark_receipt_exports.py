@@ -0,0 +1,49 @@
+"""
+Django command to compare the CSV, Parquet and Arrow receipt exports
+"""
+import io
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Receipt
+from receipt.exports import export_columnar, export_csv_zip
+from receipt.management.commands.benchmark_receipt_filters import seed_line_items, seed_receipts
+from receipt.management.commands.benchmark_receipt_pdf import measure
+
+EXPORTS = {
+    'csv-zip': lambda receipts: export_csv_zip(receipts, 'secret'),
+    'csv-zip-plain': lambda receipts: export_csv_zip(receipts),
+    'parquet': lambda receipts: export_columnar(receipts, 'parquet'),
+    'arrow': lambda receipts: export_columnar(receipts, 'arrow'),
+}
+
+
+class Command(BaseCommand):
+    """Seed receipts in a rolled-back transaction and time each export format."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+        parser.add_argument('--items', type=int, default=3, help='Line items per receipt.')
+        parser.add_argument('--formats', nargs='+', choices=list(EXPORTS), default=list(EXPORTS))
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for size in options['sizes']:
+            with transaction.atomic():
+                user_id = seed_receipts(size, users=1, heavy_rows=size)[0]
+                seed_line_items(user_id, options['items'])
+                receipts = Receipt.objects.filter(user_id=user_id).order_by('-date', '-id')
+
+                for name in options['formats']:
+                    export = EXPORTS[name]
+                    seconds, peak, file_bytes = measure(lambda: self.export_size(export, receipts))
+                    self.stdout.write(
+                        f'{size:>7} receipts  {name:13} {seconds:7.2f} s  '
+                        f'peak {peak / 2**20:7.1f} MiB  file {file_bytes / 2**20:6.1f} MiB'
+                    )
+                transaction.set_rollback(True)
+
+    def export_size(self, export, receipts):
+        with export(receipts) as export_file:
+            return export_file.seek(0, io.SEEK_END)
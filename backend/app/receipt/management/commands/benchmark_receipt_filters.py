@@ -0,0 +1,122 @@
+"""
+Django command to compare query plans of receipt calendar filters
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import Receipt
+from receipt.filters import ReceiptFilter
+
+SHOP_NAMES = ['Lidl', 'Kaufland', 'Mega Image', 'Profi', 'Penny']
+
+
+def seed_receipts(rows, users, heavy_rows=None):
+    """Bulk insert `rows` receipts over `users` new users and ANALYZE.
+
+    The first user gets `heavy_rows` of them (a tenth by default), dated
+    daily over ten years from 2015; every 1000th receipt is from a rare
+    shop. Returns the user ids, heavy user first.
+    """
+    User = get_user_model()
+    prefix = User.objects.count()
+    User.objects.bulk_create(
+        User(email=f'seed{prefix + i}@example.com', name=f'Seed {i}') for i in range(users)
+    )
+    user_ids = list(User.objects.order_by('-id').values_list('id', flat=True)[:users])[::-1]
+    heavy_rows = rows // 10 if heavy_rows is None else heavy_rows
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO core_receipt (user_id, shop_name, items, total, date, image_hash)
+            SELECT
+                CASE WHEN n <= %(heavy_rows)s THEN %(heavy)s
+                     ELSE (%(user_ids)s::int[])[1 + n %% %(users)s] END,
+                CASE WHEN n %% 1000 = 0 THEN 'Carrefour Express'
+                     ELSE (%(shops)s::text[])[1 + n %% %(shop_count)s] END,
+                '[]'::jsonb,
+                (n::bigint * 7919 %% 50000) / 100.0,
+                timestamptz '2015-01-01' + (n %% 3650) * interval '1 day',
+                ''
+            FROM generate_series(1, %(rows)s) AS n
+            """,
+            {
+                'heavy': user_ids[0],
+                'heavy_rows': heavy_rows,
+                'user_ids': user_ids,
+                'users': users,
+                'shops': SHOP_NAMES,
+                'shop_count': len(SHOP_NAMES),
+                'rows': rows,
+            },
+        )
+        cursor.execute('ANALYZE core_receipt')
+    return user_ids
+
+
+def seed_line_items(user_id, per_receipt=3):
+    """Give each of the user's receipts `per_receipt` line items."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO core_lineitem (receipt_id, user_id, position, name, quantity, unit_price, price)
+            SELECT r.id, r.user_id, p, 'PRODUS ' || p, 1 + p, 2.50, 2.50 * (1 + p)
+            FROM core_receipt r CROSS JOIN generate_series(0, %s - 1) AS p
+            WHERE r.user_id = %s
+            """,
+            [per_receipt, user_id],
+        )
+
+
+def plan_nodes(plan):
+    nodes, pending = [], [plan]
+    while pending:
+        node = pending.pop()
+        nodes.append(node)
+        pending.extend(node.get('Plans', []))
+    return nodes
+
+
+class Command(BaseCommand):
+    """Seed a throwaway receipt set, EXPLAIN ANALYZE old and new filters, roll back."""
+
+    cases = [
+        ('month', {'month': 3}, {'date__month': 3}),
+        ('day_of_month', {'day_of_month': 15}, {'date__day': 15}),
+        ('month+day', {'month': 3, 'day_of_month': 15}, {'date__month': 3, 'date__day': 15}),
+        ('year', {'year': 2020}, {'date__year': 2020}),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with transaction.atomic():
+            self.stdout.write(f'Seeding {options["rows"]} receipts...')
+            user_id = seed_receipts(options['rows'], options['users'])[0]
+            receipts = Receipt.objects.filter(user_id=user_id).order_by('-date', '-id')
+
+            for name, params, legacy_lookup in self.cases:
+                self.stdout.write(name)
+                self.report('before', receipts.filter(**legacy_lookup))
+                self.report('after', ReceiptFilter(params, queryset=receipts).qs)
+
+            transaction.set_rollback(True)
+
+    def report(self, label, queryset):
+        result = json.loads(queryset.explain(analyze=True, format='json'))[0]
+        nodes = plan_nodes(result['Plan'])
+        scans = ', '.join(
+            f'{node["Node Type"]}' + (f' on {node["Index Name"]}' if 'Index Name' in node else '')
+            for node in nodes if 'Scan' in node['Node Type']
+        )
+        rows_removed = sum(node.get('Rows Removed by Filter', 0) for node in nodes)
+        self.stdout.write(
+            f'  {label:6} {result["Execution Time"]:9.2f} ms  '
+            f'rows {int(result["Plan"]["Actual Rows"]):>6}  filtered out {rows_removed:>7}  {scans}'
+        )
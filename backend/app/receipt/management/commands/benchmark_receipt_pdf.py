@@ -0,0 +1,78 @@
+"""
+Django command to time the encrypted PDF receipt report
+"""
+import io
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Receipt
+from receipt.management.commands.benchmark_receipt_filters import seed_line_items, seed_receipts
+from receipt.reports import export_receipts_pdf, render_receipts_pdf
+
+
+def measure(render):
+    """Time one run, then trace a second one for peak memory (tracing slows it down)."""
+    started = time.perf_counter()
+    size = render()
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        render()
+        return seconds, tracemalloc.get_traced_memory()[1], size
+    finally:
+        tracemalloc.stop()
+
+
+def render_then_encrypt(receipts, title, password):
+    """The PyPDF2 round trip send_pdf used: render, re-parse, encrypt a copy."""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    buffer = io.BytesIO()
+    render_receipts_pdf(buffer, receipts, title)
+    buffer.seek(0)
+    writer = PdfWriter()
+    for page in PdfReader(buffer).pages:
+        writer.add_page(page)
+    writer.encrypt(user_pwd=password)
+    encrypted = io.BytesIO()
+    writer.write(encrypted)
+    return encrypted.tell()
+
+
+class Command(BaseCommand):
+    """Seed receipts in a rolled-back transaction and time the PDF report."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+        parser.add_argument('--items', type=int, default=3, help='Line items per receipt.')
+        parser.add_argument('--round-trip', action='store_true',
+                            help='Also time rendering plain and encrypting with PyPDF2 (needs PyPDF2).')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for size in options['sizes']:
+            with transaction.atomic():
+                user_id = seed_receipts(size, users=1, heavy_rows=size)[0]
+                seed_line_items(user_id, options['items'])
+                receipts = Receipt.objects.filter(user_id=user_id).order_by('-date', '-id')
+
+                self.report(size, 'single-pass', measure(lambda: self.single_pass(receipts)))
+                if options['round_trip']:
+                    self.report(size, 'round-trip', measure(
+                        lambda: render_then_encrypt(receipts, 'Benchmark', 'secret')
+                    ))
+                transaction.set_rollback(True)
+
+    def single_pass(self, receipts):
+        with export_receipts_pdf(receipts, 'Benchmark', 'secret') as pdf_file:
+            return pdf_file.seek(0, io.SEEK_END)
+
+    def report(self, size, label, result):
+        seconds, peak, pdf_bytes = result
+        self.stdout.write(
+            f'{size:>7} receipts  {label:11} {seconds:7.2f} s  '
+            f'peak {peak / 2**20:7.1f} MiB  pdf {pdf_bytes / 2**20:6.1f} MiB'
+        )
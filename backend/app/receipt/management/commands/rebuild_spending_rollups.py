@@ -0,0 +1,32 @@
+"""
+Django command to recompute the monthly spending rollups
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import MonthlyShopSpending, MonthlyTagSpending
+from receipt.rollups import rebuild
+
+
+class Command(BaseCommand):
+    """Rebuild the spending rollups from the receipts."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the only user to rebuild.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user with email {options["user"]}')
+
+        rebuild(user)
+        shop_rows, tag_rows = MonthlyShopSpending.objects.all(), MonthlyTagSpending.objects.all()
+        if user is not None:
+            shop_rows, tag_rows = shop_rows.filter(user=user), tag_rows.filter(user=user)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {shop_rows.count()} shop and {tag_rows.count()} tag rollup rows'
+        ))
@@ -0,0 +1,126 @@
+"""
+Incremental maintenance of the monthly spending rollups.
+
+Every receipt contributes (total, 1) to its MonthlyShopSpending row and to
+one MonthlyTagSpending row per tag. Saves, deletes and tag changes turn
+into signed deltas that are upserted with `+=`, so concurrent writers
+never overwrite each other. `rebuild()` recomputes everything from the
+receipts and is the fix for any drift (e.g. raw SQL writes).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.models import MonthlyShopSpending, MonthlyTagSpending, Receipt
+
+
+def month_of(value):
+    """First day of the month `value` falls in, in the current time zone."""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date().replace(day=1)
+
+
+class RollupDelta:
+    """Signed changes to the rollup rows, applied in one upsert per table."""
+
+    def __init__(self):
+        self.shops = defaultdict(lambda: [Decimal(0), 0])
+        self.tags = defaultdict(lambda: [Decimal(0), 0])
+
+    def add_receipt(self, user_id, date, shop_name, total, tag_ids=(), sign=1):
+        month = month_of(date)
+        row = self.shops[(user_id, month, shop_name)]
+        row[0] += sign * Decimal(total)
+        row[1] += sign
+        self.add_tags(user_id, date, total, tag_ids, sign)
+
+    def add_tags(self, user_id, date, total, tag_ids, sign=1):
+        month = month_of(date)
+        for tag_id in tag_ids:
+            row = self.tags[(user_id, month, tag_id)]
+            row[0] += sign * Decimal(total)
+            row[1] += sign
+
+    def apply(self):
+        # Sorted so concurrent upserts lock rows in the same order.
+        shops = sorted((*key, *value) for key, value in self.shops.items() if any(value))
+        tags = sorted((*key, *value) for key, value in self.tags.items() if any(value))
+        if not shops and not tags:
+            return
+        with transaction.atomic(), connection.cursor() as cursor:
+            if shops:
+                _upsert(cursor, MonthlyShopSpending, 'shop_name', shops)
+            if tags:
+                _upsert(cursor, MonthlyTagSpending, 'tag_id', tags)
+
+
+def _upsert(cursor, model, key_column, rows):
+    table = model._meta.db_table
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    cursor.execute(
+        f"""
+        INSERT INTO {table} AS r (user_id, month, {key_column}, total, receipt_count)
+        VALUES {values}
+        ON CONFLICT (user_id, month, {key_column}) DO UPDATE
+        SET total = r.total + EXCLUDED.total,
+            receipt_count = r.receipt_count + EXCLUDED.receipt_count
+        """,
+        [value for row in rows for value in row],
+    )
+    # Rows whose receipts have all moved away or been deleted.
+    cursor.execute(
+        f'DELETE FROM {table} WHERE user_id = ANY(%s) AND receipt_count <= 0',
+        [list({row[0] for row in rows})],
+    )
+
+
+def receipts_created(receipts):
+    """Count receipts inserted without save() signals, e.g. by bulk_create."""
+    delta = RollupDelta()
+    for receipt in receipts:
+        delta.add_receipt(receipt.user_id, receipt.date, receipt.shop_name, receipt.total)
+    delta.apply()
+
+
+def rebuild(user=None):
+    """Recompute the rollups (of one user, or everyone) from the receipts."""
+    receipts = Receipt.objects.all()
+    tagged = Receipt.tags.through.objects.all()
+    shop_rows = MonthlyShopSpending.objects.all()
+    tag_rows = MonthlyTagSpending.objects.all()
+    if user is not None:
+        receipts = receipts.filter(user=user)
+        tagged = tagged.filter(receipt__user=user)
+        shop_rows = shop_rows.filter(user=user)
+        tag_rows = tag_rows.filter(user=user)
+
+    with transaction.atomic():
+        shop_rows.delete()
+        tag_rows.delete()
+        by_shop = (
+            receipts.annotate(month=TruncMonth('date', output_field=DateField()))
+            .values('user_id', 'month', 'shop_name')
+            .annotate(sum=Sum('total'), count=Count('id'))
+            .order_by()
+        )
+        MonthlyShopSpending.objects.bulk_create(
+            (MonthlyShopSpending(user_id=row['user_id'], month=row['month'], shop_name=row['shop_name'],
+                                 total=row['sum'], receipt_count=row['count']) for row in by_shop.iterator()),
+            batch_size=1000,
+        )
+        by_tag = (
+            tagged.annotate(month=TruncMonth('receipt__date', output_field=DateField()))
+            .values('receipt__user_id', 'month', 'tag_id')
+            .annotate(sum=Sum('receipt__total'), count=Count('id'))
+            .order_by()
+        )
+        MonthlyTagSpending.objects.bulk_create(
+            (MonthlyTagSpending(user_id=row['receipt__user_id'], month=row['month'], tag_id=row['tag_id'],
+                                total=row['sum'], receipt_count=row['count']) for row in by_tag.iterator()),
+            batch_size=1000,
+        )
@@ -19,9 +19,8 @@ class ReceiptSerializer(serializers.ModelSerializer):
         tags_data = validated_data.pop('tags', [])
         receipt = Receipt.objects.create(**validated_data)
 
-        for tag in tags_data:
-            tag_obj, _ = Tag.objects.get_or_create(name=tag['name'], user=self.context['request'].user)
-            receipt.tags.add(tag_obj)
+        if tags_data:
+            receipt.tags.add(*resolve_tags(self.context['request'].user, tags_data))
 
         return receipt
 
@@ -30,13 +29,54 @@ class ReceiptSerializer(serializers.ModelSerializer):
         instance = super().update(instance, validated_data)
 
         if tags_data is not None:
-            instance.tags.clear()
-            for tag in tags_data:
-                tag_obj, _ = Tag.objects.get_or_create(
-                    name=tag['name'],
-                    user=self.context['request'].user
-                )
-                instance.tags.add(tag_obj)
+            # set() diffs against the current tags: one delete, one insert.
+            instance.tags.set(resolve_tags(self.context['request'].user, tags_data))
 
         return instance
 
+
+def resolve_tags(user, tags_data):
+    """Return the user's tags named in `tags_data`, creating missing ones.
+
+    Runs one select, plus an insert and a re-select when some are new.
+    Conflicting inserts are ignored, so a tag created concurrently under
+    the (user, name) constraint is picked up by the re-select.
+    """
+    names = list(dict.fromkeys(tag['name'] for tag in tags_data))
+    tags = {tag.name: tag for tag in Tag.objects.filter(user=user, name__in=names)}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        Tag.objects.bulk_create([Tag(user=user, name=name) for name in missing], ignore_conflicts=True)
+        tags.update((tag.name, tag) for tag in Tag.objects.filter(user=user, name__in=missing))
+    return [tags[name] for name in names]
+
+
+class SpendingQuerySerializer(serializers.Serializer):
+    GROUP_BY_CHOICES = ['month', 'shop', 'tag']
+
+    group_by = serializers.ChoiceField(choices=GROUP_BY_CHOICES, default='month')
+    start_month = serializers.DateField(input_formats=['%Y-%m'], required=False)
+    end_month = serializers.DateField(input_formats=['%Y-%m'], required=False)
+
+
+class SpendingSerializer(serializers.Serializer):
+    month = serializers.DateField(format='%Y-%m', required=False)
+    shop_name = serializers.CharField(required=False)
+    tag_id = serializers.IntegerField(required=False)
+    tag_name = serializers.CharField(required=False)
+    total = serializers.DecimalField(max_digits=14, decimal_places=2, source='spent')
+    receipt_count = serializers.IntegerField(source='receipts')
+
+
+class ProductQuerySerializer(serializers.Serializer):
+    name = serializers.CharField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50)
+
+
+class ProductSpendingSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    total = serializers.DecimalField(max_digits=14, decimal_places=2, source='spent')
+    quantity = serializers.DecimalField(max_digits=15, decimal_places=3, source='units')
+    receipt_count = serializers.IntegerField(source='receipts')
@@ -0,0 +1,99 @@
+"""
+Keep the spending rollups, line items and list cache versions in step with
+receipt and tag writes.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core.models import Receipt, Tag
+from receipt.caching import bump_data_version
+from receipt.line_items import sync_line_items
+from receipt.rollups import RollupDelta
+
+ROLLUP_FIELDS = ('user_id', 'date', 'shop_name', 'total')
+
+
+def _rollup_key(receipt):
+    return tuple(getattr(receipt, field) for field in ROLLUP_FIELDS)
+
+
+@receiver(pre_save, sender=Receipt)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous = instance._items_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    row = Receipt.objects.filter(pk=instance.pk).values_list(*ROLLUP_FIELDS, 'items').first()
+    if row is not None:
+        instance._rollup_previous, instance._items_previous = row[:-1], row[-1]
+
+
+@receiver(post_save, sender=Receipt)
+def receipt_items_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.items != getattr(instance, '_items_previous', None):
+        sync_line_items(instance, created)
+
+
+@receiver(post_save, sender=Receipt)
+def receipt_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    current = _rollup_key(instance)
+    if previous == current:
+        return
+
+    delta = RollupDelta()
+    delta.add_receipt(*current)
+    if previous is not None:
+        # Tags don't change on save, so they move from the old key to the new.
+        tag_ids = list(instance.tags.values_list('id', flat=True))
+        delta.add_receipt(*previous, sign=-1)
+        delta.add_tags(previous[0], previous[1], previous[3], tag_ids, sign=-1)
+        delta.add_tags(instance.user_id, instance.date, instance.total, tag_ids)
+    delta.apply()
+
+
+@receiver(pre_delete, sender=Receipt)
+def receipt_deleted(sender, instance, **kwargs):
+    delta = RollupDelta()
+    delta.add_receipt(*_rollup_key(instance), tag_ids=instance.tags.values_list('id', flat=True), sign=-1)
+    delta.apply()
+
+
+@receiver(m2m_changed, sender=Receipt.tags.through)
+def receipt_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Count receipts into (or out of) the tags they gain (or lose).
+
+    post_add gets only the links actually inserted, but pre_remove gets
+    whatever ids were passed, so those are checked against the table.
+    """
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    links = sender.objects.filter(**{'tag_id' if reverse else 'receipt_id': instance.pk})
+    if action != 'pre_clear':
+        links = links.filter(**{'receipt_id__in' if reverse else 'tag_id__in': pk_set})
+    rows = links.values_list('tag_id', 'receipt__user_id', 'receipt__date', 'receipt__total')
+
+    sign = 1 if action == 'post_add' else -1
+    delta = RollupDelta()
+    for tag_id, user_id, date, total in rows:
+        delta.add_tags(user_id, date, total, [tag_id], sign)
+    delta.apply()
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_delete, sender=Receipt)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def data_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_data_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Receipt.tags.through)
+def receipt_tag_links_changed(sender, instance, action, **kwargs):
+    # Receipts are only ever linked to tags of the same user.
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_data_version(instance.user_id)
@@ -0,0 +1,118 @@
+"""
+Tests for the async read views, checked against the DRF views they replace.
+"""
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import Tag
+from receipt.async_views import receipt_list, tag_list
+from receipt.tests.test_receipt_api import LIST_URL, create_receipt
+from user.async_views import me
+
+TAGS_URL = '/api/receipt/tags/list'
+ME_URL = '/api/user/me'
+
+
+class AsyncReadViewTests(TestCase):
+    """Test the async views answer exactly like the sync ones."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='async@example.com', password='testpass123', name='Async',
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        food = Tag.objects.create(user=self.user, name='food')
+        Tag.objects.create(user=self.user, name='home')
+        for i in range(5):
+            receipt = create_receipt(self.user, shop_name=f'Shop {i}', total=f'{i + 1}.50')
+            if i % 2:
+                receipt.tags.add(food)
+        create_receipt(get_user_model().objects.create_user(email='other@example.com', password='x'))
+
+    def call(self, view, path, params=None, token=None, **headers):
+        token = self.token if token is None else token
+        if token:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        request = RequestFactory().get(path, params or {}, **headers)
+        return async_to_sync(view)(request)
+
+    def assertSameAsSync(self, view, path, params=None):
+        expected = self.client.get(path, params)
+        caches['responses'].clear()
+
+        res = self.call(view, path, params)
+
+        self.assertEqual(res.status_code, expected.status_code)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(res.content), json.loads(expected.content))
+        return res
+
+    def test_receipt_list(self):
+        for params in ({}, {'tags': 'food'}, {'min_total': '2', 'shop_name': 'shop'}, {'page_size': 2}):
+            with self.subTest(params=params):
+                self.assertSameAsSync(receipt_list, LIST_URL, params)
+
+    def test_receipt_list_next_page(self):
+        first = self.call(receipt_list, LIST_URL, {'page_size': 2})
+        cursor = json.loads(first.content)['next_cursor']
+
+        self.assertSameAsSync(receipt_list, LIST_URL, {'page_size': 2, 'cursor': cursor})
+
+    def test_receipt_list_invalid_filter(self):
+        res = self.assertSameAsSync(receipt_list, LIST_URL, {'min_total': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tag_list(self):
+        self.assertSameAsSync(tag_list, TAGS_URL)
+
+    def test_me(self):
+        self.assertSameAsSync(me, ME_URL)
+
+    def test_me_update_goes_to_sync_view(self):
+        request = RequestFactory().patch(ME_URL, {'name': 'Renamed'}, content_type='application/json',
+                                         HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+        res = async_to_sync(me)(request)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Renamed')
+
+    def test_shares_etag_with_sync_view(self):
+        etag = self.client.get(LIST_URL)['ETag']
+
+        res = self.call(receipt_list, LIST_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_requires_token(self):
+        res = self.call(receipt_list, LIST_URL, token='')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Bearer realm="api"')
+
+    def test_invalid_token(self):
+        res = self.call(tag_list, TAGS_URL, token='not-a-jwt')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(res.content)['code'], 'token_not_valid')
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.call(me, ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,199 @@
+"""
+Tests for the CSV exports.
+"""
+import csv
+import io
+import tracemalloc
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyzipper
+from django.core import mail
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipt
+from receipt.exports import export_columnar, export_csv_zip
+from receipt.management.commands.benchmark_receipt_filters import seed_line_items, seed_receipts
+from receipt.tests.test_receipt_api import create_receipt
+
+EXPORT_URL = '/api/receipt/export-csv/'
+SEND_CSV_URL = '/api/receipt/send-csv/'
+PARQUET_URL = '/api/receipt/export-parquet/'
+ARROW_URL = '/api/receipt/export-arrow/'
+
+
+def read_zip(data, password=None):
+    with pyzipper.AESZipFile(io.BytesIO(data)) as zf:
+        if password:
+            zf.setpassword(password.encode())
+        return list(csv.reader(io.StringIO(zf.read('receipts.csv').decode())))
+
+
+class CSVExportTests(TestCase):
+    """Test the CSV download and email exports."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user(email='export@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.receipt = create_receipt(self.user, shop_name='Lidl', items=[
+            {'name': 'LAPTE', 'quantity': '2', 'unit_price': '5,99', 'price': '11,98'},
+            {'name': 'BANANE', 'quantity': '1,245', 'unit_price': 'Could not parse unit price', 'price': '8.70'},
+        ])
+        self.empty = create_receipt(self.user, shop_name='Profi')
+
+    def download(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/zip')
+        return b''.join(res.streaming_content)
+
+    def test_download_encrypted(self):
+        rows = read_zip(self.download(csv_password='secret'), 'secret')
+
+        self.assertEqual(rows[0][:2], ['Receipt ID', 'Shop'])
+        self.assertIn([str(self.receipt.id), 'Lidl', '2025-05-01', '10.00', 'LAPTE', '2', '5.99', '11.98'], rows)
+        self.assertIn([str(self.receipt.id), 'Lidl', '2025-05-01', '10.00', 'BANANE', '1.245', '', '8.70'], rows)
+        self.assertIn([str(self.empty.id), 'Profi', '2025-05-01', '10.00', '', '', '', ''], rows)
+
+    def test_download_wrong_password_fails(self):
+        data = self.download(csv_password='secret')
+
+        with self.assertRaises(RuntimeError):
+            read_zip(data, 'wrong')
+
+    def test_download_unencrypted(self):
+        rows = read_zip(self.download(csv_password=''))
+
+        self.assertEqual(len(rows), 1 + 3 + 2)
+
+    def test_download_applies_filters(self):
+        rows = read_zip(self.download(csv_password='', shop_name='profi'))
+
+        self.assertEqual({row[1] for row in rows[1:] if row}, {'Profi'})
+
+    def test_send_csv_emails_zip(self):
+        res = self.client.post(f'{SEND_CSV_URL}?csv_password=secret')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        name, content, mimetype = mail.outbox[0].attachments[0]
+        self.assertEqual((name, mimetype), ('receipts.zip', 'application/zip'))
+        self.assertEqual(len(read_zip(content, 'secret')), 1 + 3 + 2)
+
+    def test_send_csv_without_receipts(self):
+        Receipt.objects.all().delete()
+
+        res = self.client.post(SEND_CSV_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ColumnarExportTests(TestCase):
+    """Test the Parquet and Arrow downloads."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user(email='columnar@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.receipt = create_receipt(self.user, shop_name='Lidl', total=Decimal('20.68'), items=[
+            {'name': 'LAPTE', 'quantity': '2', 'unit_price': '5,99', 'price': '11,98'},
+            {'name': 'BANANE', 'quantity': '1,245', 'unit_price': 'Could not parse unit price', 'price': '8.70'},
+        ])
+        self.empty = create_receipt(self.user, shop_name='Profi')
+
+    def download(self, url, content_type, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], content_type)
+        return b''.join(res.streaming_content)
+
+    def test_parquet_keeps_decimals_and_items(self):
+        data = self.download(PARQUET_URL, 'application/vnd.apache.parquet')
+        table = pq.read_table(io.BytesIO(data))
+
+        self.assertEqual(table.schema.field('total').type, pa.decimal128(10, 2))
+        rows = {row['id']: row for row in table.to_pylist()}
+        self.assertEqual(rows[self.receipt.id]['total'], Decimal('20.68'))
+        self.assertEqual(rows[self.receipt.id]['line_items'], [
+            {'position': 0, 'name': 'LAPTE', 'quantity': Decimal('2.000'),
+             'unit_price': Decimal('5.99'), 'price': Decimal('11.98')},
+            {'position': 1, 'name': 'BANANE', 'quantity': Decimal('1.245'),
+             'unit_price': None, 'price': Decimal('8.70')},
+        ])
+        self.assertEqual(rows[self.empty.id]['line_items'], [])
+        self.assertEqual(pq.ParquetFile(io.BytesIO(data)).metadata.row_group(0).column(0).compression, 'ZSTD')
+
+    def test_arrow(self):
+        data = self.download(ARROW_URL, 'application/vnd.apache.arrow.file')
+        table = pa.ipc.open_file(io.BytesIO(data)).read_all()
+
+        self.assertEqual(table.column('shop_name').to_pylist(), ['Profi', 'Lidl'])
+
+    def test_applies_filters(self):
+        data = self.download(PARQUET_URL, 'application/vnd.apache.parquet', shop_name='profi')
+
+        self.assertEqual(pq.read_table(io.BytesIO(data)).column('id').to_pylist(), [self.empty.id])
+
+    def test_only_own_receipts(self):
+        other = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        create_receipt(other)
+
+        data = self.download(PARQUET_URL, 'application/vnd.apache.parquet')
+
+        self.assertEqual(pq.read_table(io.BytesIO(data)).num_rows, 2)
+
+    def test_no_receipts(self):
+        Receipt.objects.all().delete()
+
+        data = self.download(PARQUET_URL, 'application/vnd.apache.parquet')
+
+        self.assertEqual(pq.read_table(io.BytesIO(data)).num_rows, 0)
+
+    @override_settings(RECEIPT_EXPORT_CHUNK_SIZE=1)
+    def test_batch_per_chunk(self):
+        receipts = Receipt.objects.filter(user=self.user).order_by('-date', '-id')
+        with export_columnar(receipts, 'parquet') as parquet_file:
+            parquet = pq.ParquetFile(parquet_file)
+
+            self.assertEqual(parquet.metadata.num_row_groups, 2)
+            self.assertEqual(len(parquet.read().column('line_items')[1].as_py()), 2)
+
+
+@override_settings(RECEIPT_EXPORT_CHUNK_SIZE=500, RECEIPT_EXPORT_SPOOL_SIZE=64 * 1024)
+class CSVExportMemoryTests(TestCase):
+    """Test export memory doesn't grow with the number of receipts."""
+
+    def export_peak(self, rows):
+        user_id = seed_receipts(rows, users=1, heavy_rows=rows)[0]
+        seed_line_items(user_id)
+        receipts = Receipt.objects.filter(user_id=user_id).order_by('-date', '-id')
+
+        tracemalloc.start()
+        try:
+            with export_csv_zip(receipts, 'secret') as zip_file:
+                size = zip_file.seek(0, io.SEEK_END)
+            return tracemalloc.get_traced_memory()[1], size
+        finally:
+            tracemalloc.stop()
+
+    def test_peak_memory_is_flat(self):
+        small_peak, small_size = self.export_peak(2_000)
+        large_peak, large_size = self.export_peak(20_000)
+
+        self.assertGreater(large_size, 5 * small_size)
+        self.assertLess(large_peak, 2 * small_peak)
+
+    def test_parquet_smaller_than_csv(self):
+        user_id = seed_receipts(5_000, users=1, heavy_rows=5_000)[0]
+        seed_line_items(user_id)
+        receipts = Receipt.objects.filter(user_id=user_id).order_by('-date', '-id')
+
+        with export_csv_zip(receipts) as zip_file, export_columnar(receipts) as parquet_file:
+            self.assertLess(parquet_file.seek(0, io.SEEK_END), zip_file.seek(0, io.SEEK_END))
@@ -0,0 +1,148 @@
+"""
+Tests for typed line items and product queries.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import LineItem
+from receipt.line_items import parse_decimal
+from receipt.tests.test_receipt_api import LIST_URL, create_receipt
+
+PRODUCTS_URL = '/api/receipt/analytics/products'
+
+OCR_ITEMS = [
+    {'name': 'LAPTE 1.5% 1L', 'quantity': '2', 'unit_price': '5.99', 'price': '11,98 B'},
+    {'name': 'BANANE', 'quantity': '1,245', 'unit_price': 'Could not parse unit price', 'price': '8.70'},
+    {'price': '3.00'},
+]
+
+
+class ParseDecimalTests(SimpleTestCase):
+    """Test parsing prices and quantities from receipt JSON."""
+
+    def test_numbers(self):
+        self.assertEqual(parse_decimal(5.99, 2), Decimal('5.99'))
+        self.assertEqual(parse_decimal(2, 3), Decimal('2.000'))
+
+    def test_ocr_strings(self):
+        self.assertEqual(parse_decimal('11,98 B', 2), Decimal('11.98'))
+        self.assertEqual(parse_decimal('1,245', 3), Decimal('1.245'))
+        self.assertEqual(parse_decimal('RON 4.499', 2), Decimal('4.50'))
+
+    def test_negative_amounts(self):
+        self.assertEqual(parse_decimal('-1,00', 2), Decimal('-1.00'))
+        self.assertEqual(parse_decimal('1,00-', 2), Decimal('-1.00'))
+        self.assertEqual(parse_decimal('DISCOUNT - 2.50 A', 2), Decimal('-2.50'))
+        self.assertEqual(parse_decimal('2-3', 3), Decimal('2.000'))
+
+    def test_thousands_separators(self):
+        self.assertEqual(parse_decimal('1.234,56', 2), Decimal('1234.56'))
+        self.assertEqual(parse_decimal('1,234,567.89', 2), Decimal('1234567.89'))
+        self.assertEqual(parse_decimal('1,234', 3), Decimal('1.234'))
+
+    def test_unparseable(self):
+        for value in (None, '', 'Could not parse unit price', True, {'a': 1}, '123456789'):
+            self.assertIsNone(parse_decimal(value, 2), value)
+
+
+class LineItemSyncTests(TestCase):
+    """Test line items follow Receipt.items."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='items@example.com', password='testpass123')
+
+    def lines(self, receipt):
+        return list(receipt.line_items.order_by('position').values_list('name', 'quantity', 'unit_price', 'price'))
+
+    def test_created_from_ocr_json(self):
+        receipt = create_receipt(self.user, items=OCR_ITEMS)
+
+        self.assertEqual(self.lines(receipt), [
+            ('LAPTE 1.5% 1L', Decimal('2.000'), Decimal('5.99'), Decimal('11.98')),
+            ('BANANE', Decimal('1.245'), None, Decimal('8.70')),
+            ('', None, None, Decimal('3.00')),
+        ])
+        self.assertEqual({line.user_id for line in receipt.line_items.all()}, {self.user.id})
+
+    def test_replaced_when_items_change(self):
+        receipt = create_receipt(self.user, items=OCR_ITEMS)
+
+        receipt.items = [{'name': 'PAINE', 'quantity': 1, 'unit_price': 4.49, 'price': 4.49}]
+        receipt.save()
+
+        self.assertEqual(self.lines(receipt), [('PAINE', Decimal('1.000'), Decimal('4.49'), Decimal('4.49'))])
+
+    def test_kept_when_items_unchanged(self):
+        receipt = create_receipt(self.user, items=OCR_ITEMS)
+        ids = set(receipt.line_items.values_list('id', flat=True))
+
+        receipt.total = Decimal('99.00')
+        receipt.save()
+
+        self.assertEqual(set(receipt.line_items.values_list('id', flat=True)), ids)
+
+    def test_non_list_items(self):
+        receipt = create_receipt(self.user, items={'unexpected': 'shape'})
+
+        self.assertEqual(self.lines(receipt), [])
+
+
+class ProductQueryTests(TestCase):
+    """Test product filtering and aggregation."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='products@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.with_milk = create_receipt(self.user, items=OCR_ITEMS)
+        self.without_milk = create_receipt(self.user, items=[{'name': 'PAINE', 'quantity': 1, 'price': 4.49}])
+        create_receipt(self.user, items=[
+            {'name': 'LAPTE 1.5% 1L', 'quantity': '1', 'price': '5.99'},
+            {'name': 'Lapte batut', 'quantity': '1', 'price': '3.50'},
+        ])
+        other = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        create_receipt(other, items=[{'name': 'LAPTE 1.5% 1L', 'quantity': '9', 'price': '90'}])
+
+    def test_filter_receipts_by_product(self):
+        res = self.client.get(LIST_URL, {'product': 'lapte'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+        self.assertNotIn(self.without_milk.id, [r['id'] for r in res.data])
+
+    def test_product_spending(self):
+        res = self.client.get(PRODUCTS_URL, {'name': 'lapte'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([dict(row) for row in res.data], [
+            {'name': 'LAPTE 1.5% 1L', 'total': '17.97', 'quantity': '3.000', 'receipt_count': 2},
+            {'name': 'Lapte batut', 'total': '3.50', 'quantity': '1.000', 'receipt_count': 1},
+        ])
+
+    def test_product_spending_date_range_covers_whole_days(self):
+        for day, hour in [(1, 0), (2, 23), (3, 0)]:
+            create_receipt(self.user, date=datetime(2025, 6, day, hour, 30, tzinfo=timezone.utc), items=[
+                {'name': 'PAINE', 'quantity': 1, 'price': day},
+            ])
+
+        res = self.client.get(PRODUCTS_URL, {'name': 'paine', 'start_date': '2025-06-01', 'end_date': '2025-06-02'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([dict(row) for row in res.data], [
+            {'name': 'PAINE', 'total': '3.00', 'quantity': '2.000', 'receipt_count': 2},
+        ])
+
+    def test_product_spending_limit(self):
+        res = self.client.get(PRODUCTS_URL, {'limit': 1})
+
+        self.assertEqual([row['name'] for row in res.data], ['LAPTE 1.5% 1L'])
+
+    def test_line_items_deleted_with_receipt(self):
+        self.with_milk.delete()
+
+        self.assertFalse(LineItem.objects.filter(receipt_id=self.with_milk.id).exists())
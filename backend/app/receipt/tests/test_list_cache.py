@@ -0,0 +1,131 @@
+"""
+Tests for the versioned list response cache.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag
+from receipt.tests.test_receipt_api import LIST_URL, create_receipt
+
+TAGS_URL = '/api/receipt/tags/list'
+
+
+class ListCacheTests(TestCase):
+    """Test list responses are cached per user data version."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = get_user_model().objects.create_user(email='cache@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(user=self.user, name='food')
+        self.receipt = create_receipt(self.user, shop_name='Lidl')
+        self.receipt.tags.add(self.tag)
+
+    def get(self, url=LIST_URL, params=None, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params, headers=headers)
+        return res, [query['sql'] for query in ctx.captured_queries]
+
+    def assertChanged(self, etag, url=LIST_URL):
+        res, _ = self.get(url, etag=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        return res
+
+    def test_not_modified_reads_only_version(self):
+        res, _ = self.get()
+        self.assertEqual(res['Cache-Control'], 'private, no-cache')
+
+        again, queries = self.get(etag=res['ETag'])
+
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again['ETag'], res['ETag'])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('core_receipt', queries[0])
+
+    def test_cache_hit_skips_receipt_query(self):
+        res, _ = self.get()
+
+        again, queries = self.get()
+
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data, res.data)
+        self.assertEqual(len(queries), 1)
+
+    def test_receipt_writes_change_version(self):
+        etag = self.get()[0]['ETag']
+        receipt = create_receipt(self.user, shop_name='Profi')
+        res = self.assertChanged(etag)
+        self.assertEqual(len(res.data), 2)
+
+        receipt.shop_name = 'Kaufland'
+        receipt.save()
+        res = self.assertChanged(res['ETag'])
+        self.assertIn('Kaufland', [r['shop_name'] for r in res.data])
+
+        receipt.delete()
+        res = self.assertChanged(res['ETag'])
+        self.assertEqual(len(res.data), 1)
+
+    def test_tag_writes_change_both_lists(self):
+        receipts_etag = self.get()[0]['ETag']
+        tags_etag = self.get(TAGS_URL)[0]['ETag']
+
+        self.tag.name = 'groceries'
+        self.tag.save()
+
+        res = self.assertChanged(receipts_etag)
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'groceries')
+        res = self.assertChanged(tags_etag, TAGS_URL)
+        self.assertEqual([tag['name'] for tag in res.data], ['groceries'])
+
+    def test_tag_links_change_version(self):
+        etag = self.get()[0]['ETag']
+
+        self.receipt.tags.clear()
+
+        res = self.assertChanged(etag)
+        self.assertEqual(res.data[0]['tags'], [])
+
+    def test_api_write_changes_version(self):
+        etag = self.get()[0]['ETag']
+
+        self.client.patch(f'/api/receipt/partial_update/{self.receipt.id}', {'shop_name': 'Mega'}, format='json')
+
+        self.assertEqual(self.assertChanged(etag).data[0]['shop_name'], 'Mega')
+
+    def test_params_normalized(self):
+        first = self.get(params={'shop_name': 'lidl', 'min_total': '1'})[0]
+        second, queries = self.get(params={'min_total': '1', 'shop_name': 'lidl'})
+        other = self.get(params={'shop_name': 'profi'})[0]
+
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(len(queries), 1)
+        self.assertNotEqual(first['ETag'], other['ETag'])
+        self.assertEqual(other.data, [])
+
+    def test_users_do_not_share_entries(self):
+        etag = self.get()[0]['ETag']
+        other = get_user_model().objects.create_user(email='other-cache@example.com', password='testpass123')
+        create_receipt(other)
+        self.client.force_authenticate(user=other)
+
+        res, _ = self.get(etag=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertNotEqual(res.data[0]['id'], self.receipt.id)
+
+    def test_other_users_writes_keep_version(self):
+        etag = self.get()[0]['ETag']
+        other = get_user_model().objects.create_user(email='other-cache@example.com', password='testpass123')
+        create_receipt(other)
+
+        self.assertEqual(self.get(etag=etag)[0].status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,163 @@
+"""
+Query budget tests for receipt endpoints.
+
+Each endpoint is called with a few receipts and again with many; it must
+stay within its budget and run the same number of queries both times.
+List budgets include the response cache's data-version read; adding
+receipts bumps the version, so these calls always miss the cache.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag
+from receipt.tests.test_receipt_api import LIST_URL, create_receipt
+
+SEND_PDF_URL = '/api/receipt/send-pdf/'
+SEND_CSV_URL = '/api/receipt/send-csv/'
+CREATE_URL = '/api/receipt/create'
+
+
+class ReceiptQueryBudgetTests(TestCase):
+    """Test receipt endpoints run a constant number of queries."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='budget@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tags = [Tag.objects.create(user=self.user, name=name) for name in ('food', 'home', 'work')]
+
+    def add_receipts(self, count):
+        for i in range(count):
+            receipt = create_receipt(self.user, items=[{
+                'name': 'Lapte', 'quantity': 1, 'unit_price': 5.99, 'price': 5.99,
+            }])
+            receipt.tags.set(self.tags[:1 + i % len(self.tags)])
+
+    def count_queries(self, method, url, params=None, expected_status=status.HTTP_200_OK):
+        with CaptureQueriesContext(connection) as ctx:
+            res = getattr(self.client, method)(url, params)
+        self.assertEqual(res.status_code, expected_status)
+        return len(ctx.captured_queries), res
+
+    def assertQueryBudget(self, budget, method, url, params=None):
+        self.add_receipts(2)
+        few, _ = self.count_queries(method, url, params)
+        self.add_receipts(30)
+        many, _ = self.count_queries(method, url, params)
+
+        self.assertLessEqual(few, budget)
+        self.assertEqual(few, many, f'{url} ran {few} queries for 2 receipts but {many} for 32')
+
+    def test_list(self):
+        self.assertQueryBudget(3, 'get', LIST_URL)
+
+    def test_list_paginated(self):
+        self.assertQueryBudget(3, 'get', LIST_URL, {'page_size': 50})
+
+    def test_list_filtered_by_tags(self):
+        self.assertQueryBudget(3, 'get', LIST_URL, {'tags': 'food'})
+
+    def test_list_serializes_tags(self):
+        self.add_receipts(3)
+
+        _, res = self.count_queries('get', LIST_URL)
+
+        self.assertEqual(sorted(len(r['tags']) for r in res.data), [1, 2, 3])
+
+    # Exports: exists(), then a receipts and a line items query per chunk.
+    def test_send_pdf(self):
+        self.assertQueryBudget(3, 'post', SEND_PDF_URL)
+
+    def test_send_csv(self):
+        self.assertQueryBudget(3, 'post', SEND_CSV_URL)
+
+
+class ReceiptTagWriteTests(TestCase):
+    """Test tag assignment on create/update is constant in the number of tags."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='tagwrites@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def payload(self, names):
+        return {
+            'shop_name': 'Lidl',
+            'items': [],
+            'total': '10.00',
+            'date': '2025-05-01',
+            'tags': [{'name': name} for name in names],
+        }
+
+    def create(self, names):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(CREATE_URL, self.payload(names), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return len(ctx.captured_queries), res
+
+    def update(self, receipt_id, names):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                f'/api/receipt/partial_update/{receipt_id}',
+                {'tags': [{'name': name} for name in names]},
+                format='json',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), res
+
+    def test_create_queries_do_not_grow_with_tags(self):
+        few, _ = self.create(['a', 'b'])
+        many, _ = self.create([f'new{i}' for i in range(25)])
+
+        self.assertEqual(few, many)
+
+    def test_update_queries_do_not_grow_with_tags(self):
+        _, res = self.create(['a'])
+        few, _ = self.update(res.data['id'], ['b', 'c'])
+        many, _ = self.update(res.data['id'], [f'new{i}' for i in range(25)])
+
+        self.assertEqual(few, many)
+
+    def test_create_reuses_existing_tags(self):
+        existing = Tag.objects.create(user=self.user, name='food')
+
+        _, res = self.create(['food', 'home', 'home'])
+
+        self.assertEqual([t['name'] for t in res.data['tags']], ['food', 'home'])
+        self.assertIn(existing.id, [t['id'] for t in res.data['tags']])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_create_ignores_other_users_tags(self):
+        other = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        Tag.objects.create(user=other, name='food')
+
+        _, res = self.create(['food'])
+
+        tag = Tag.objects.get(id=res.data['tags'][0]['id'])
+        self.assertEqual(tag.user, self.user)
+
+    def test_update_replaces_tags(self):
+        _, res = self.create(['a', 'b'])
+
+        _, res = self.update(res.data['id'], ['b', 'c'])
+
+        self.assertEqual(sorted(t['name'] for t in res.data['tags']), ['b', 'c'])
+
+    def test_update_without_tags_keeps_them(self):
+        _, res = self.create(['a'])
+
+        patched = self.client.patch(f'/api/receipt/partial_update/{res.data["id"]}', {'total': '12.00'}, format='json')
+
+        self.assertEqual([t['name'] for t in patched.data['tags']], ['a'])
@@ -0,0 +1,92 @@
+"""
+Query plan regression tests for receipt filtering.
+
+The receipt table is seeded with QUERY_PLAN_ROWS rows (200k by default)
+spread over many users, with one heavy user holding a tenth of them, then
+ANALYZEd so the planner sees realistic statistics. 200k is about the
+smallest table on which the planner still prefers the trigram index for a
+rare shop; set QUERY_PLAN_ROWS=1000000 for a production-sized check.
+"""
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Receipt
+from receipt.filters import ReceiptFilter
+from receipt.management.commands.benchmark_receipt_filters import plan_nodes as flatten_plan, seed_receipts
+
+ROWS = int(os.environ.get('QUERY_PLAN_ROWS', 200_000))
+USERS = 1000
+
+
+def plan_nodes(queryset):
+    """Flatten the JSON EXPLAIN plan of a queryset into a list of nodes."""
+    return flatten_plan(json.loads(queryset.explain(format='json'))[0]['Plan'])
+
+
+class ReceiptQueryPlanTests(TestCase):
+    """Test receipt list filters are served by indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user_ids = seed_receipts(ROWS, USERS)
+        cls.heavy_user = get_user_model().objects.get(id=user_ids[0])
+        cls.user = get_user_model().objects.get(id=user_ids[1])
+
+    def filtered(self, user, **params):
+        queryset = Receipt.objects.filter(user=user).order_by('-date', '-id')
+        return ReceiptFilter(params, queryset=queryset).qs
+
+    def assertUsesIndex(self, queryset, index_name):
+        nodes = plan_nodes(queryset)
+        used = {node.get('Index Name') for node in nodes}
+        self.assertIn(index_name, used, json.dumps(nodes[0], indent=1)[:2000])
+        self.assertNotIn('Seq Scan', {node['Node Type'] for node in nodes})
+
+    def test_list_page_uses_user_date_index(self):
+        queryset = self.filtered(self.heavy_user)[:50]
+
+        self.assertUsesIndex(queryset, 'receipt_user_date_idx')
+        self.assertNotIn('Sort', {node['Node Type'] for node in plan_nodes(queryset)})
+
+    def test_date_range_uses_user_date_index(self):
+        queryset = self.filtered(self.heavy_user, start_date='2020-01-01', end_date='2020-01-31')
+
+        self.assertUsesIndex(queryset, 'receipt_user_date_idx')
+
+    def test_total_range_uses_user_total_index(self):
+        queryset = self.filtered(self.heavy_user, min_total='10.00', max_total='10.50')
+
+        self.assertUsesIndex(queryset, 'receipt_user_total_idx')
+
+    def test_shop_name_search_uses_trigram_index(self):
+        queryset = self.filtered(self.heavy_user, shop_name='carrefour')
+
+        self.assertUsesIndex(queryset, 'receipt_shop_trgm_idx')
+
+    def test_light_user_list_avoids_seq_scan(self):
+        queryset = self.filtered(self.user, shop_name='lidl')
+
+        self.assertNotIn('Seq Scan', {node['Node Type'] for node in plan_nodes(queryset)})
+
+    def test_month_filter_uses_calendar_index(self):
+        queryset = self.filtered(self.heavy_user, month=3)
+
+        self.assertUsesIndex(queryset, 'receipt_user_month_idx')
+
+    def test_month_and_day_filter_uses_calendar_index(self):
+        queryset = self.filtered(self.heavy_user, month=3, day_of_month=15)
+
+        self.assertUsesIndex(queryset, 'receipt_user_month_idx')
+
+    def test_day_filter_uses_calendar_index(self):
+        queryset = self.filtered(self.heavy_user, day_of_month=15)
+
+        self.assertUsesIndex(queryset, 'receipt_user_day_idx')
+
+    def test_year_filter_uses_user_date_index(self):
+        queryset = self.filtered(self.heavy_user, year=2020)
+
+        self.assertUsesIndex(queryset, 'receipt_user_date_idx')
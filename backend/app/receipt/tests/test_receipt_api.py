@@ -0,0 +1,130 @@
+"""
+Tests for the receipt API.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipt
+
+LIST_URL = '/api/receipt/list'
+
+
+def create_receipt(user, **params):
+    defaults = {
+        'shop_name': 'Lidl',
+        'items': [],
+        'total': Decimal('10.00'),
+        'date': datetime(2025, 5, 1, tzinfo=timezone.utc),
+    }
+    defaults.update(params)
+    return Receipt.objects.create(user=user, **defaults)
+
+
+class ReceiptPaginationTests(TestCase):
+    """Test keyset pagination of the receipt list."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='pages@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        # Several receipts share a date, so ids must break the ties.
+        for day in (1, 1, 1, 2, 2, 3):
+            create_receipt(self.user, date=datetime(2025, 5, day, tzinfo=timezone.utc))
+
+    def fetch_all(self, page_size, between_pages=None):
+        ids, params = [], {'page_size': page_size}
+        while True:
+            res = self.client.get(LIST_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(r['id'] for r in res.data['results'])
+            if not res.data['next_cursor']:
+                return ids
+            params = {'page_size': page_size, 'cursor': res.data['next_cursor']}
+            if between_pages:
+                between_pages()
+
+    def test_unpaginated_without_params(self):
+        res = self.client.get(LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 6)
+
+    def test_pages_follow_date_then_id(self):
+        expected = list(
+            Receipt.objects.filter(user=self.user).order_by('-date', '-id').values_list('id', flat=True)
+        )
+
+        self.assertEqual(self.fetch_all(page_size=2), expected)
+
+    def test_concurrent_inserts_do_not_shift_pages(self):
+        expected = list(
+            Receipt.objects.filter(user=self.user).order_by('-date', '-id').values_list('id', flat=True)
+        )
+
+        ids = self.fetch_all(
+            page_size=2,
+            between_pages=lambda: create_receipt(self.user, date=datetime(2025, 6, 1, tzinfo=timezone.utc)),
+        )
+
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        res = self.client.get(LIST_URL, {'cursor': 'garbage'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ReceiptCalendarFilterTests(TestCase):
+    """Test the month, day_of_month and year filters."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='calendar@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.dates = {
+            'new_year': datetime(2024, 1, 1, tzinfo=timezone.utc),
+            'eve': datetime(2024, 12, 31, 23, 59, 59, tzinfo=timezone.utc),
+            'march_15': datetime(2025, 3, 15, 12, tzinfo=timezone.utc),
+            'may_15': datetime(2025, 5, 15, tzinfo=timezone.utc),
+        }
+        self.ids = {
+            name: create_receipt(self.user, date=date).id for name, date in self.dates.items()
+        }
+
+    def filter_ids(self, **params):
+        res = self.client.get(LIST_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return {r['id'] for r in res.data}
+
+    def test_filter_by_month(self):
+        self.assertEqual(self.filter_ids(month=3), {self.ids['march_15']})
+
+    def test_filter_by_day(self):
+        self.assertEqual(self.filter_ids(day_of_month=15), {self.ids['march_15'], self.ids['may_15']})
+
+    def test_filter_by_month_and_day(self):
+        self.assertEqual(self.filter_ids(month=5, day_of_month=15), {self.ids['may_15']})
+
+    def test_filter_by_year_includes_both_ends(self):
+        self.assertEqual(self.filter_ids(year=2024), {self.ids['new_year'], self.ids['eve']})
+
+    def test_filter_by_out_of_range_year(self):
+        self.assertEqual(self.filter_ids(year=99999), set())
+
+    def test_calendar_columns_follow_date_updates(self):
+        receipt = Receipt.objects.get(id=self.ids['may_15'])
+        receipt.date = datetime(2025, 7, 4, tzinfo=timezone.utc)
+        receipt.save()
+
+        self.assertEqual(self.filter_ids(month=7, day_of_month=4), {receipt.id})
@@ -0,0 +1,69 @@
+"""
+Tests for the PDF receipt report.
+"""
+import io
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipt
+from receipt.reports import export_receipts_pdf
+from receipt.tests.test_receipt_api import create_receipt
+
+SEND_PDF_URL = '/api/receipt/send-pdf/'
+
+
+class ReceiptPDFTests(TestCase):
+    """Test the single-pass encrypted PDF report."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user(email='pdf@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(60):
+            create_receipt(self.user, shop_name=f'Shop {i}', items=[
+                {'name': f'Item {n}', 'quantity': '1', 'unit_price': '2,50', 'price': '2,50'} for n in range(5)
+            ])
+
+    def render(self, password=None):
+        receipts = Receipt.objects.filter(user=self.user).order_by('-date', '-id')
+        with export_receipts_pdf(receipts, 'Receipts', password) as pdf_file:
+            return pdf_file.read()
+
+    def test_encrypted_in_one_pass(self):
+        data = self.render('secret')
+
+        self.assertTrue(data.startswith(b'%PDF-'))
+        self.assertIn(b'/Encrypt', data)
+        self.assertNotIn(b'Shop 1', data)
+
+    def test_unencrypted_without_password(self):
+        data = self.render()
+
+        self.assertNotIn(b'/Encrypt', data)
+
+    def test_breaks_pages(self):
+        data = self.render()
+
+        # 60 receipts with 5 items each don't fit on one A4 page.
+        self.assertGreater(data.count(b'/Type /Page\n'), 1)
+
+    def test_send_pdf_emails_report(self):
+        res = self.client.post(f'{SEND_PDF_URL}?pdf_password=secret')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        name, content, mimetype = mail.outbox[0].attachments[0]
+        self.assertEqual((name, mimetype), ('receipts.pdf', 'application/pdf'))
+        self.assertIn(b'/Encrypt', content)
+
+    def test_send_pdf_without_receipts(self):
+        Receipt.objects.all().delete()
+
+        res = self.client.post(SEND_PDF_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,192 @@
+"""
+Tests for the spending rollups and the analytics endpoint.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import MonthlyShopSpending, MonthlyTagSpending, Receipt, Tag
+from receipt import rollups
+from receipt.tests.test_receipt_api import create_receipt
+
+SPENDING_URL = '/api/receipt/analytics/spending'
+
+
+def snapshot():
+    return (
+        sorted(MonthlyShopSpending.objects.values_list('user_id', 'month', 'shop_name', 'total', 'receipt_count')),
+        sorted(MonthlyTagSpending.objects.values_list('user_id', 'month', 'tag_id', 'total', 'receipt_count')),
+    )
+
+
+class RollupMaintenanceTests(TestCase):
+    """Test receipt writes keep the rollups equal to a full rebuild."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='rollup@example.com', password='testpass123')
+        self.food = Tag.objects.create(user=self.user, name='food')
+        self.home = Tag.objects.create(user=self.user, name='home')
+
+    def assertMatchesRebuild(self):
+        incremental = snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, snapshot())
+
+    def test_create(self):
+        create_receipt(self.user, total=Decimal('10.50'))
+        create_receipt(self.user, total=Decimal('4.50'))
+
+        row = MonthlyShopSpending.objects.get()
+        self.assertEqual((row.month.isoformat(), row.total, row.receipt_count), ('2025-05-01', Decimal('15.00'), 2))
+        self.assertMatchesRebuild()
+
+    def test_update_moves_receipt_between_rows(self):
+        receipt = create_receipt(self.user)
+        receipt.tags.add(self.food)
+
+        receipt.date = datetime(2025, 6, 3, tzinfo=timezone.utc)
+        receipt.shop_name = 'Kaufland'
+        receipt.total = Decimal('7.25')
+        receipt.save()
+
+        self.assertEqual(
+            list(MonthlyShopSpending.objects.values_list('shop_name', 'total')), [('Kaufland', Decimal('7.25'))]
+        )
+        self.assertEqual(MonthlyTagSpending.objects.get().month.isoformat(), '2025-06-01')
+        self.assertMatchesRebuild()
+
+    def test_update_total_only(self):
+        receipt = create_receipt(self.user, total=Decimal('10.00'))
+        receipt.tags.add(self.food)
+        create_receipt(self.user, total=Decimal('1.00'))
+
+        receipt.total = Decimal('12.00')
+        receipt.save()
+
+        self.assertEqual(MonthlyShopSpending.objects.get().total, Decimal('13.00'))
+        self.assertEqual(MonthlyTagSpending.objects.get().total, Decimal('12.00'))
+        self.assertMatchesRebuild()
+
+    def test_unchanged_save_skips_rollups(self):
+        receipt = create_receipt(self.user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            receipt.save()
+
+        self.assertFalse(any('spending' in q['sql'] for q in ctx.captured_queries))
+
+    def test_tag_changes(self):
+        receipt = create_receipt(self.user)
+        receipt.tags.add(self.food, self.home)
+        receipt.tags.add(self.food)
+        receipt.tags.remove(self.home)
+        receipt.tags.remove(self.home)
+        self.assertMatchesRebuild()
+
+        receipt.tags.set([self.home])
+        self.assertMatchesRebuild()
+
+        receipt.tags.clear()
+        self.assertFalse(MonthlyTagSpending.objects.exists())
+
+    def test_reverse_tag_changes(self):
+        receipts = [create_receipt(self.user), create_receipt(self.user)]
+        self.food.receipts.add(*receipts)
+        self.food.receipts.remove(receipts[0])
+        self.assertMatchesRebuild()
+
+        self.food.receipts.clear()
+        self.assertFalse(MonthlyTagSpending.objects.exists())
+
+    def test_delete(self):
+        receipt = create_receipt(self.user)
+        receipt.tags.add(self.food)
+        create_receipt(self.user)
+
+        receipt.delete()
+
+        self.assertEqual(MonthlyShopSpending.objects.get().receipt_count, 1)
+        self.assertFalse(MonthlyTagSpending.objects.exists())
+        self.assertMatchesRebuild()
+
+    def test_receipts_created_counts_bulk_inserts(self):
+        receipts = Receipt.objects.bulk_create([
+            Receipt(user=self.user, shop_name='Lidl', items=[], total=Decimal('3.00'),
+                    date=datetime(2025, 5, 1, tzinfo=timezone.utc)),
+        ])
+
+        rollups.receipts_created(receipts)
+
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command_repairs_drift(self):
+        create_receipt(self.user)
+        expected = snapshot()
+        MonthlyShopSpending.objects.update(total=0)
+
+        call_command('rebuild_spending_rollups', '--user', self.user.email, stdout=StringIO())
+
+        self.assertEqual(snapshot(), expected)
+
+
+class SpendingAnalyticsTests(TestCase):
+    """Test the spending analytics endpoint."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='spending@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        food = Tag.objects.create(user=self.user, name='food')
+
+        for shop, total, month in [('Lidl', '10.00', 3), ('Lidl', '5.00', 4), ('Profi', '20.00', 4)]:
+            receipt = create_receipt(
+                self.user, shop_name=shop, total=Decimal(total), date=datetime(2025, month, 2, tzinfo=timezone.utc)
+            )
+            if shop == 'Lidl':
+                receipt.tags.add(food)
+
+        other = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        create_receipt(other, total=Decimal('99.00'))
+
+    def get(self, **params):
+        res = self.client.get(SPENDING_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [dict(row) for row in res.data]
+
+    def test_by_month(self):
+        self.assertEqual(self.get(), [
+            {'month': '2025-03', 'total': '10.00', 'receipt_count': 1},
+            {'month': '2025-04', 'total': '25.00', 'receipt_count': 2},
+        ])
+
+    def test_by_shop_in_range(self):
+        self.assertEqual(self.get(group_by='shop', start_month='2025-04', end_month='2025-04'), [
+            {'shop_name': 'Profi', 'total': '20.00', 'receipt_count': 1},
+            {'shop_name': 'Lidl', 'total': '5.00', 'receipt_count': 1},
+        ])
+
+    def test_by_tag(self):
+        rows = self.get(group_by='tag')
+
+        self.assertEqual([(r['tag_name'], r['total'], r['receipt_count']) for r in rows], [('food', '15.00', 2)])
+
+    def test_invalid_group_by(self):
+        res = self.client.get(SPENDING_URL, {'group_by': 'week'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_queries_do_not_grow_with_receipts(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.get()
+        for day in range(1, 20):
+            create_receipt(self.user, date=datetime(2025, 3, day, tzinfo=timezone.utc))
+
+        self.assertNumQueries(len(ctx.captured_queries), self.get)
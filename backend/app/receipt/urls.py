@@ -1,16 +1,29 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from receipt.views import ReceiptViewSet, TagViewSet
+from receipt import async_views
+from receipt.views import ProductSpendingView, ReceiptViewSet, SpendingAnalyticsView, TagViewSet
+
+if settings.ASYNC_READ_VIEWS:
+    receipt_list, tag_list = async_views.receipt_list, async_views.tag_list
+else:
+    receipt_list = ReceiptViewSet.as_view({'get': 'list'})
+    tag_list = TagViewSet.as_view({'get': 'list'})
 
 urlpatterns = [
     path('create', ReceiptViewSet.as_view({'post': 'create'}), name='create'),
-    path('list', ReceiptViewSet.as_view({'get': 'list'}), name='list'),
+    path('list', receipt_list, name='list'),
     path('partial_update/<int:pk>', ReceiptViewSet.as_view({'patch': 'partial_update'}), name='partial_update'),
     path('delete/<int:pk>', ReceiptViewSet.as_view({'delete': 'destroy'}), name='delete'),
-    path('tags/list', TagViewSet.as_view({'get': 'list'}), name='list'),
+    path('tags/list', tag_list, name='list'),
     path('tags/create', TagViewSet.as_view({'post': 'create'}), name='create'),
     path('tags/update/<int:pk>', TagViewSet.as_view({'patch': 'partial_update'}), name='partial_update'),
     path('tags/delete/<int:pk>', TagViewSet.as_view({'delete': 'destroy'}), name='delete'),
     path('send-pdf/', ReceiptViewSet.as_view({'post': 'send_pdf'}), name='receipts-send-pdf'),
     path('send-csv/', ReceiptViewSet.as_view({'post': 'send_csv'}), name='receipts-send-csv'),
+    path('export-csv/', ReceiptViewSet.as_view({'get': 'export_csv'}), name='receipts-export-csv'),
+    path('export-parquet/', ReceiptViewSet.as_view({'get': 'export_parquet'}), name='receipts-export-parquet'),
+    path('export-arrow/', ReceiptViewSet.as_view({'get': 'export_arrow'}), name='receipts-export-arrow'),
+    path('analytics/spending', SpendingAnalyticsView.as_view(), name='spending-analytics'),
+    path('analytics/products', ProductSpendingView.as_view(), name='product-analytics'),
 ]
\ No newline at end of file
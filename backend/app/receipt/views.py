@@ -1,23 +1,36 @@
 from rest_framework import viewsets, permissions, mixins, status
-from core.models import Receipt, Tag
-from .serializers import ReceiptSerializer, TagSerializer
+from rest_framework.views import APIView
+from django.db.models import Count, F, Sum
+from core.models import LineItem, MonthlyShopSpending, MonthlyTagSpending, Receipt, Tag
+from .serializers import (
+    ProductQuerySerializer,
+    ProductSpendingSerializer,
+    ReceiptSerializer,
+    SpendingQuerySerializer,
+    SpendingSerializer,
+    TagSerializer,
+)
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, OpenApiTypes
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from core.admission import ExportRateThrottle, ReportRateThrottle, admission_controlled
+from .caching import VersionedListCacheMixin
 from .filters import ReceiptFilter
+from .exports import COLUMNAR_FORMATS, export_columnar, export_csv_zip
+from .reports import export_receipts_pdf
+from .pagination import ReceiptCursorPagination
 from django_filters.rest_framework import DjangoFilterBackend
 
-from io import BytesIO, StringIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 from django.core.mail import EmailMessage
-import textwrap
-from datetime import datetime
-from PyPDF2 import PdfReader, PdfWriter
 
-import csv
-from django.http import HttpResponse
-import pyzipper
+from django.http import FileResponse, HttpResponse
+from django.utils.timezone import make_aware
+
+from datetime import date, datetime, time, timedelta
+
+
+def start_of_day(day):
+    return make_aware(datetime.combine(day, time.min))
 
 
 @extend_schema(
@@ -37,9 +50,11 @@ import pyzipper
         OpenApiParameter('month', OpenApiTypes.INT, OpenApiParameter.QUERY),
         OpenApiParameter('day_of_month', OpenApiTypes.INT, OpenApiParameter.QUERY),
         OpenApiParameter('year', OpenApiTypes.INT, OpenApiParameter.QUERY),
+        OpenApiParameter('product', OpenApiTypes.STR, OpenApiParameter.QUERY),
     ]
 )
-class ReceiptViewSet(mixins.ListModelMixin,
+class ReceiptViewSet(VersionedListCacheMixin,
+                     mixins.ListModelMixin,
                      mixins.CreateModelMixin,
                      mixins.UpdateModelMixin,
                      mixins.DestroyModelMixin,
@@ -48,9 +63,18 @@ class ReceiptViewSet(mixins.ListModelMixin,
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = ReceiptFilter
+    pagination_class = ReceiptCursorPagination
 
     def get_queryset(self):
-        return Receipt.objects.filter(user=self.request.user).order_by('-date')
+        return (
+            Receipt.objects.filter(user=self.request.user)
+            .prefetch_related('tags')
+            .order_by('-date', '-id')
+        )
+
+    def get_export_queryset(self):
+        """Filtered receipts for the exports, which don't show tags."""
+        return self.filter_queryset(self.get_queryset()).prefetch_related(None)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -60,7 +84,15 @@ class ReceiptViewSet(mixins.ListModelMixin,
         context['request'] = self.request
         return context
 
-    @action(detail=False, methods=['post'], url_path='send-pdf', permission_classes=[permissions.IsAuthenticated])
+    def get_throttles(self):
+        # receipt.urls maps actions with as_view(), which skips the @action
+        # kwargs a router would apply, so pick up their throttle_classes here.
+        handler = getattr(self, self.action, None) if self.action else None
+        throttle_classes = getattr(handler, 'kwargs', {}).get('throttle_classes', self.throttle_classes)
+        return [throttle() for throttle in throttle_classes]
+
+    @action(detail=False, methods=['post'], url_path='send-pdf', permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=[ReportRateThrottle])
     @extend_schema(  # re-use the same query-param docs if you want
       parameters=[
         OpenApiParameter('start_date', OpenApiTypes.DATE, OpenApiParameter.QUERY),
@@ -69,76 +101,22 @@ class ReceiptViewSet(mixins.ListModelMixin,
       request=None,
       responses=OpenApiTypes.NONE,
     )
+    @admission_controlled('reports')
     def send_pdf(self, request):
-        receipts = self.filter_queryset(self.get_queryset())
+        receipts = self.get_export_queryset()
         if not receipts.exists():
             return Response({'detail': 'No receipts found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        buffer = BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=A4)
-        w, h = A4
-        pdf.setFont("Helvetica-Bold", 18)
-        pdf.drawCentredString(w/2, h-50, f"Receipts for {request.user.email}")
-        y = h - 80
-        pdf.setFont("Helvetica", 12)
-        for i, r in enumerate(receipts, start=1):
-            pdf.drawString(50, y, f"{i}. {r.shop_name} | {r.date:%Y-%m-%d} | RON{r.total:.2f}")
-            y -= 20
-            if getattr(r, 'items', None):
-                pdf.setFont("Helvetica-Bold", 10)
-                pdf.drawString(70, y, "Product")
-                pdf.drawString(250, y, "Qty")
-                pdf.drawString(300, y, "Unit Price")
-                pdf.drawString(400, y, "Price")
-                y -= 14
-                pdf.setFont("Helvetica", 10)
-                for itm in r.items:
-                    name = itm.get('name', '')
-                    qty = itm.get('quantity', '')
-                    up = itm.get('unit_price', 0)
-                    lp = itm.get('price', 0)
-                    pdf.drawString(70, y, str(name))
-                    pdf.drawString(250, y, str(qty))
-                    pdf.drawString(300, y, f"RON{up:.2f}")
-                    pdf.drawString(400, y, f"RON{lp:.2f}")
-                    y -= 14
-                    if y < 50:
-                        pdf.showPage()
-                        pdf.setFont("Helvetica-Bold", 10)
-                        y = h - 50
-                        pdf.drawString(70, y, "Product")
-                        pdf.drawString(250, y, "Qty")
-                        pdf.drawString(300, y, "Unit Price")
-                        pdf.drawString(400, y, "Price")
-                        y -= 14
-                        pdf.setFont("Helvetica", 10)
-                y -= 10
-                pdf.setFont("Helvetica", 12)
-            if y < 50:
-                pdf.showPage()
-                pdf.setFont("Helvetica", 12)
-                y = h - 50
-        pdf.showPage()
-        pdf.save()
-        buffer.seek(0)
-
-        reader = PdfReader(buffer)
-        writer = PdfWriter()
-        for page in reader.pages:
-            writer.add_page(page)
         pw = request.query_params.get('pdf_password', 'piggysnap')
-        if pw:
-            writer.encrypt(user_pwd=pw)
-        enc_buffer = BytesIO()
-        writer.write(enc_buffer)
-        enc_buffer.seek(0)
+        pdf_file = export_receipts_pdf(receipts, f"Receipts for {request.user.email}", pw)
 
         email = EmailMessage(
             subject="Your Password Protected Receipts PDF",
             body="Attached is a password-protected PDF with your receipts.",
             to=[request.user.email],
         )
-        email.attach("receipts.pdf", enc_buffer.getvalue(), "application/pdf")
+        with pdf_file:
+            email.attach("receipts.pdf", pdf_file.read(), "application/pdf")
         email.send(fail_silently=False)
 
         return Response({'detail': 'Encrypted PDF emailed successfully.'}, status=status.HTTP_200_OK)
@@ -148,44 +126,17 @@ class ReceiptViewSet(mixins.ListModelMixin,
         request=None,
         description="Generate a CSV of all filtered receipts and email it as an attachment."
     )
-    @action(detail=False, methods=['post'], url_path='send-csv', permission_classes=[permissions.IsAuthenticated])
+    @action(detail=False, methods=['post'], url_path='send-csv', permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=[ReportRateThrottle])
+    @admission_controlled('reports')
     def send_csv(self, request):
         """Generate an encrypted ZIP containing the CSV of filtered receipts/items and email it."""
-        receipts = self.filter_queryset(self.get_queryset())
+        receipts = self.get_export_queryset()
         if not receipts.exists():
             return Response({'detail': 'No receipts found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Build CSV text
-        csv_buffer = StringIO()
-        writer = csv.writer(csv_buffer)
-        writer.writerow(["Receipt ID", "Shop", "Date", "Total", "Product", "Qty", "Unit Price", "Price"])
-        for r in receipts:
-            items = getattr(r, 'items', []) or []
-            if items:
-                for itm in items:
-                    writer.writerow([
-                        r.id,
-                        r.shop_name,
-                        r.date.strftime("%Y-%m-%d"),
-                        f"{r.total:.2f}",
-                        itm.get('name', ''),
-                        itm.get('quantity', ''),
-                        f"{itm.get('unit_price', 0):.2f}",
-                        f"{itm.get('price', 0):.2f}"
-                    ])
-            else:
-                writer.writerow([r.id, r.shop_name, r.date.strftime("%Y-%m-%d"), f"{r.total:.2f}", "", "", "", ""])
-            writer.writerow([])
-        csv_data = csv_buffer.getvalue().encode()
-
-        # Encrypt CSV in ZIP
         csv_pw = request.query_params.get('csv_password', 'piggysnap')
-        zip_buffer = BytesIO()
-        with pyzipper.AESZipFile(zip_buffer, 'w', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES) as zf:
-            if csv_pw:
-                zf.setpassword(csv_pw.encode())
-            zf.writestr('receipts.csv', csv_data)
-        zip_buffer.seek(0)
+        zip_file = export_csv_zip(receipts, csv_pw)
 
         # Send email with encrypted ZIP
         email = EmailMessage(
@@ -193,13 +144,56 @@ class ReceiptViewSet(mixins.ListModelMixin,
             body="Attached is a password-protected ZIP containing your receipts CSV.",
             to=[request.user.email],
         )
-        email.attach("receipts.zip", zip_buffer.getvalue(), "application/zip")
+        with zip_file:
+            email.attach("receipts.zip", zip_file.read(), "application/zip")
         email.send(fail_silently=False)
         return Response({'detail': 'Encrypted CSV emailed successfully.'}, status=status.HTTP_200_OK)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('csv_password', OpenApiTypes.STR, OpenApiParameter.QUERY,
+                             description='ZIP password; empty for an unencrypted ZIP.'),
+        ],
+        responses={(200, 'application/zip'): OpenApiTypes.BINARY},
+        description="Download a ZIP with the CSV of all filtered receipts."
+    )
+    @action(detail=False, methods=['get'], url_path='export-csv', permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=[ExportRateThrottle])
+    @admission_controlled('exports')
+    def export_csv(self, request):
+        """Stream the (encrypted) ZIP of the filtered receipts' CSV as a download."""
+        receipts = self.get_export_queryset()
+        zip_file = export_csv_zip(receipts, request.query_params.get('csv_password', 'piggysnap'))
+        return FileResponse(zip_file, as_attachment=True, filename='receipts.zip', content_type='application/zip')
+
+    @extend_schema(
+        responses={(200, 'application/vnd.apache.parquet'): OpenApiTypes.BINARY},
+        description="Download the filtered receipts, with nested line items, as a Parquet file."
+    )
+    @action(detail=False, methods=['get'], url_path='export-parquet', permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=[ExportRateThrottle])
+    def export_parquet(self, request):
+        return self.columnar_response('parquet')
+
+    @extend_schema(
+        responses={(200, 'application/vnd.apache.arrow.file'): OpenApiTypes.BINARY},
+        description="Download the filtered receipts, with nested line items, as an Arrow IPC file."
+    )
+    @action(detail=False, methods=['get'], url_path='export-arrow', permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=[ExportRateThrottle])
+    def export_arrow(self, request):
+        return self.columnar_response('arrow')
+
+    @admission_controlled('exports')
+    def columnar_response(self, fmt):
+        _, filename, content_type = COLUMNAR_FORMATS[fmt]
+        data_file = export_columnar(self.get_export_queryset(), fmt)
+        return FileResponse(data_file, as_attachment=True, filename=filename, content_type=content_type)
+
 
 
-class TagViewSet(mixins.ListModelMixin,
+class TagViewSet(VersionedListCacheMixin,
+                 mixins.ListModelMixin,
                  mixins.CreateModelMixin,
                  mixins.UpdateModelMixin,
                  mixins.DestroyModelMixin,
@@ -212,3 +206,67 @@ class TagViewSet(mixins.ListModelMixin,
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+@extend_schema(
+    parameters=[SpendingQuerySerializer],
+    responses=SpendingSerializer(many=True),
+    description="Total spent per month, shop or tag, read from the monthly rollups.",
+)
+class SpendingAnalyticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = SpendingQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        group_by = params.validated_data['group_by']
+
+        if group_by == 'tag':
+            rows = MonthlyTagSpending.objects.annotate(tag_name=F('tag__name'))
+            keys, ordering = ['tag_id', 'tag_name'], ['-spent', 'tag_name']
+        else:
+            rows = MonthlyShopSpending.objects.all()
+            if group_by == 'shop':
+                keys, ordering = ['shop_name'], ['-spent', 'shop_name']
+            else:
+                keys, ordering = ['month'], ['month']
+
+        rows = rows.filter(user=request.user)
+        if 'start_month' in params.validated_data:
+            rows = rows.filter(month__gte=params.validated_data['start_month'])
+        if 'end_month' in params.validated_data:
+            rows = rows.filter(month__lte=params.validated_data['end_month'])
+
+        rows = rows.values(*keys).annotate(spent=Sum('total'), receipts=Sum('receipt_count')).order_by(*ordering)
+        return Response(SpendingSerializer(rows, many=True).data)
+
+
+@extend_schema(
+    parameters=[ProductQuerySerializer],
+    responses=ProductSpendingSerializer(many=True),
+    description="Total spent per product name, highest first, from the receipts' line items.",
+)
+class ProductSpendingView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = ProductQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        rows = LineItem.objects.filter(user=request.user)
+        if 'name' in query:
+            rows = rows.filter(name__icontains=query['name'])
+        # A half-open range on the receipt's `date` stays within
+        # receipt_user_date_idx, where `date__date` would cast every row.
+        if 'start_date' in query:
+            rows = rows.filter(receipt__date__gte=start_of_day(query['start_date']))
+        if 'end_date' in query and query['end_date'] < date.max:
+            rows = rows.filter(receipt__date__lt=start_of_day(query['end_date'] + timedelta(days=1)))
+
+        rows = (
+            rows.values('name')
+            .annotate(spent=Sum('price'), units=Sum('quantity'), receipts=Count('receipt_id', distinct=True))
+            .order_by(F('spent').desc(nulls_last=True), 'name')[:query['limit']]
+        )
+        return Response(ProductSpendingSerializer(rows, many=True).data)
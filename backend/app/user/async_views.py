@@ -0,0 +1,12 @@
+"""
+Async version of the profile endpoint.
+"""
+from core.async_views import async_read_view
+from user.serializers import UserSerializer
+from user.views import ManageUserView
+
+
+@async_read_view(sync_view=ManageUserView.as_view())
+async def me(request, user):
+    """GET the profile without a thread hop; updates still go to ManageUserView."""
+    return UserSerializer(user, context={'request': request}).data
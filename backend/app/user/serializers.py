@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as SimpleJWTTokenRefreshSerializer
 from django.contrib.auth import authenticate
 from django.utils.translation import gettext_lazy as _
 
@@ -14,6 +15,11 @@ from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.tokens import default_token_generator
 from django.conf import settings
 
+from core.authentication import VersionedRefreshToken
+
+User = get_user_model()
+
+
 class UserSerializer(serializers.ModelSerializer):
     confirm_password = serializers.CharField(write_only=True, min_length=8)
 
@@ -114,6 +120,9 @@ class ResetPasswordSerializer(serializers.Serializer):
         form.save()
         return user
 
+class TokenRefreshSerializer(SimpleJWTTokenRefreshSerializer):
+    token_class = VersionedRefreshToken
+
 class TokenObtainPair2FASerializer(serializers.Serializer):
     email    = serializers.EmailField()
     password = serializers.CharField(write_only=True)
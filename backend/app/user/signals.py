@@ -0,0 +1,41 @@
+"""
+Revoke a user's tokens when their password or is_active changes, and drop
+changed users from this process's authentication cache.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.authentication import user_cache
+
+User = get_user_model()
+
+REVOKING_FIELDS = ('password', 'is_active')
+
+
+@receiver(pre_save, sender=User)
+def remember_credentials(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._credentials_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(REVOKING_FIELDS):
+        return
+    instance._credentials_previous = User.objects.filter(pk=instance.pk).values_list(*REVOKING_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_credentials_previous', None)
+    if previous is not None and previous != tuple(getattr(instance, field) for field in REVOKING_FIELDS):
+        User.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        instance.refresh_from_db(fields=['token_version'])
+    instance._credentials_previous = None
+    user_cache.delete(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    user_cache.delete(instance.pk)
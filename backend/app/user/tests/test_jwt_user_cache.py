@@ -0,0 +1,125 @@
+"""
+Tests for the cached JWT user lookup and its invalidation.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.authentication import VersionedRefreshToken, user_cache
+from core.models import OCRJob
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token_obtain_pair')
+DISABLE_2FA_URL = reverse('user:disable-2fa')
+
+
+def access_token(user):
+    return str(VersionedRefreshToken.for_user(user).access_token)
+
+
+class JWTUserCacheTests(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='cache@example.com', password='testpass123', name='Cache',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(self.user)}')
+
+    def test_repeat_request_reads_no_user_row(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_disable_2fa_refreshes_cached_user(self):
+        self.user.two_factor_enabled = True
+        self.user.totp_secret = 'JBSWY3DPEHPK3PXP'
+        self.user.save()
+        self.assertTrue(self.client.get(ME_URL).data['two_factor_enabled'])
+
+        res = self.client.post(DISABLE_2FA_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(self.client.get(ME_URL).data['two_factor_enabled'])
+
+    def test_password_reset_revokes_tokens(self):
+        self.client.get(ME_URL)
+        url = reverse('user:reset-password', args=[
+            urlsafe_base64_encode(force_bytes(self.user.pk)),
+            default_token_generator.make_token(self.user),
+        ])
+
+        res = APIClient().post(url, {'new_password': 'newpass12345', 'new_password2': 'newpass12345'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+        login = APIClient().post(TOKEN_URL, {'email': self.user.email, 'password': 'newpass12345'})
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {login.data["access"]}')
+        self.assertEqual(client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+    def test_deactivation_rejects_cached_user(self):
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 1)
+
+    def test_reactivation_keeps_old_tokens_revoked(self):
+        self.user.is_active = False
+        self.user.save()
+        self.user.is_active = True
+        self.user.save()
+
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_newer_token_skips_older_cached_user(self):
+        """A token issued after a change made in another process never sees the stale entry."""
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            name='Renamed', token_version=F('token_version') + 1,
+        )
+        self.user.refresh_from_db()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(self.user)}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'Renamed')
+
+    def test_2fa_pre_token_is_not_an_access_token(self):
+        self.user.two_factor_enabled = True
+        self.user.save()
+        login = APIClient().post(TOKEN_URL, {'email': self.user.email, 'password': 'testpass123'})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {login.data["pre_token"]}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_ocr_endpoints_reject_revoked_and_pre_tokens(self):
+        url = reverse('ocr_job_status', args=[OCRJob.objects.create(user=self.user, image=b'image').pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.user.set_password('newpass12345')
+        self.user.two_factor_enabled = True
+        self.user.save()
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        login = APIClient().post(TOKEN_URL, {'email': self.user.email, 'password': 'newpass12345'})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {login.data["pre_token"]}')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
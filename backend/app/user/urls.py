@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from rest_framework_simplejwt.views import TokenRefreshView
@@ -8,13 +9,14 @@ from user.views import (
     TokenObtainPair2FA, TokenVerify2FA,
     Disable2FAView,
 )
+from user.async_views import me
 
 
 app_name = 'user'
 
 urlpatterns = [
     path('create',    CreateUserView.as_view(),      name='create'),
-    path('me',        ManageUserView.as_view(),      name='me'),
+    path('me',        me if settings.ASYNC_READ_VIEWS else ManageUserView.as_view(), name='me'),
     path('forgot-password/', ForgotPasswordAPIView.as_view(), name='forgot-password'),
     path('reset-password/<uidb64>/<token>/', ResetPasswordAPIView.as_view(), name='reset-password'),
 
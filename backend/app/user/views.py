@@ -10,8 +10,9 @@ from rest_framework import generics, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import CachedJWTAuthentication, VersionedJWTAuthentication, VersionedRefreshToken
 
 #from ratelimit.decorators import ratelimit
 
@@ -39,11 +40,14 @@ class CreateUserView(generics.CreateAPIView):
 # @ratelimit(key='user', rate='1000/day', block=True)
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # request.user may come from the auth cache; save over the current row.
+        return User.objects.get(pk=self.request.user.pk)
 
 
 # @ratelimit(key='user', rate='200/day', block=True)
@@ -78,6 +82,8 @@ class ResetPasswordAPIView(generics.GenericAPIView):
 
 # @ratelimit(key='user', rate='500/day', block=True)
 class Enable2FAView(APIView):
+    # The 2FA views read the user fresh, not from the auth cache: they use totp_secret.
+    authentication_classes = [VersionedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
@@ -116,6 +122,7 @@ class Enable2FAView(APIView):
 @extend_schema(request=TokenVerify2FASerializer1)
 # @ratelimit(key='user', rate='500/day', block=True)
 class Verify2FASetupView(APIView):
+    authentication_classes = [VersionedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
@@ -160,7 +167,7 @@ class TokenObtainPair2FA(APIView):
                 "require2fa": True,
                 "pre_token": str(pre)
             })
-        r = RefreshToken.for_user(user)
+        r = VersionedRefreshToken.for_user(user)
         return Response({
             "access": str(r.access_token),
             "refresh": str(r)
@@ -203,7 +210,7 @@ class TokenVerify2FA(APIView):
                 {"detail": "Invalid 2FA code"},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        r = RefreshToken.for_user(user)
+        r = VersionedRefreshToken.for_user(user)
         return Response({
             "access": str(r.access_token),
             "refresh": str(r)
@@ -212,6 +219,7 @@ class TokenVerify2FA(APIView):
 
 # @ratelimit(key='user', rate='200/day', block=True)
 class Disable2FAView(APIView):
+    authentication_classes = [VersionedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
         user = request.user